@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""Benchmarks of taskcli's own hot paths, on synthetic registries of 10 to 10,000 tasks.
+
+    python benchmarks/bench.py --output results.json
+    python benchmarks/bench.py --compare benchmarks/baseline.json --threshold 0.25
+
+Every benchmark is run --repeat times and its median is kept; per-call benchmarks (parser,
+parse, dispatch) are averaged over a sample of tasks. With --compare, the run fails (exit code 1)
+if any median is more than --threshold (relative) slower than in the baseline.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+sys.path.insert(0, SRC_DIR)
+
+import taskcli  # noqa: E402
+from taskcli import taskcli as core  # noqa: E402
+
+DEFAULT_SIZES = [10, 100, 1000, 10000]
+SAMPLE = 50  # tasks used for the per-call benchmarks
+
+HEADER = """\
+from taskcli import task, arg, cli
+
+"""
+
+# Half of the tasks have only signature params, the other half mix @arg and signature params
+TASK_PLAIN = """\
+@task
+def task_{i}(a: int = 1, name: str = "x", flag: bool = False):
+    \"\"\"Plain task number {i}.\"\"\"
+    return a
+
+"""
+
+TASK_WITH_ARGS = """\
+@task
+@arg("--count", "-c", type=int, default=1, help="how many")
+@arg("--mode", choices=["fast", "slow"], default="fast")
+def task_{i}(count, mode, items: list[str], ratio: float = 0.5):
+    \"\"\"Task number {i}, with @arg params.\"\"\"
+    return count
+
+"""
+
+FOOTER = """\
+if __name__ == "__main__":
+    cli()
+"""
+
+ARGV_PLAIN = ["-a", "2", "--name", "y", "--flag"]
+ARGV_WITH_ARGS = ["--count", "3", "--mode", "slow", "--items", "x", "y", "--ratio", "0.1"]
+
+
+def generate_script(n):
+    parts = [HEADER]
+    for i in range(n):
+        parts.append((TASK_PLAIN if i % 2 == 0 else TASK_WITH_ARGS).format(i=i))
+    parts.append(FOOTER)
+    return "".join(parts)
+
+
+def task_argv(i):
+    return ARGV_PLAIN if i % 2 == 0 else ARGV_WITH_ARGS
+
+
+def sample_indexes(n):
+    step = max(n // SAMPLE, 1)
+    return list(range(0, n, step))[:SAMPLE]
+
+
+def measure(fn, repeat, setup=None):
+    """Median and min of the wall time of fn() over repeat runs, in seconds."""
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return {"median_s": statistics.median(times), "min_s": min(times), "runs": repeat}
+
+
+def per_call(result, calls):
+    return {key: value / calls if key != "runs" else value for key, value in result.items()}
+
+
+def run_subprocess(argv, env):
+    subprocess.run(argv, env=env, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def bench_size(n, repeat, script_dir):
+    script = generate_script(n)
+    path = os.path.join(script_dir, f"tasks_{n}.py")
+    with open(path, "w") as f:
+        f.write(script)
+    code = compile(script, path, "exec")
+    indexes = sample_indexes(n)
+    names = [f"task_{i}" for i in indexes]
+    results = {}
+
+    def decorate():
+        exec(code, {"__name__": f"tasks_{n}"})
+
+    results["decoration"] = measure(decorate, repeat, setup=core.cleanup_for_tests)
+
+    def build_parsers():
+        for name in names:
+            core.build_parser_for_task(name)
+
+    timings = measure(build_parsers, repeat, setup=core.invalidate_parsers)
+    results["build_parser_for_task"] = per_call(timings, len(names))
+
+    parsers = {name: core.build_parser_for_task(name) for name in names}
+
+    def parse_all():
+        for i, name in zip(indexes, names):
+            core.parse(parsers[name], task_argv(i))
+
+    results["parse"] = per_call(measure(parse_all, repeat), len(names))
+
+    configs = {name: core.parse(parsers[name], task_argv(i)) for i, name in zip(indexes, names)}
+
+    def dispatch_all():
+        for name in names:
+            core.dispatch(configs[name], name)
+
+    results["dispatch"] = per_call(measure(dispatch_all, repeat), len(names))
+
+    def top_level_help():
+        with contextlib.redirect_stderr(io.StringIO()), contextlib.redirect_stdout(io.StringIO()):
+            try:
+                core.cli(argv=[path, "-h"], force=True)
+            except SystemExit:
+                pass
+
+    results["help"] = measure(top_level_help, repeat)
+
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([SRC_DIR, os.environ.get("PYTHONPATH", "")]))
+    cold_argv = [sys.executable, path, "task-0"] + task_argv(0)
+    results["cold_start"] = measure(lambda: run_subprocess(cold_argv, env), repeat)
+    return results
+
+
+def run_benchmarks(sizes, repeat):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([SRC_DIR, os.environ.get("PYTHONPATH", "")]))
+    import_result = measure(lambda: run_subprocess([sys.executable, "-c", "import taskcli"], env), repeat)
+
+    results = {"import_taskcli": {"": import_result}}
+    with tempfile.TemporaryDirectory() as script_dir:
+        for n in sizes:
+            print(f"Benchmarking {n} tasks...", file=sys.stderr)
+            for name, result in bench_size(n, repeat, script_dir).items():
+                results.setdefault(name, {})[str(n)] = result
+    core.cleanup_for_tests()
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+
+def compare(current, baseline, threshold):
+    """Return the list of regressions, as printable lines."""
+    regressions = []
+    for name, by_size in current["results"].items():
+        for size, result in by_size.items():
+            old = baseline["results"].get(name, {}).get(size)
+            if old is None:
+                continue
+            ratio = result["median_s"] / old["median_s"] if old["median_s"] else 1.0
+            if ratio > 1 + threshold:
+                label = f"{name}[{size}]" if size else name
+                old_ms, new_ms = old["median_s"] * 1000, result["median_s"] * 1000
+                regressions.append(f"{label}: {old_ms:.3f} ms -> {new_ms:.3f} ms ({ratio:.2f}x)")
+    return regressions
+
+
+def format_results(data):
+    lines = [f"{'benchmark':<24} {'tasks':>6} {'median ms':>12} {'min ms':>12}"]
+    for name, by_size in data["results"].items():
+        for size, result in by_size.items():
+            lines.append(f"{name:<24} {size:>6} {result['median_s'] * 1000:12.3f} {result['min_s'] * 1000:12.3f}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="numbers of tasks to generate")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per benchmark")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", metavar="BASELINE", help="JSON file of a previous run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed relative slowdown (default: 0.25)")
+    args = parser.parse_args(argv)
+
+    data = run_benchmarks(args.sizes, args.repeat)
+    print(format_results(data))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(data, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(data, baseline, args.threshold)
+        if regressions:
+            print(f"\nRegressions (more than {args.threshold:.0%} slower than {args.compare}):")
+            print("\n".join(regressions))
+            return 1
+        print(f"\nNo regressions compared to {args.compare}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
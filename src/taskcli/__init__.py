@@ -3,4 +3,5 @@ import logging
 log = logging.getLogger(__name__)
 log.debug("Initializing taskcli")
 
-from .taskcli import task, cli, arg  # , analyze_signature
+from .taskcli import task, cli, cli_async, arg, register_lazy, register_namespace  # , analyze_signature
+from .mapped import MappedFile
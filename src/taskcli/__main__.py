@@ -0,0 +1,98 @@
+"""Entry point for `python -m taskcli COMMAND ...`."""
+
+import sys
+
+USAGE = """usage: python -m taskcli COMMAND ...
+
+commands:
+  run SCRIPT [ARGS...]   run a tasks script, using its cached manifest to avoid importing it when possible
+  completion bash|zsh|fish SCRIPT [PROG]
+                         print shell code enabling TAB completion of the script (as PROG)
+  completion index SCRIPT
+                         regenerate the completion index of the script, if outdated
+  serve SCRIPT [--idle-timeout SECONDS]
+                         keep the script imported in a daemon, serving `call` over a Unix socket
+  call SCRIPT [ARGS...]  same as `run`, but through the daemon of the script (started if not running)
+  compile SCRIPT -o OUTPUT
+                         write a static dispatcher of the script, which lists tasks and parses arguments
+                         without importing it
+"""
+
+
+def cmd_run(argv):
+    if not argv:
+        sys.exit(USAGE)
+    from .manifest import run
+
+    # argv[0] is the script, same as when running it directly
+    sys.argv = argv
+    run(argv[0], argv)
+    return 0
+
+
+def cmd_completion(argv):
+    if len(argv) not in [2, 3]:
+        sys.exit(USAGE)
+    from . import completion
+
+    what, script = argv[0], argv[1]
+    if what == "index":
+        completion.ensure_index(script)
+    else:
+        prog = argv[2] if len(argv) == 3 else None
+        print(completion.shell_script(what, script, prog=prog))
+    return 0
+
+
+def cmd_serve(argv):
+    from . import daemon
+
+    if len(argv) == 3 and argv[1] == "--idle-timeout":
+        return daemon.serve(argv[0], idle_timeout=float(argv[2]))
+    if len(argv) != 1:
+        sys.exit(USAGE)
+    return daemon.serve(argv[0])
+
+
+def cmd_call(argv):
+    if not argv:
+        sys.exit(USAGE)
+    from . import daemon
+
+    return daemon.call(argv[0], argv)
+
+
+def cmd_compile(argv):
+    if len(argv) != 3 or argv[1] != "-o":
+        sys.exit(USAGE)
+    from . import codegen
+
+    codegen.compile_script(argv[0], argv[2])
+    return 0
+
+
+COMMANDS = {
+    "run": cmd_run,
+    "completion": cmd_completion,
+    "serve": cmd_serve,
+    "call": cmd_call,
+    "compile": cmd_compile,
+}
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+
+    if not argv or argv[0] in ["-h", "--help"]:
+        print(USAGE, file=sys.stderr)
+        return 0 if argv else 2
+
+    command = argv[0]
+    if command not in COMMANDS:
+        sys.exit(f"Unknown command '{command}'.\n{USAGE}")
+    return COMMANDS[command](argv[1:])
+
+
+if __name__ == "__main__":
+    sys.exit(main())
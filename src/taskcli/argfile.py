@@ -0,0 +1,93 @@
+"""'@FILE' values of list arguments, e.g. `tool process --ids @ids.txt`.
+
+The file lists the elements separated by newlines, or by NUL characters (detected from the first
+chunk, for `find -print0` and friends). It's read in chunks and each chunk is converted to the
+element type with a single map() call, instead of argparse calling the type once per element.
+`@-` reads the elements from stdin, `@@x` is the literal value `@x`.
+"""
+
+import argparse
+import sys
+
+CHUNK_SIZE = 1024 * 1024  # characters
+
+
+def _convert(items, element_type, source):
+    try:
+        return list(map(element_type, items))
+    except (ValueError, TypeError, argparse.ArgumentTypeError):
+        # find the culprit, for a helpful message
+        for item in items:
+            try:
+                element_type(item)
+            except (ValueError, TypeError, argparse.ArgumentTypeError):
+                type_name = getattr(element_type, "__name__", repr(element_type))
+                raise ValueError(f"invalid {type_name} value in {source}: {item!r}")
+        raise
+
+
+def read_values(path, element_type=str):
+    """Elements listed in the file ('-' for stdin), converted to element_type."""
+    f = sys.stdin if path == "-" else open(path)
+    try:
+        values = []
+        separator = None
+        rest = ""
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if separator is None and chunk:
+                separator = "\0" if "\0" in chunk else "\n"
+            if not chunk:
+                break
+            items = (rest + chunk).split(separator)
+            rest = items.pop()
+            values += _convert([item for item in items if item], element_type, path)
+        if rest:
+            values += _convert([rest], element_type, path)
+        return values
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def expand(values, element_type=str):
+    """Argument values as given on the command line, with the '@FILE' ones replaced by their elements."""
+    result = []
+    plain = []
+    for value in values:
+        if value.startswith("@@"):
+            plain.append(value[1:])
+        elif value.startswith("@") and len(value) > 1:
+            result += _convert(plain, element_type, "arguments")
+            plain = []
+            result += read_values(value[1:], element_type)
+        else:
+            plain.append(value)
+    result += _convert(plain, element_type, "arguments")
+    return result
+
+
+class ArgFileAction(argparse.Action):
+    """Stores the list of values of an nargs='+'/'*' argument, expanding '@FILE' values."""
+
+    def __init__(self, option_strings, dest, element_type=None, **kwargs):
+        super().__init__(option_strings, dest, **kwargs)
+        self.element_type = element_type or str
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        try:
+            values = expand(values, self.element_type)
+        except OSError as e:
+            parser.error(f"argument {option_string or self.dest}: can't read {e.filename}: {e.strerror}")
+        except ValueError as e:
+            parser.error(f"argument {option_string or self.dest}: {e}")
+        setattr(namespace, self.dest, values)
+
+
+def supports(ap_kwargs):
+    """Whether '@FILE' expansion applies to the argument (a list of values, converted by a plain callable)."""
+    if ap_kwargs.get("nargs") not in ["+", "*"]:
+        return False
+    if ap_kwargs.get("action") is not None or ap_kwargs.get("choices"):
+        return False  # choices are checked by argparse before the action converts the values
+    return ap_kwargs.get("type") is None or callable(ap_kwargs["type"])
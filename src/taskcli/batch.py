@@ -0,0 +1,154 @@
+"""Running one task many times with different arguments, see `tool TASK --batch FILE|-`.
+
+Each input line is either a JSON list of command line arguments, or a JSON object mapping
+parameter names to values. Every line is parsed with the (cached) parser of the task and
+dispatched like a normal invocation, so semantics match single runs. One JSON line is written
+to stdout per input line, {"line": N, "result": ...} or {"line": N, "error": "..."}, either in
+input order or as soon as each call finishes (--unordered).
+"""
+
+import json
+import sys
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from . import taskcli, usage
+
+# Lines read ahead of the ones being written, per worker; bounds memory use for huge inputs
+READ_AHEAD = 4
+
+
+def _select(argv):
+    """Return (task name, the argv after the task name) for 'tool TASK --batch ...', or None."""
+    task_name, used = taskcli.tasks.select(argv[1:])
+    if task_name is None or argv[1 + used : 2 + used] != ["--batch"]:
+        return None
+    return task_name, argv[1 + used :]
+
+
+def is_batch_invocation(argv):
+    """True for 'tool TASK --batch ...', unless the task has a --batch argument of its own."""
+    selected = _select(argv)
+    if selected is None:
+        return False
+    task = taskcli.resolve_task(selected[0])
+    return not any("--batch" in arg_spec.names for arg_spec in task.spec)
+
+
+def _build_batch_parser(prog):
+    parser = taskcli.ArgumentParser(prog=prog, description="Run the task once per line of the input.")
+    parser.add_argument("--batch", required=True, metavar="FILE", help="JSONL input, '-' for stdin")
+    parser.add_argument("--workers", type=int, default=1, help="number of lines processed concurrently")
+    parser.add_argument("--unordered", action="store_true", help="write results as they complete")
+    return parser
+
+
+def object_to_argv(task, obj):
+    """Command line arguments equivalent to {param name: value}."""
+    optional, positional = [], []
+    remaining = dict(obj)
+    for arg_spec in task.spec:
+        dest = usage._dest(arg_spec.names, arg_spec.kwargs)
+        if dest not in remaining:
+            continue
+        value = remaining.pop(dest)
+        values = value if isinstance(value, list) else [value]
+        action = arg_spec.kwargs.get("action")
+        if not arg_spec.names[0].startswith("-"):
+            positional += [str(v) for v in values]
+        elif action in ["store_true", "store_false"]:
+            if bool(value) == (action == "store_true"):
+                optional.append(arg_spec.names[0])
+        else:
+            optional += [arg_spec.names[0]] + [str(v) for v in values]
+    if remaining:
+        raise taskcli.ParsingError(f"unknown arguments: {', '.join(sorted(remaining))}")
+    return optional + (["--"] + positional if positional else [])
+
+
+def _line_to_argv(task, line):
+    data = json.loads(line)
+    if isinstance(data, list):
+        return [str(v) for v in data]
+    if isinstance(data, dict):
+        return object_to_argv(task, data)
+    raise taskcli.ParsingError("each line must be a JSON list of arguments or a JSON object")
+
+
+def _line_parser(task):
+    """Parser of the lines: a bad line gets an error record, without printing the help of the task."""
+    parser = taskcli.ArgumentParser(print_help=False, add_help=False)
+    for arg_spec in task.spec:
+        parser.add_argument(*arg_spec.names, **arg_spec.kwargs)
+    return parser
+
+
+def _run_line(task_name, parser, options, line_number, line):
+    task = taskcli.tasks[task_name]
+    try:
+        config = taskcli.parse(parser, _line_to_argv(task, line))
+        return {"line": line_number, "result": taskcli.dispatch(config, task_name, options=options)}
+    except SystemExit as e:
+        return {"line": line_number, "error": f"exited with {e.code}"}
+    except Exception as e:
+        return {"line": line_number, "error": f"{type(e).__name__}: {e}"}
+
+
+def _read_lines(path):
+    f = sys.stdin if path == "-" else open(path)
+    try:
+        for line_number, line in enumerate(f, start=1):
+            if line.strip():
+                yield line_number, line
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def run(argv, options=None):
+    """Run 'tool TASK --batch FILE [--workers N] [--unordered]', returns the number of failed lines."""
+    options = options or {}
+    task_name, batch_argv = _select(argv)
+    prog = f"{argv[0]} {taskcli.tasks[task_name].display_name}"
+    batch_args = _build_batch_parser(prog).parse_args(batch_argv)
+
+    task = taskcli.resolve_task(task_name)
+    parser = _line_parser(task)
+    if task.deps:
+        from . import scheduler
+
+        scheduler.run_dependencies(task_name, options=options)
+
+    def write(record):
+        nonlocal failed
+        failed += "error" in record
+        sys.stdout.write(json.dumps(record, default=str) + "\n")
+
+    failed = 0
+    lines = _read_lines(batch_args.batch)
+    workers = max(batch_args.workers, 1)
+    if workers == 1:
+        for line_number, line in lines:
+            write(_run_line(task_name, parser, options, line_number, line))
+        sys.stdout.flush()
+        return failed
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+
+        def write_next():
+            if batch_args.unordered:
+                future = next(iter(wait(pending, return_when=FIRST_COMPLETED)[0]))
+                pending.remove(future)
+            else:
+                future = pending.popleft()
+            write(future.result())
+
+        for line_number, line in lines:
+            pending.append(pool.submit(_run_line, task_name, parser, options, line_number, line))
+            if len(pending) >= workers * READ_AHEAD:
+                write_next()
+        while pending:
+            write_next()
+    sys.stdout.flush()
+    return failed
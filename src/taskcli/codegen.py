@@ -0,0 +1,206 @@
+"""Static dispatcher of a tasks script, see `python -m taskcli compile SCRIPT -o OUTPUT`.
+
+The generated file embeds the task table (names, aliases, argparse definitions) and the listing
+printed by -h. At run time it only needs argparse to list the tasks, print the help of a task and
+parse its arguments; the script (and with it taskcli) is imported only to call the selected task.
+Paths are relative to the generated file, so it can be copied or moved together with the script.
+The tables are used only while the sources have the size and sha256 they had when compiling.
+
+Whatever the tables can't answer statically (global options, chains, batches, the default task,
+tasks with dependencies or with '@FILE'/streamed/mapped arguments, ...) falls back to the same
+code path as `python -m taskcli run SCRIPT`, as does everything once the sources changed.
+"""
+
+import inspect
+import os
+import sys
+
+from . import manifest, taskcli, usage
+
+PROG_MARKER = "\0prog\0"
+STATIC_TYPES = {int: "int", str: "str", float: "float", bool: "bool", None: None}
+
+TEMPLATE = '''\
+#!/usr/bin/env python3
+# Static dispatcher of {script}, generated by `python -m taskcli compile`. Don't edit it, regenerate it.
+import argparse
+import hashlib
+import os
+import sys
+
+HERE = os.path.dirname(os.path.realpath(__file__))
+SCRIPT = os.path.join(HERE, {script!r})
+SOURCES = {sources!r}  # (path relative to HERE, size, sha256), the tables are used only while these match
+LISTING = {listing!r}
+GROUPS = {groups!r}
+COMMANDS = {commands!r}  # task name or alias -> task name, for the tasks which can be dispatched statically
+TASKS = {tasks!r}  # task name -> (required_env, [(names, argparse kwargs)])
+TYPES = {{"int": int, "str": str, "float": float, "bool": bool}}
+PROG_MARKER = {prog_marker!r}
+
+
+class Fallback(Exception):
+    pass
+
+
+class Parser(argparse.ArgumentParser):
+    def error(self, message):
+        raise Fallback()  # taskcli reports it
+
+
+def is_fresh():
+    for path, size, sha256 in SOURCES:
+        path = os.path.join(HERE, path)
+        try:
+            if os.path.getsize(path) != size:
+                return False
+            with open(path, "rb") as f:
+                if hashlib.sha256(f.read()).hexdigest() != sha256:
+                    return False
+        except OSError:
+            return False
+    return True
+
+
+def select(args):
+    """(task name, remaining args), same as TaskRegistry.select() for the static tasks."""
+    key = ""
+    for i, word in enumerate(args):
+        if word.startswith("-"):
+            break
+        key += word.replace("-", "_")
+        if key in COMMANDS:
+            return COMMANDS[key], args[i + 1 :]
+        if key not in GROUPS:
+            break
+        key += "."
+    return None, args
+
+
+def build_parser(task_name):
+    parser = Parser()
+    for names, kwargs in TASKS[task_name][1]:
+        if kwargs.get("type") is not None:
+            kwargs = dict(kwargs, type=TYPES[kwargs["type"]])
+        parser.add_argument(*names, **kwargs)
+    return parser
+
+
+def run_static(argv):
+    args = argv[1:]
+    if LISTING is None or not is_fresh() or "--" in args or "--batch" in args:
+        raise Fallback()
+    if any(arg.startswith("--taskcli-profile") for arg in args):
+        raise Fallback()
+    wants_help = "-h" in args or "--help" in args
+    if args in [["-h"], ["--help"]]:
+        sys.stderr.write(LISTING.replace(PROG_MARKER, os.path.basename(argv[0])))
+        sys.exit(0)
+
+    task_name, rest = select(args)
+    if task_name is None:
+        raise Fallback()
+    if wants_help:
+        if TASKS[task_name][0]:
+            raise Fallback()  # the help shows the state of the required environment variables
+        build_parser(task_name).print_help(sys.stderr)
+        sys.exit(0)
+    config = build_parser(task_name).parse_args(rest)
+
+    from taskcli import manifest, taskcli
+
+    manifest.import_script(SCRIPT)
+    taskcli.dispatch(config, task_name, record=True)
+
+
+def main(argv):
+    try:
+        return run_static(argv)
+    except Fallback:
+        pass
+    if not os.path.isfile(SCRIPT):
+        sys.exit(f"{{os.path.basename(argv[0])}}: {{SCRIPT}} not found, it must be next to this tool as when compiled")
+    from taskcli import manifest
+
+    manifest.run(SCRIPT, argv)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
+'''
+
+
+def _static_args(task):
+    """The argparse definitions of the task as plain data, or None if it can't be dispatched statically."""
+    args = []
+    for arg_spec in task.spec:
+        kwargs = dict(arg_spec.kwargs)
+        if kwargs.get("type") not in STATIC_TYPES or not isinstance(kwargs.get("action", ""), str):
+            return None  # e.g. '@FILE' lists, streamed or memory-mapped inputs
+        kwargs["type"] = STATIC_TYPES[kwargs.get("type")]
+        if kwargs["type"] is None:
+            del kwargs["type"]
+        if not manifest._is_plain(list(kwargs.values())):
+            return None
+        args.append((list(arg_spec.names), kwargs))
+    return args
+
+
+def _is_static(task, module_name):
+    if not task.params_known or task.signature.get("module") != module_name:
+        return False
+    if task.deps or inspect.iscoroutinefunction(task.wrapper):
+        return False
+    return True
+
+
+def generate(script_path, output_path):
+    """Source of the static dispatcher of the script (imported by this function), to be written to output_path."""
+    script_path = os.path.abspath(script_path)
+    output_dir = os.path.dirname(os.path.realpath(output_path))
+    module = manifest.import_script(script_path)
+    tasks = taskcli.tasks
+
+    listing = None
+    commands = {}
+    static_tasks = {}
+    groups = set()
+    listed = [task for task in tasks.values() if task.task_decorator_seen]
+    default_task = tasks.default_task
+    if not (default_task is not None and default_task.has_positional_args() and len(tasks) > 1):
+        # (otherwise every invocation fails, let taskcli report it)
+        listing = usage.render_task_list(listed, PROG_MARKER, lazy_groups=tasks.lazy_groups())
+        for task in listed:
+            args = _static_args(task) if _is_static(task, module.__name__) else None
+            if args is None:
+                continue
+            static_tasks[task.name] = (task.required_env, args)
+            prefix = f"{task.namespace}." if task.namespace else ""
+            for key in [task.name] + [prefix + alias.replace("-", "_") for alias in task.aliases]:
+                commands[key] = task.name
+        for task in listed:
+            parts = (task.namespace or "").split(".")
+            groups.update(".".join(parts[: i + 1]) for i in range(len(parts)) if task.namespace)
+
+    sources = [script_path] + [path for path in manifest._source_files() if path != script_path]
+    source_infos = []
+    for path in sources:
+        info = manifest._file_info(path)
+        source_infos.append((os.path.relpath(path, output_dir), info["size"], info["sha256"]))
+
+    return TEMPLATE.format(
+        script=os.path.relpath(script_path, output_dir),
+        sources=source_infos,
+        listing=listing,
+        groups=sorted(groups),
+        commands=commands,
+        tasks=static_tasks,
+        prog_marker=PROG_MARKER,
+    )
+
+
+def compile_script(script_path, output_path):
+    source = generate(script_path, output_path)
+    with open(output_path, "w") as f:
+        f.write(source)
+    os.chmod(output_path, 0o755)
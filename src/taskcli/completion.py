@@ -0,0 +1,226 @@
+"""Shell completion for tasks scripts (bash, zsh, fish).
+
+Completion is answered from a small tab separated index file written next to the script
+(`.<script>.taskcli-complete`), so pressing TAB never imports the script or builds a parser.
+The shell functions only run awk over that file; the index is regenerated (through
+`python -m taskcli completion index SCRIPT`) when one of the source files is newer than it.
+
+Index records, one per line, fields separated by tabs:
+    s  PATH                       source file the index was built from
+    d  TASK                       the default task
+    t  TASK  FLAG...              a task and all of its flags
+    c  TASK  FLAG  CHOICE...      choices of a flag ("" as FLAG for positional arguments)
+"""
+
+import os
+import shlex
+import sys
+
+from . import manifest, taskcli
+
+
+def index_path(script_path):
+    script_dir, script_name = os.path.split(os.path.abspath(script_path))
+    return os.path.join(script_dir, f".{script_name}.taskcli-complete")
+
+
+def build_index(sources):
+    """Build the index lines from the tasks currently in the registry."""
+    lines = [f"s\t{path}" for path in sources]
+    if taskcli.tasks.default_task is not None:
+        lines.append(f"d\t{taskcli.tasks.default_task.name.replace('_', '-')}")
+
+    groups = []  # only the first level of namespaces is completed
+    namespaces = [task.namespace for task in taskcli.tasks.values() if task.namespace]
+    for namespace in namespaces + list(taskcli.tasks.lazy_groups()):
+        group = namespace.split(".")[0].replace("_", "-")
+        if group not in groups:
+            groups.append(group)
+    lines += [f"t\t{group}" for group in groups]
+
+    for task in taskcli.tasks.values():
+        if not task.task_decorator_seen or task.namespace:
+            continue
+        flags = ["-h", "--help"]
+        choices = []
+        # lazily registered tasks are listed without flags, to not import them
+        for arg_spec in task.spec if task.params_known else ():
+            if arg_spec.names[0].startswith("-"):
+                flags += arg_spec.names
+                flag = arg_spec.names[0]
+            else:
+                flag = ""
+            if arg_spec.kwargs.get("choices"):
+                choices.append([flag, *[str(c) for c in arg_spec.kwargs["choices"]]])
+        for name in [task.name, *task.aliases]:
+            name = name.replace("_", "-")
+            lines.append("\t".join(["t", name, *flags]))
+            lines += ["\t".join(["c", name, *choice]) for choice in choices]
+    return lines
+
+
+def write_index(script_path):
+    data = manifest.load_tasks(script_path)
+    if data is not None:
+        sources = [source["path"] for source in data["sources"]]
+    else:
+        sources = [os.path.abspath(script_path)] + manifest._source_files()
+
+    path = index_path(script_path)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write("\n".join(build_index(sources)) + "\n")
+    os.replace(tmp_path, path)
+    return path
+
+
+def read_index(path):
+    with open(path) as f:
+        return [line.rstrip("\n").split("\t") for line in f if line.strip()]
+
+
+def index_is_fresh(script_path):
+    path = index_path(script_path)
+    try:
+        index_mtime = os.stat(path).st_mtime_ns
+        records = read_index(path)
+    except OSError:
+        return False
+    sources = [r[1] for r in records if r[0] == "s"] or [os.path.abspath(script_path)]
+    try:
+        return all(os.stat(source).st_mtime_ns <= index_mtime for source in sources)
+    except OSError:
+        return False
+
+
+def ensure_index(script_path):
+    """Return the path to an up-to-date index, regenerating it only if the sources changed."""
+    if index_is_fresh(script_path):
+        return index_path(script_path)
+    return write_index(script_path)
+
+
+def complete(records, words):
+    """Return completion candidates.
+
+    words: the command line split into words, the first being the program and the last the word being completed.
+    Same logic as AWK_QUERY, which is what the shells actually run.
+    """
+    cword = len(words) - 1
+    cur = words[-1]
+    prev = words[-2] if cword >= 1 else ""
+    word1 = words[1] if cword > 1 else ""
+
+    default_task = ""
+    for record in records:
+        if record[0] == "d":
+            default_task = record[1]
+
+    selected = default_task if cword == 1 or word1.startswith("-") else word1
+    candidates = []
+    for record in records:
+        if record[0] == "t":
+            if cword == 1 and not cur.startswith("-"):
+                candidates += [record[1]] if record[1].startswith(cur) else []
+            elif record[1] == selected and cur.startswith("-"):
+                candidates += [flag for flag in record[2:] if flag.startswith(cur)]
+        elif record[0] == "c" and record[1] == selected:
+            if record[2] == prev or (record[2] == "" and not cur.startswith("-") and cword > 1):
+                candidates += [choice for choice in record[3:] if choice.startswith(cur)]
+    return candidates
+
+
+AWK_QUERY = r"""
+BEGIN { FS = "\t" }
+$1 == "d" { default_task = $2; next }
+$1 == "t" || $1 == "c" {
+    selected = (cword == 1 || substr(word1, 1, 1) == "-") ? default_task : word1
+    dash = (substr(cur, 1, 1) == "-")
+}
+$1 == "t" {
+    if (cword == 1 && !dash) { if (index($2, cur) == 1) print $2; next }
+    if ($2 == selected && dash) { for (i = 3; i <= NF; i++) if (index($i, cur) == 1) print $i }
+    next
+}
+$1 == "c" && $2 == selected && ($3 == prev || ($3 == "" && !dash && cword > 1)) {
+    for (i = 4; i <= NF; i++) if (index($i, cur) == 1) print $i
+}
+"""
+
+BASH_TEMPLATE = """\
+# taskcli completion for {prog}, load with: source <(python -m taskcli completion bash {script_q})
+_taskcli_complete_{func}() {{
+    local script={script_q} index={index_q} src
+    local stale=1
+    if [ -f "$index" ]; then
+        stale=0
+        while IFS=$'\\t' read -r kind src; do
+            [ "$kind" = s ] || break
+            [ "$src" -nt "$index" ] && {{ stale=1; break; }}
+        done < "$index"
+    fi
+    [ "$stale" = 1 ] && {python_q} -m taskcli completion index "$script" >/dev/null 2>&1
+    local cur="${{COMP_WORDS[COMP_CWORD]}}" prev="" word1=""
+    [ "$COMP_CWORD" -ge 1 ] && prev="${{COMP_WORDS[COMP_CWORD-1]}}"
+    [ "$COMP_CWORD" -gt 1 ] && word1="${{COMP_WORDS[1]}}"
+    local IFS=$'\\n'
+    COMPREPLY=($(awk -v cword="$COMP_CWORD" -v cur="$cur" -v prev="$prev" -v word1="$word1" \\
+        {awk_q} "$index" 2>/dev/null))
+}}
+complete -o default -F _taskcli_complete_{func} {prog_q}
+"""
+
+ZSH_TEMPLATE = """\
+# taskcli completion for {prog}, load with: source <(python -m taskcli completion zsh {script_q})
+autoload -U +X bashcompinit && bashcompinit
+"""
+
+FISH_TEMPLATE = """\
+# taskcli completion for {prog}, load with: python -m taskcli completion fish {script_q} | source
+function __taskcli_complete_{func}
+    set -l script {script_q}
+    set -l index {index_q}
+    set -l stale 1
+    if test -f $index
+        set stale 0
+        for src in (awk -F '\\t' '$1 == "s" {{ print $2 }}' $index)
+            if test $src -nt $index
+                set stale 1
+            end
+        end
+    end
+    if test $stale = 1
+        {python_q} -m taskcli completion index $script >/dev/null 2>&1
+    end
+    set -l words (commandline -opc) (commandline -ct)
+    set -l cword (math (count $words) - 1)
+    set -l prev ""
+    set -l word1 ""
+    test $cword -ge 1; and set prev $words[-2]
+    test $cword -gt 1; and set word1 $words[2]
+    awk -v cword=$cword -v cur="$words[-1]" -v prev="$prev" -v word1="$word1" {awk_q} $index 2>/dev/null
+end
+complete -c {prog_q} -f -a '(__taskcli_complete_{func})'
+"""
+
+
+def shell_script(shell, script_path, prog=None):
+    """Return the shell code registering completion for the script."""
+    script_path = os.path.abspath(script_path)
+    prog = prog or os.path.basename(script_path)
+    values = {
+        "prog": prog,
+        "prog_q": shlex.quote(prog),
+        "func": "".join(c if c.isalnum() else "_" for c in prog),
+        "script_q": shlex.quote(script_path),
+        "index_q": shlex.quote(index_path(script_path)),
+        "python_q": shlex.quote(sys.executable),
+        "awk_q": shlex.quote(AWK_QUERY),
+    }
+    if shell == "bash":
+        return BASH_TEMPLATE.format(**values)
+    if shell == "zsh":
+        return ZSH_TEMPLATE.format(**values) + BASH_TEMPLATE.format(**values)
+    if shell == "fish":
+        return FISH_TEMPLATE.format(**values)
+    raise Exception(f"Unsupported shell '{shell}', use one of: bash, zsh, fish")
@@ -0,0 +1,336 @@
+"""Warm daemon running a tasks script, see `python -m taskcli serve` and `python -m taskcli call`.
+
+The daemon imports the script (and everything it imports) once, and listens on a Unix socket.
+For each invocation the client sends its argv, cwd and environment together with its
+stdin/stdout/stderr file descriptors. The daemon forks, the child takes over those descriptors
+and runs cli() like a normal invocation would (so output goes straight to the client's terminal),
+then sends back the exit code.
+
+The daemon re-executes itself when a source file of the tasks changes, and exits after
+idle_timeout seconds without invocations.
+"""
+
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import select
+import signal
+import socket
+import stat
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+
+from . import manifest, taskcli
+
+log = logging.getLogger("taskcli")
+
+DEFAULT_IDLE_TIMEOUT = 15 * 60
+POLL_INTERVAL = 1.0  # how often the daemon checks for source changes and idleness
+RECONNECT_TIMEOUT = 10.0  # how long the client retries while the daemon is starting
+
+_HEADER = struct.Struct("!I")  # length of the JSON message which follows
+_INHERITED_FDS_ENV = "_TASKCLI_DAEMON_FDS"
+
+
+class DaemonUnavailable(Exception):
+    pass
+
+
+def runtime_dir():
+    """Directory of the sockets and locks, private to the user: in $XDG_RUNTIME_DIR, or else in the temp dir."""
+    base = os.environ.get("XDG_RUNTIME_DIR")
+    if base and os.path.isdir(base):
+        path = os.path.join(base, "taskcli")
+    else:
+        path = os.path.join(tempfile.gettempdir(), f"taskcli-{os.getuid()}")
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+    # in a shared temp dir, anybody could have created it first
+    st = os.lstat(path)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or st.st_mode & 0o077:
+        raise Exception(f"{path} must be a directory owned by the user, accessible only to them (mode 0700)")
+    return path
+
+
+def socket_path(script_path):
+    """One daemon per script and user."""
+    digest = hashlib.sha256(os.path.abspath(script_path).encode()).hexdigest()[:16]
+    # Not next to the script: paths of Unix sockets are limited to ~100 characters
+    return os.path.join(runtime_dir(), f"{digest}.sock")
+
+
+def _open_lock(path, flags=os.O_CREAT | os.O_RDWR):
+    # never follows a symlink, nor truncates: the file only serves to flock()
+    return os.fdopen(os.open(f"{path}.lock", flags | os.O_NOFOLLOW, 0o600), "r+" if flags & os.O_RDWR else "r")
+
+
+def _send_message(sock, message, fds=()):
+    data = json.dumps(message).encode()
+    if fds:
+        socket.send_fds(sock, [_HEADER.pack(len(data))], list(fds))
+    else:
+        sock.sendall(_HEADER.pack(len(data)))
+    sock.sendall(data)
+
+
+def _recv_exact(sock, size):
+    data = b""
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise EOFError("connection closed")
+        data += chunk
+    return data
+
+
+def _recv_message(sock, maxfds=0):
+    """Return (message, received fds)."""
+    fds = []
+    if maxfds:
+        header, fds, _, _ = socket.recv_fds(sock, _HEADER.size, maxfds)
+        if not header:
+            raise EOFError("connection closed")
+        header += _recv_exact(sock, _HEADER.size - len(header))
+    else:
+        header = _recv_exact(sock, _HEADER.size)
+    (size,) = _HEADER.unpack(header)
+    return json.loads(_recv_exact(sock, size)), fds
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Server
+
+
+def _sources_snapshot(script_path):
+    snapshot = {}
+    for path in [script_path] + manifest._source_files():
+        try:
+            snapshot[path] = os.stat(path).st_mtime_ns
+        except OSError:
+            snapshot[path] = None
+    return snapshot
+
+
+def _exit_code(e):
+    """Exit code of a SystemExit, same as the interpreter computes it."""
+    if e.code is None:
+        return 0
+    if isinstance(e.code, int):
+        return e.code
+    print(e.code, file=sys.stderr)
+    return 1
+
+
+def _run_request(conn):
+    """In the forked child: take over the client's stdio, environment and cwd, and run the tool."""
+    request, fds = _recv_message(conn, maxfds=3)
+    _send_message(conn, {"pid": os.getpid()})
+
+    for target, fd in enumerate(fds):
+        os.dup2(fd, target)
+        os.close(fd)
+    sys.stdin = open(0, "r", closefd=False)
+    sys.stdout = open(1, "w", closefd=False, buffering=1 if os.isatty(1) else -1)
+    sys.stderr = open(2, "w", closefd=False, buffering=1)
+    os.chdir(request["cwd"])
+    os.environ.clear()
+    os.environ.update(request["env"])
+    sys.argv = request["argv"]
+
+    try:
+        taskcli.cli(argv=sys.argv)
+        code = 0
+    except SystemExit as e:
+        code = _exit_code(e)
+    except KeyboardInterrupt:
+        code = 130
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+    sys.stdout.flush()
+    sys.stderr.flush()
+    _send_message(conn, {"exit_code": code})
+    return code
+
+
+def _fork_request(server, conn):
+    sys.stdout.flush()
+    sys.stderr.flush()
+    pid = os.fork()
+    if pid:
+        conn.close()
+        return pid
+
+    code = 1
+    try:
+        server.close()
+        code = _run_request(conn)
+    except BaseException:
+        traceback.print_exc()
+    finally:
+        os._exit(code & 0xFF)
+
+
+def _reap(children):
+    for pid in list(children):
+        if os.waitpid(pid, os.WNOHANG)[0]:
+            children.discard(pid)
+
+
+def _reload(script_path, idle_timeout, lock_file, server):
+    """Re-execute the daemon, keeping the lock and the socket, so that invocations meanwhile just wait."""
+    fds = [lock_file.fileno(), server.fileno()]
+    for fd in fds:
+        os.set_inheritable(fd, True)
+    os.environ[_INHERITED_FDS_ENV] = ",".join(map(str, fds))
+    argv = [sys.executable, "-m", "taskcli", "serve", script_path, "--idle-timeout", str(idle_timeout)]
+    os.execv(sys.executable, argv)
+
+
+def serve(script_path, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+    """Run the daemon for the script, until it's idle for idle_timeout seconds."""
+    script_path = os.path.abspath(script_path)
+    path = socket_path(script_path)
+
+    inherited = os.environ.pop(_INHERITED_FDS_ENV, None)
+    if inherited:
+        # reloading: the lock and the listening socket were kept open across exec()
+        lock_fd, server_fd = map(int, inherited.split(","))
+        lock_file = os.fdopen(lock_fd, "r+")
+        server = socket.socket(fileno=server_fd)
+    else:
+        lock_file = _open_lock(path)
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            log.info(f"A daemon for {script_path} is already running")
+            return 0
+        server = None
+
+    manifest.import_script(script_path)
+    sources = _sources_snapshot(script_path)
+
+    if server is None:
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        old_umask = os.umask(0o077)  # only the owner may connect
+        try:
+            server.bind(path)
+        finally:
+            os.umask(old_umask)
+        server.listen()
+    log.info(f"Serving {script_path} on {path}")
+
+    children = set()
+    last_activity = time.monotonic()
+    try:
+        while True:
+            readable, _, _ = select.select([server], [], [], POLL_INTERVAL)
+            _reap(children)
+            # checked before accepting, so that an invocation right after an edit sees the new code
+            if _sources_snapshot(script_path) != sources:
+                log.info("Sources changed, reloading")
+                _reload(script_path, idle_timeout, lock_file, server)
+
+            if readable:
+                conn, _ = server.accept()
+                children.add(_fork_request(server, conn))
+                last_activity = time.monotonic()
+            elif not children and time.monotonic() - last_activity > idle_timeout:
+                log.info("Idle, exiting")
+                return 0
+    finally:
+        server.close()
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Client
+
+
+def daemon_running(script_path):
+    """The daemon holds a lock on '<socket>.lock' for as long as it runs."""
+    try:
+        with _open_lock(socket_path(script_path), os.O_RDONLY) as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except FileNotFoundError:
+        return False
+    except BlockingIOError:
+        return True
+    return False
+
+
+def start_daemon(script_path):
+    """Start the daemon in the background, detached from the terminal."""
+    subprocess.Popen(
+        [sys.executable, "-m", "taskcli", "serve", os.path.abspath(script_path)],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+
+
+def _call_once(path, argv):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    with sock:
+        try:
+            sock.connect(path)
+            _send_message(sock, {"argv": argv, "cwd": os.getcwd(), "env": dict(os.environ)}, fds=[0, 1, 2])
+            started, _ = _recv_message(sock)
+        except (OSError, EOFError) as e:
+            # not running (yet), or died
+            raise DaemonUnavailable(str(e))
+
+        # the child is in the daemon's session, so Ctrl-C in the terminal doesn't reach it otherwise
+        old_handler = signal.signal(signal.SIGINT, lambda signum, frame: os.kill(started["pid"], signal.SIGINT))
+        try:
+            result, _ = _recv_message(sock)
+        except (OSError, EOFError):
+            print("taskcli: the daemon process running the task died", file=sys.stderr)
+            return 1
+        finally:
+            signal.signal(signal.SIGINT, old_handler)
+        return result["exit_code"]
+
+
+def call(script_path, argv, autostart=True):
+    """Run the tool through the daemon of the script, returns the exit code.
+
+    argv: full argv, argv[0] being the script.
+    Without a running daemon, starts one (if autostart) and runs this invocation in-process.
+    """
+    path = socket_path(script_path)
+    deadline = time.monotonic() + RECONNECT_TIMEOUT
+    while True:
+        try:
+            return _call_once(path, argv)
+        except DaemonUnavailable as e:
+            if not daemon_running(script_path):
+                if autostart:
+                    start_daemon(script_path)
+                return _run_locally(script_path, argv)
+            if time.monotonic() > deadline:
+                log.debug(f"Daemon unavailable ({e}), running in-process")
+                return _run_locally(script_path, argv)
+            time.sleep(0.05)  # starting
+
+
+def _run_locally(script_path, argv):
+    sys.argv = argv
+    manifest.run(script_path, argv)
+    return 0
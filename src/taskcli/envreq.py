@@ -0,0 +1,107 @@
+"""Required environment variables of tasks, see @task(required_env=[...]).
+
+Each entry of required_env is a requirement: a variable name (`TOKEN`), a pattern (`AWS_*`, with
+the wildcards of fnmatch), or alternatives separated by `|` (`TOKEN|API_KEY`). A requirement is
+met if any variable it matches is set and not empty.
+
+Requirements are compiled once per required_env list. Checking them takes a single pass over the
+environment, and the result is reused until one of the variables it depends on changes (or, with
+patterns, a variable is added or removed), so nested task calls and the help output don't
+re-check anything.
+"""
+
+import fnmatch
+import os
+import re
+
+MET = "met"
+EMPTY = "empty"
+MISSING = "missing"
+
+
+class Requirement:
+    def __init__(self, spec):
+        self.spec = spec
+        alternatives = [alt.strip() for alt in spec.split("|")]
+        if not all(alternatives):
+            raise Exception(f"Invalid required_env entry '{spec}'")
+        self.names = [alt for alt in alternatives if not _is_pattern(alt)]
+        self.patterns = [alt for alt in alternatives if _is_pattern(alt)]
+        self.regex = re.compile("|".join(fnmatch.translate(p) for p in self.patterns)) if self.patterns else None
+
+    def __repr__(self):
+        return f"Requirement({self.spec!r})"
+
+
+def _is_pattern(name):
+    return any(char in name for char in "*?[")
+
+
+class Requirements:
+    """Compiled required_env of a task."""
+
+    def __init__(self, specs):
+        self.requirements = [Requirement(spec) for spec in specs]
+        self._patterned = [req for req in self.requirements if req.regex is not None]
+        self._names = list(dict.fromkeys(name for req in self.requirements for name in req.names))
+        self._matched = []  # names matched by the patterns in the last evaluation
+        self._inputs = None  # what the results were computed from, see _current_inputs()
+        self._results = None
+
+    def __bool__(self):
+        return bool(self.requirements)
+
+    def _evaluate(self, environ):
+        """[(requirement, MET|EMPTY|MISSING)], in the order of required_env."""
+        matched = {id(req): [] for req in self._patterned}
+        if self._patterned:
+            for name in environ:
+                for req in self._patterned:
+                    if req.regex.match(name):
+                        matched[id(req)].append(name)
+        self._matched = [name for names in matched.values() for name in names]
+
+        results = []
+        for req in self.requirements:
+            names = [name for name in req.names if name in environ] + matched.get(id(req), [])
+            if not names:
+                status = MISSING
+            elif any(environ[name] != "" for name in names):
+                status = MET
+            else:
+                status = EMPTY
+            results.append((req, status))
+        return results
+
+    def _current_inputs(self):
+        # the values of the named variables; with patterns also the set of all names, and the values of the matched ones
+        values = tuple(map(os.environ.get, self._names))
+        if not self._patterned:
+            return values
+        return values, frozenset(os.environ), tuple(map(os.environ.get, self._matched))
+
+    def check(self):
+        """[(requirement, status)] for the current environment, memoized until the variables it depends on change."""
+        inputs = self._current_inputs()
+        if self._results is None or self._inputs != inputs:
+            self._results = self._evaluate(os.environ)
+            self._inputs = self._current_inputs()
+        return self._results
+
+    def unmet(self):
+        """(missing specs, empty specs)."""
+        results = self.check()
+        missing = [req.spec for req, status in results if status == MISSING]
+        empty = [req.spec for req, status in results if status == EMPTY]
+        return missing, empty
+
+
+_compiled = {}  # tuple of specs -> Requirements
+
+
+def compile(required_env):
+    """The (shared) compiled Requirements of a required_env list."""
+    key = tuple(required_env or ())
+    if key not in _compiled:
+        _compiled[key] = Requirements(key)
+    return _compiled[key]
@@ -0,0 +1,248 @@
+"""History of task runs, and their latency statistics, see `tool --stats [TASK]`.
+
+Each run of a task given on the command line (also in chains, and jobs run by `tool worker`)
+appends one line to the history of the script, private to the user and kept out of the directories
+the script runs in: `$XDG_STATE_HOME/taskcli/history/<script>-<hash of its path>.tsv` (by default
+in `~/.local/state`), or `history.tsv` in $TASKCLI_STATE_DIR if that's set:
+
+    timestamp  task  args hash  wall ms  cpu ms  exit status
+
+Once the file grows over MAX_BYTES it's compacted: only the newest KEEP_PER_TASK runs of each
+task are kept, and only as many of the newest lines as fit in half of MAX_BYTES. Recording can be
+turned off with TASKCLI_HISTORY=0. It never fails the task: errors writing the file are ignored.
+"""
+
+import contextlib
+import hashlib
+import logging
+import os
+import sys
+import time
+from typing import NamedTuple
+
+from . import state
+
+log = logging.getLogger("taskcli")
+
+HISTORY_FILE = "history.tsv"
+MAX_BYTES = 2 * 1024 * 1024
+KEEP_PER_TASK = 1000
+TREND_BUCKETS = 8
+SPARKS = "▁▂▃▄▅▆▇█"
+
+# turned off by cleanup_for_tests(), so that test suites don't record their runs
+record_runs = True
+
+# the tasks script being run, set by manifest.import_script(); sys.argv[0] when the script is run directly
+script_path = None
+
+
+def enabled():
+    return record_runs and os.environ.get("TASKCLI_HISTORY", "1") != "0"
+
+
+class Run(NamedTuple):
+    timestamp: float
+    task: str
+    args_hash: str
+    wall_ms: float
+    cpu_ms: float
+    status: int
+
+
+def _plain(value):
+    # only plain values: the repr of mmaps, iterators, files, ... has memory addresses, different on every run
+    if value is None or isinstance(value, (str, bytes, int, float, bool)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [_plain(item) for item in value]
+    return type(value).__name__
+
+
+def args_hash(kwargs):
+    """Hash of the arguments of a run, the same for the same command line."""
+    plain = sorted((name, _plain(value)) for name, value in kwargs.items())
+    return hashlib.blake2b(repr(plain).encode(), digest_size=6).hexdigest()
+
+
+def _exit_status(exc):
+    if exc is None:
+        return 0
+    if isinstance(exc, SystemExit):
+        if exc.code is None:
+            return 0
+        return exc.code if isinstance(exc.code, int) else 1
+    if isinstance(exc, KeyboardInterrupt):
+        return 130
+    return 1
+
+
+@contextlib.contextmanager
+def recorded(task_name, kwargs):
+    """Record the run of the code inside the block as a run of the task."""
+    start_wall, start_cpu = time.perf_counter(), time.process_time()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        run = Run(
+            timestamp=time.time(),
+            task=task_name,
+            args_hash=args_hash(kwargs),
+            wall_ms=(time.perf_counter() - start_wall) * 1000,
+            cpu_ms=(time.process_time() - start_cpu) * 1000,
+            status=_exit_status(error),
+        )
+        try:
+            append(run)
+        except OSError as e:
+            log.debug(f"Could not record the run of {task_name}: {e}")
+
+
+def _format(run):
+    return f"{run.timestamp:.3f}\t{run.task}\t{run.args_hash}\t{run.wall_ms:.3f}\t{run.cpu_ms:.3f}\t{run.status}\n"
+
+
+def _parse(line):
+    fields = line.rstrip("\n").split("\t")
+    if len(fields) != 6:
+        return None
+    try:
+        return Run(float(fields[0]), fields[1], fields[2], float(fields[3]), float(fields[4]), int(fields[5]))
+    except ValueError:
+        return None
+
+
+def history_path():
+    if os.environ.get("TASKCLI_STATE_DIR"):
+        return state.state_path(HISTORY_FILE)
+    base = os.environ.get("XDG_STATE_HOME") or os.path.join(os.path.expanduser("~"), ".local", "state")
+    path = os.path.join(base, "taskcli", "history")
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    script = os.path.realpath(script_path or sys.argv[0])
+    digest = hashlib.sha256(script.encode()).hexdigest()[:16]
+    return os.path.join(path, f"{os.path.basename(script)}-{digest}.tsv")
+
+
+def append(run, path=None):
+    path = path or history_path()
+    # a single O_APPEND write per run, so concurrent runs never interleave their lines
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, _format(run).encode())
+        size = os.fstat(fd).st_size
+    finally:
+        os.close(fd)
+    if size > MAX_BYTES:
+        compact(path)
+
+
+def read(path=None):
+    """All the recorded runs, oldest first."""
+    path = path or history_path()
+    try:
+        with open(path) as f:
+            runs = [_parse(line) for line in f]
+    except OSError:
+        return []
+    return sorted((run for run in runs if run is not None), key=lambda run: run.timestamp)
+
+
+def compact(path):
+    import fcntl
+
+    with open(f"{path}.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if os.path.getsize(path) <= MAX_BYTES:
+            return  # compacted by another process meanwhile
+        per_task = {}
+        for run in reversed(read(path)):
+            runs = per_task.setdefault(run.task, [])
+            if len(runs) < KEEP_PER_TASK:
+                runs.append(run)
+        kept = sorted((run for runs in per_task.values() for run in runs), key=lambda run: -run.timestamp)
+        lines = []
+        size = 0
+        for run in kept:
+            line = _format(run)
+            size += len(line)
+            if size > MAX_BYTES // 2:
+                break
+            lines.append(line)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.writelines(reversed(lines))
+        os.replace(tmp_path, path)
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list."""
+    index = max(0, -(-len(sorted_values) * p // 100) - 1)
+    return sorted_values[int(index)]
+
+
+def trend(wall_times):
+    """Change of the median of the newest quarter of the runs against the older ones, or None if too few runs."""
+    import statistics
+
+    if len(wall_times) < 8:
+        return None
+    recent = len(wall_times) // 4
+    older = statistics.median(wall_times[:-recent])
+    if older == 0:
+        return None
+    return statistics.median(wall_times[-recent:]) / older - 1
+
+
+def _ms(value):
+    return f"{value:.1f}" if value < 10000 else f"{value / 1000:.1f}s"
+
+
+def task_stats(runs):
+    """(runs, failed, p50, p95, p99, trend) of the runs of one task; latencies only of the successful ones."""
+    ok = [run.wall_ms for run in runs if run.status == 0]
+    failed = len(runs) - len(ok)
+    if not ok:
+        return len(runs), failed, None, None, None, None
+    ordered = sorted(ok)
+    return len(runs), failed, percentile(ordered, 50), percentile(ordered, 95), percentile(ordered, 99), trend(ok)
+
+
+def _row(name, stats):
+    count, failed, p50, p95, p99, change = stats
+    latencies = [_ms(v) if v is not None else "-" for v in (p50, p95, p99)]
+    change_text = f"{change:+.0%}" if change is not None else ""
+    return f"{name:<24} {count:>6} {failed:>6} {latencies[0]:>9} {latencies[1]:>9} {latencies[2]:>9}  {change_text}"
+
+
+HEADER = f"{'task':<24} {'runs':>6} {'failed':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}  trend"
+
+
+def format_stats(runs, task_name=None):
+    """Table of the latency statistics of all tasks, or of one task with its p50 over time."""
+    import statistics
+
+    if task_name is None:
+        if not runs:
+            return "No runs recorded yet."
+        by_task = {}
+        for run in runs:
+            by_task.setdefault(run.task, []).append(run)
+        return "\n".join([HEADER] + [_row(name, task_stats(by_task[name])) for name in sorted(by_task)])
+
+    runs = [run for run in runs if run.task == task_name]
+    if not runs:
+        return f"No runs of task {task_name} recorded."
+    lines = [HEADER, _row(task_name, task_stats(runs)), "", "p50 over time:"]
+    bucket_size = -(-len(runs) // TREND_BUCKETS)
+    buckets = [runs[i : i + bucket_size] for i in range(0, len(runs), bucket_size)]
+    medians = [statistics.median([run.wall_ms for run in bucket]) for bucket in buckets]
+    highest = max(medians) or 1
+    for bucket, median in zip(buckets, medians):
+        since = time.strftime("%Y-%m-%d %H:%M", time.localtime(bucket[0].timestamp))
+        spark = SPARKS[min(len(SPARKS) - 1, int(median / highest * (len(SPARKS) - 1)))]
+        lines.append(f"  {since}  {spark} {_ms(median):>9}  ({len(bucket)} runs)")
+    return "\n".join(lines)
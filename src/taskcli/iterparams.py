@@ -0,0 +1,103 @@
+"""Iterator/Iterable task params, e.g. `def count(lines: Iterator[str])`.
+
+Such a param becomes an option taking a path (stdin by default, or '-'). The task receives a lazy
+iterator over the lines of the file, each one converted to the element type when it's reached,
+so inputs larger than memory can be processed. The file is opened on the first next() call.
+"""
+
+import collections.abc
+import os
+import sys
+import typing
+
+ITERATOR_TYPES = [collections.abc.Iterator, collections.abc.Iterable]
+
+
+def element_type(annotation):
+    """Element type of Iterator[X]/Iterable[X] (str for a bare Iterator), or None for other annotations."""
+    if annotation in ITERATOR_TYPES or annotation in [typing.Iterator, typing.Iterable]:
+        return str
+    if typing.get_origin(annotation) not in ITERATOR_TYPES:
+        return None
+    args = typing.get_args(annotation)
+    return args[0] if args and callable(args[0]) else str
+
+
+class LazyElements:
+    """Iterator over the lines of a file (or stdin), converted on the fly."""
+
+    def __init__(self, path, element_type=str):
+        self.path = path
+        self.element_type = element_type
+        self._lines = None
+
+    def _read(self):
+        f = sys.stdin if self.path == "-" else open(self.path)
+        convert = self.element_type
+        try:
+            for line_number, line in enumerate(f, start=1):
+                line = line.rstrip("\n")
+                if convert is str:
+                    yield line
+                    continue
+                if not line.strip():
+                    continue
+                try:
+                    yield convert(line)
+                except ValueError:
+                    raise ValueError(
+                        f"{self.path}:{line_number}: invalid {getattr(convert, '__name__', convert)} value: {line!r}"
+                    )
+        finally:
+            if f is not sys.stdin:
+                f.close()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._lines is None:
+            self._lines = self._read()
+        return next(self._lines)
+
+    def close(self):
+        if self._lines is not None:
+            self._lines.close()
+
+    def __repr__(self):
+        # used in cache and up-to-date keys (with fingerprint()), so it must not depend on the iteration state
+        return f"LazyElements({self.path!r}, {getattr(self.element_type, '__name__', self.element_type)})"
+
+    def fingerprint(self):
+        """(mtime_ns, size) of the file, for cache and up-to-date keys; None for stdin, which can't be known upfront."""
+        if self.path == "-":
+            return None
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+
+class ElementsOf:
+    """argparse 'type' of Iterator params: path -> LazyElements."""
+
+    def __init__(self, element_type):
+        self.element_type = element_type
+        self.__name__ = f"iterator of {getattr(element_type, '__name__', element_type)}"
+
+    def __call__(self, path):
+        return LazyElements(path, self.element_type)
+
+    def __repr__(self):
+        return f"elements_of({getattr(self.element_type, '__name__', self.element_type)})"
+
+
+_types = {}
+
+
+def elements_of(element_type):
+    """The (shared) ElementsOf for the element type, so that equal params get the same argparse type."""
+    if element_type not in _types:
+        _types[element_type] = ElementsOf(element_type)
+    return _types[element_type]
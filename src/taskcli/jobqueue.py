@@ -0,0 +1,277 @@
+"""Local job queue of task invocations, kept in `.taskcli/queue.sqlite3`.
+
+    tool enqueue [--retries N] [--retry-delay S] TASK [ARGS...]   queue a call, prints the job id
+    tool worker [--concurrency N] [--visibility-timeout S] [--drain]
+                                                                run queued jobs in N processes
+    tool jobs [ID]                                              list the jobs, or show one with its result
+
+The arguments are validated when the job is enqueued, with the same parser as a direct call, and
+parsed and dispatched again by the worker. taskcli's global options given to enqueue (e.g.
+`tool --no-cache enqueue build`) are stored with the job, and override those given to the worker.
+A worker leases a job for --visibility-timeout seconds and keeps extending the lease while the
+task runs; a job whose worker died becomes visible again once its lease expires. Failed jobs are
+retried (with exponential backoff) until they used up their attempts. Results are stored as JSON.
+These commands are available unless a task has the same name.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sqlite3
+import sys
+import threading
+import time
+import traceback
+
+from . import state, taskcli
+
+DB_FILE = "queue.sqlite3"
+POLL_INTERVAL = 0.5  # seconds between looks at an empty queue
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    task TEXT NOT NULL,
+    argv TEXT NOT NULL,
+    options TEXT NOT NULL DEFAULT '{}',
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    retry_delay REAL NOT NULL,
+    visible_at REAL NOT NULL,
+    enqueued_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    result TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (state, visible_at);
+"""
+
+
+def connect(path=None):
+    db = sqlite3.connect(path or state.state_path(DB_FILE), timeout=60, isolation_level=None)
+    db.row_factory = sqlite3.Row
+    db.execute("PRAGMA journal_mode=WAL")
+    db.executescript(SCHEMA)
+    if "options" not in [column["name"] for column in db.execute("PRAGMA table_info(jobs)")]:
+        db.execute("ALTER TABLE jobs ADD COLUMN options TEXT NOT NULL DEFAULT '{}'")  # queue of an older version
+    return db
+
+
+def enqueue(db, task_name, argv, retries=2, retry_delay=1.0, options=None):
+    """Queue a call of the task with the (task's own) command line arguments, returns the job id.
+
+    options: taskcli's global options to run the job with, see taskcli.parse_global_options()
+    """
+    cursor = db.execute(
+        "INSERT INTO jobs (task, argv, options, state, max_attempts, retry_delay, visible_at, enqueued_at)"
+        " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (task_name, json.dumps(argv), json.dumps(options or {}), QUEUED, retries + 1, retry_delay, 0, time.time()),
+    )
+    return cursor.lastrowid
+
+
+def claim(db, visibility_timeout):
+    """Lease the next visible job: returns the row (with the incremented attempts), or None."""
+    now = time.time()
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        # leases of dead workers expired, without attempts left
+        db.execute(
+            "UPDATE jobs SET state = ?, finished_at = ?, error = coalesce(error, 'lease expired')"
+            " WHERE state = ? AND visible_at <= ? AND attempts >= max_attempts",
+            (FAILED, now, RUNNING, now),
+        )
+        row = db.execute(
+            "SELECT id FROM jobs WHERE state IN (?, ?) AND visible_at <= ? ORDER BY id LIMIT 1",
+            (QUEUED, RUNNING, now),
+        ).fetchone()
+        if row is None:
+            db.execute("COMMIT")
+            return None
+        db.execute(
+            "UPDATE jobs SET state = ?, attempts = attempts + 1, visible_at = ?, started_at = ? WHERE id = ?",
+            (RUNNING, now + visibility_timeout, now, row["id"]),
+        )
+        job = db.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+        db.execute("COMMIT")
+        return job
+    except BaseException:
+        db.execute("ROLLBACK")
+        raise
+
+
+def extend_lease(db, job, visibility_timeout):
+    db.execute(
+        "UPDATE jobs SET visible_at = ? WHERE id = ? AND attempts = ? AND state = ?",
+        (time.time() + visibility_timeout, job["id"], job["attempts"], RUNNING),
+    )
+
+
+def complete(db, job, result):
+    # 'attempts' tells whether the lease is still ours, i.e. the job was not given to another worker meanwhile
+    db.execute(
+        "UPDATE jobs SET state = ?, finished_at = ?, result = ?, error = NULL WHERE id = ? AND attempts = ?",
+        (DONE, time.time(), json.dumps(result, default=str), job["id"], job["attempts"]),
+    )
+
+
+def fail(db, job, error):
+    now = time.time()
+    if job["attempts"] < job["max_attempts"]:
+        retry_at = now + job["retry_delay"] * 2 ** (job["attempts"] - 1)
+        db.execute(
+            "UPDATE jobs SET state = ?, visible_at = ?, error = ? WHERE id = ? AND attempts = ?",
+            (QUEUED, retry_at, error, job["id"], job["attempts"]),
+        )
+    else:
+        db.execute(
+            "UPDATE jobs SET state = ?, finished_at = ?, error = ? WHERE id = ? AND attempts = ?",
+            (FAILED, now, error, job["id"], job["attempts"]),
+        )
+
+
+def pending_count(db):
+    return db.execute("SELECT count(*) FROM jobs WHERE state IN (?, ?)", (QUEUED, RUNNING)).fetchone()[0]
+
+
+def run_job(job, options=None):
+    """Parse and dispatch the job the same way as a direct call, returns its result.
+
+    options: global options of the worker, the ones stored with the job take precedence
+    """
+    task_name = job["task"]
+    options = {**(options or {}), **json.loads(job["options"])}
+    parser = taskcli.build_parser_for_task(task_name)
+    config = taskcli.parse(parser, json.loads(job["argv"]))
+    if taskcli.tasks[task_name].deps:
+        from . import scheduler
+
+        scheduler.run_dependencies(task_name, options=options)
+    return taskcli.dispatch(config, task_name, options=options, record=True)
+
+
+class _LeaseKeeper(threading.Thread):
+    """Extends the lease of the running job, so long tasks aren't handed to another worker."""
+
+    def __init__(self, db_path, job, visibility_timeout):
+        super().__init__(daemon=True)
+        self.db_path = db_path
+        self.job = job
+        self.visibility_timeout = visibility_timeout
+        self.stopped = threading.Event()
+
+    def run(self):
+        db = connect(self.db_path)
+        try:
+            while not self.stopped.wait(self.visibility_timeout / 3):
+                extend_lease(db, self.job, self.visibility_timeout)
+        finally:
+            db.close()
+
+
+def work(db_path, visibility_timeout, drain=False, options=None):
+    """Run jobs until interrupted (or, with drain, until the queue is empty)."""
+    db = connect(db_path)
+    try:
+        while True:
+            job = claim(db, visibility_timeout)
+            if job is None:
+                if drain and pending_count(db) == 0:
+                    return
+                time.sleep(POLL_INTERVAL)
+                continue
+
+            keeper = _LeaseKeeper(db_path, job, visibility_timeout)
+            keeper.start()
+            try:
+                result = run_job(job, options)
+            except (Exception, SystemExit) as e:
+                error = traceback.format_exc() if isinstance(e, Exception) else f"SystemExit: {e.code}"
+                fail(db, job, error)
+            else:
+                complete(db, job, result)
+            finally:
+                keeper.stopped.set()
+    except KeyboardInterrupt:
+        pass  # the lease of the current job expires, and another worker takes it over
+    finally:
+        db.close()
+
+
+def run_workers(concurrency, visibility_timeout, drain=False, options=None):
+    db_path = state.state_path(DB_FILE)
+    connect(db_path).close()  # create the schema once, before the workers race to do it
+    if concurrency <= 1 or "fork" not in multiprocessing.get_all_start_methods():
+        work(db_path, visibility_timeout, drain, options)
+        return
+    # forked, so that the workers find the tasks in the registry without re-importing anything
+    context = multiprocessing.get_context("fork")
+    args = (db_path, visibility_timeout, drain, options)
+    workers = [context.Process(target=work, args=args) for _ in range(concurrency)]
+    for worker in workers:
+        worker.start()
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        for worker in workers:
+            worker.join()
+
+
+def _parser(prog, command):
+    parser = taskcli.ArgumentParser(prog=f"{prog} {command}")
+    if command == "enqueue":
+        parser.add_argument("--retries", type=int, default=2, help="retries of a failed job (default: 2)")
+        parser.add_argument("--retry-delay", type=float, default=1.0, help="seconds before the first retry")
+        parser.add_argument("task_argv", nargs=argparse.REMAINDER, metavar="TASK [ARGS...]")
+    elif command == "worker":
+        parser.add_argument("--concurrency", type=int, default=1, help="worker processes (0: one per CPU)")
+        parser.add_argument("--visibility-timeout", type=float, default=60.0, help="lease of a job, in seconds")
+        parser.add_argument("--drain", action="store_true", help="exit once the queue is empty")
+    else:
+        parser.add_argument("id", type=int, nargs="?", help="job to show, with its result")
+    return parser
+
+
+def _format_job(job):
+    took = f"{job['finished_at'] - job['started_at']:.3f}s" if job["finished_at"] and job["started_at"] else ""
+    args = " ".join(json.loads(job["argv"]))
+    return f"{job['id']:>6}  {job['state']:<8} {job['attempts']}/{job['max_attempts']}  {took:>9}  {job['task']} {args}"
+
+
+def cli(argv, options=None):
+    """'tool enqueue|worker|jobs ...', argv being the whole command line (without the global options)."""
+    prog = os.path.basename(argv[0])
+    command = argv[1]
+    args = _parser(prog, command).parse_args(argv[2:])
+
+    if command == "enqueue":
+        task_name, used = taskcli.tasks.select(args.task_argv)
+        if task_name is None:
+            raise taskcli.ParsingError(f"{prog} enqueue: expected a task name, got: {' '.join(args.task_argv)}")
+        task_argv = args.task_argv[used:]
+        taskcli.parse(taskcli.build_parser_for_task(task_name), task_argv)  # fail now rather than in the worker
+        db = connect()
+        job_id = enqueue(db, task_name, task_argv, retries=args.retries, retry_delay=args.retry_delay, options=options)
+        print(job_id)
+        db.close()
+    elif command == "worker":
+        concurrency = args.concurrency or os.cpu_count() or 1
+        run_workers(concurrency, args.visibility_timeout, drain=args.drain, options=options)
+    else:
+        db = connect()
+        if args.id is None:
+            for job in db.execute("SELECT * FROM jobs ORDER BY id"):
+                print(_format_job(job))
+        else:
+            job = db.execute("SELECT * FROM jobs WHERE id = ?", (args.id,)).fetchone()
+            if job is None:
+                sys.exit(f"No job {args.id}")
+            result = json.loads(job["result"]) if job["result"] is not None else None
+            print(json.dumps({**dict(job), "argv": json.loads(job["argv"]), "result": result}, indent=2))
+        db.close()
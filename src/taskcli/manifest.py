@@ -0,0 +1,285 @@
+"""On-disk manifest of the tasks defined in a script.
+
+The manifest stores everything cli() needs before calling a task (names, argparse kwargs,
+required_env, main flag) and is written next to the script as `.<script>.taskcli.json`.
+It is validated against the mtime/size of the source files, falling back to a content hash.
+
+With a valid manifest `python -m taskcli run SCRIPT ...` prints help, lists tasks and
+validates arguments without importing the script at all. The script is imported only
+right before the selected task is called.
+"""
+
+import hashlib
+import importlib.machinery
+import importlib.util
+import json
+import logging
+import os
+import sys
+
+from . import history, iterparams, mapped, taskcli
+
+log = logging.getLogger("taskcli")
+
+MANIFEST_VERSION = 3
+
+# argparse 'type' values which can be stored in the manifest
+TYPES = {
+    "int": int,
+    "str": str,
+    "float": float,
+    "bool": bool,
+    "iterator[int]": iterparams.elements_of(int),
+    "iterator[str]": iterparams.elements_of(str),
+    "iterator[float]": iterparams.elements_of(float),
+    "mapped_file": mapped.MappedFile,
+}
+TYPE_NAMES = {v: k for k, v in TYPES.items()}
+
+# absolute script path -> imported module
+loaded_scripts = {}
+
+
+class ManifestError(Exception):
+    pass
+
+
+def manifest_path(script_path):
+    script_dir, script_name = os.path.split(os.path.abspath(script_path))
+    return os.path.join(script_dir, f".{script_name}.taskcli.json")
+
+
+def import_script(script_path):
+    """Import a tasks script as a module, without running the cli() call inside of it."""
+    script_path = os.path.abspath(script_path)
+    history.script_path = script_path
+    if script_path in loaded_scripts:
+        return loaded_scripts[script_path]
+
+    module_name = os.path.splitext(os.path.basename(script_path))[0].replace("-", "_").replace(".", "_")
+    # Explicit loader, so that scripts without the .py extension can be imported too
+    loader = importlib.machinery.SourceFileLoader(module_name, script_path)
+    spec = importlib.util.spec_from_file_location(module_name, script_path, loader=loader)
+    module = importlib.util.module_from_spec(spec)
+
+    # Same as when running 'python script.py'
+    script_dir = os.path.dirname(script_path)
+    if script_dir not in sys.path:
+        sys.path.insert(0, script_dir)
+
+    sys.modules[module_name] = module
+    taskcli._cli_disabled = True
+    try:
+        spec.loader.exec_module(module)
+    finally:
+        taskcli._cli_disabled = False
+
+    loaded_scripts[script_path] = module
+    return module
+
+
+def _file_info(path, with_hash=True):
+    st = os.stat(path)
+    info = {"path": path, "mtime_ns": st.st_mtime_ns, "size": st.st_size}
+    if with_hash:
+        info["sha256"] = _hash_file(path)
+    return info
+
+
+def _hash_file(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _is_plain(value):
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return True
+    if isinstance(value, (list, tuple)):
+        return all(_is_plain(v) for v in value)
+    return False
+
+
+def _encode_kwargs(task_name, ap_kwargs):
+    encoded = {}
+    for key, value in ap_kwargs.items():
+        if key == "type" and value is not None:
+            if value not in TYPE_NAMES:
+                raise ManifestError(f"Task {task_name}: type {value!r} cannot be stored in the manifest")
+            value = TYPE_NAMES[value]
+        elif not _is_plain(value):
+            raise ManifestError(f"Task {task_name}: {key}={value!r} cannot be stored in the manifest")
+        encoded[key] = value
+    return encoded
+
+
+def _decode_kwargs(encoded):
+    ap_kwargs = dict(encoded)
+    if ap_kwargs.get("type") is not None:
+        ap_kwargs["type"] = TYPES[ap_kwargs["type"]]
+    return ap_kwargs
+
+
+def _source_files():
+    """Source files of all modules which define the currently registered tasks."""
+    paths = []
+    for task in taskcli.tasks.values():
+        module = sys.modules.get(task.signature.get("module"))
+        path = getattr(module, "__file__", None)
+        if path and os.path.abspath(path) not in paths:
+            paths.append(os.path.abspath(path))
+    return paths
+
+
+def build_manifest(script_path):
+    """Build the manifest from the (already imported) tasks in the registry."""
+    entries = []
+    for task in taskcli.tasks.values():
+        if not task.task_decorator_seen:
+            continue
+        required_env = list(task.required_env) if task.required_env else None
+        if not task.params_known:
+            # registered with register_lazy(), keep it lazy
+            entries.append(
+                {
+                    "name": task.name,
+                    "lazy_target": task.signature["lazy_target"],
+                    "is_main": task.is_main,
+                    "aliases": task.aliases,
+                    "required_env": required_env,
+                    "description": task.description,
+                }
+            )
+            continue
+        entries.append(
+            {
+                "name": task.name,
+                "namespace": task.namespace,
+                "module": task.signature["module"],
+                "is_main": task.is_main,
+                "aliases": task.aliases,
+                "required_env": required_env,
+                "description": task.description,
+                "deps": task.deps,
+                "data_params": {k: _encode_kwargs(task.name, v) for k, v in task.data_params.items()},
+                "data_args": {k: _encode_kwargs(task.name, v) for k, v in task.data_args.items()},
+            }
+        )
+
+    sources = [os.path.abspath(script_path)]
+    sources += [path for path in _source_files() if path not in sources]
+    return {
+        "version": MANIFEST_VERSION,
+        "sources": [_file_info(path) for path in sources],
+        "tasks": entries,
+        "namespaces": taskcli.tasks.lazy_groups(),
+    }
+
+
+def write_manifest(script_path, manifest):
+    path = manifest_path(script_path)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        # e.g. read-only directory, just don't cache
+        log.debug(f"Could not write manifest {path}: {e}")
+
+
+def load_manifest(script_path):
+    """Return the manifest of the script, or None if missing or stale."""
+    path = manifest_path(script_path)
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if manifest.get("version") != MANIFEST_VERSION:
+        return None
+
+    touched = False
+    for source in manifest["sources"]:
+        try:
+            current = _file_info(source["path"], with_hash=False)
+        except OSError:
+            return None
+        if current["mtime_ns"] == source["mtime_ns"] and current["size"] == source["size"]:
+            continue
+        if current["size"] != source["size"] or _hash_file(source["path"]) != source["sha256"]:
+            return None
+        # content unchanged (e.g. file was only touched), remember the new mtime to skip hashing next time
+        source["mtime_ns"] = current["mtime_ns"]
+        touched = True
+
+    if touched:
+        write_manifest(script_path, manifest)
+    return manifest
+
+
+def install_stubs(manifest, script_path):
+    """Register stub tasks from the manifest, the script gets imported when a task is dispatched."""
+    script_path = os.path.abspath(script_path)
+
+    def load():
+        import_script(script_path)
+
+    for entry in manifest["tasks"]:
+        if "lazy_target" in entry:
+            taskcli.register_lazy(
+                entry["lazy_target"],
+                main=entry["is_main"],
+                aliases=entry["aliases"],
+                required_env=entry["required_env"],
+                description=entry["description"],
+            )
+            continue
+        task = taskcli.Task()
+        task.signature = {"func_name": entry["name"].rpartition(".")[2], "module": entry["module"], "params": {}}
+        task.namespace = entry["namespace"]
+        task.data_params = {k: _decode_kwargs(v) for k, v in entry["data_params"].items()}
+        task.data_args = {k: _decode_kwargs(v) for k, v in entry["data_args"].items()}
+        task.required_env = entry["required_env"]
+        task.is_main = entry["is_main"]
+        task.aliases = entry["aliases"]
+        task.description = entry["description"]
+        task.deps = entry["deps"]
+        task.task_decorator_seen = True
+        task.loader = load
+        task.compile_spec()
+        taskcli.tasks[entry["name"]] = task
+    for namespace, module_name in manifest["namespaces"].items():
+        taskcli.register_namespace(namespace, module_name)
+    taskcli.invalidate_parsers()
+
+
+def load_tasks(script_path):
+    """Fill the registry with the tasks of the script, from its manifest if it's still valid.
+
+    Returns the manifest, or None if the script could not be described by one.
+    """
+    manifest = load_manifest(script_path)
+    if manifest is not None:
+        install_stubs(manifest, script_path)
+        return manifest
+
+    log.debug(f"No valid manifest for {script_path}, importing it")
+    import_script(script_path)
+    try:
+        manifest = build_manifest(script_path)
+    except ManifestError as e:
+        log.debug(f"Not writing manifest: {e}")
+        return None
+    write_manifest(script_path, manifest)
+    return manifest
+
+
+def run(script_path, argv):
+    """Run the tasks script, using (and refreshing) its manifest.
+
+    argv: full argv, argv[0] being the script.
+    """
+    history.script_path = os.path.abspath(script_path)
+    load_tasks(script_path)
+    return taskcli.cli(argv=argv)
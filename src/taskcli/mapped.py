@@ -0,0 +1,111 @@
+"""Memory-mapped file params, e.g. `def scan(image: MappedFile)` or `def scan(image: memoryview)`.
+
+Such a param becomes an option taking a path. The task gets a read-only memory map of the file
+instead of the bytes, so nothing is copied until the task touches the pages it needs. A MappedFile
+is mapped on first use; a memoryview param is mapped right before the task is called. Both are
+closed after dispatch() returns.
+"""
+
+import contextlib
+import logging
+import mmap
+import os
+
+log = logging.getLogger("taskcli")
+
+
+class MappedFile:
+    """Read-only memory map of a file, mapped on first use.
+
+    Behaves like the mmap.mmap object (len(), slicing, find(), readline(), ...);
+    view() returns a zero-copy memoryview of the whole file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+        self._map = None
+
+    def _mapped(self):
+        if self._map is None:
+            self._file = open(self.path, "rb")
+            try:
+                self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                self._map = b""  # empty files can't be mapped
+        return self._map
+
+    def view(self):
+        return memoryview(self._mapped())
+
+    def __len__(self):
+        return len(self._mapped())
+
+    def __getitem__(self, index):
+        return self._mapped()[index]
+
+    def __getattr__(self, name):
+        # find(), rfind(), readline(), read(), seek(), ... of the mmap
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self._mapped(), name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if isinstance(self._map, mmap.mmap):
+            try:
+                self._map.close()
+            except BufferError:
+                # the task kept a memoryview of it, the map is released once that's garbage collected
+                log.debug(f"{self.path} is still in use, not unmapping it")
+        if self._file is not None:
+            self._file.close()
+        self._map = self._file = None
+
+    def __repr__(self):
+        # used in cache and up-to-date keys, together with fingerprint()
+        return f"MappedFile({self.path!r})"
+
+    def fingerprint(self):
+        """(mtime_ns, size) of the file, for cache and up-to-date keys."""
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+
+PARAM_TYPES = [MappedFile, memoryview]
+
+
+@contextlib.contextmanager
+def mapped_kwargs(task, kwargs):
+    """Yield the kwargs to call the task with (memoryview params mapped), and close all maps afterwards."""
+    files = [value for value in kwargs.values() if isinstance(value, MappedFile)]
+    if not files:
+        yield kwargs
+        return
+
+    views = []
+    call_kwargs = dict(kwargs)
+    params = task.signature.get("params", {})
+    for name, value in kwargs.items():
+        if isinstance(value, MappedFile) and params.get(name, {}).get("type") is memoryview:
+            call_kwargs[name] = value.view()
+            views.append(call_kwargs[name])
+    try:
+        yield call_kwargs
+    finally:
+        del call_kwargs
+        for view in views:
+            try:
+                view.release()
+            except BufferError:
+                pass  # sliced by the task, still referenced
+        for f in files:
+            f.close()
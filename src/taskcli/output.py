@@ -0,0 +1,116 @@
+"""Writing the records returned by a task, see the global --output jsonl|csv|raw option.
+
+A task can return (or be) a generator, its records are written one by one as they are produced,
+never collected into a list. Output goes through a buffer which is flushed when it's full or
+when FLUSH_INTERVAL passed since the last flush, so a slow producer still shows its progress.
+
+  jsonl  one JSON document per record (non-JSON values are written as strings)
+  csv    one row per record; dicts get a header line made from the keys of the first one
+  raw    str() of each record, one per line
+
+If the reader goes away (e.g. `tool --output jsonl export | head`), the generator is closed and
+the process exits quietly with status 141, same as a command killed by SIGPIPE.
+"""
+
+import csv
+import json
+import os
+import sys
+import time
+
+MODES = ["jsonl", "csv", "raw"]
+BUFFER_SIZE = 64 * 1024  # characters
+FLUSH_INTERVAL = 1.0  # seconds
+EXIT_BROKEN_PIPE = 141  # 128 + SIGPIPE
+
+
+class BufferedWriter:
+    """Collects writes, and passes them to the stream in big chunks."""
+
+    def __init__(self, stream, buffer_size=BUFFER_SIZE, flush_interval=FLUSH_INTERVAL):
+        self.stream = stream
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self._parts = []
+        self._size = 0
+        self._last_flush = time.monotonic()
+
+    def write(self, text):
+        self._parts.append(text)
+        self._size += len(text)
+        if self._size >= self.buffer_size or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+        return len(text)
+
+    def flush(self):
+        if self._parts:
+            data = "".join(self._parts)
+            self._parts = []
+            self._size = 0
+            self.stream.write(data)
+        self.stream.flush()
+        self._last_flush = time.monotonic()
+
+
+def records_of(result):
+    """The records of the task's result: the items of an iterable (but not of a str, bytes or dict)."""
+    if result is None:
+        return []
+    if isinstance(result, (str, bytes, dict)) or not hasattr(result, "__iter__"):
+        return [result]
+    return result
+
+
+def _write_jsonl(records, writer):
+    dumps = json.JSONEncoder(separators=(",", ":"), default=str).encode
+    for record in records:
+        writer.write(dumps(record) + "\n")
+
+
+def _write_csv(records, writer):
+    rows = csv.writer(writer, lineterminator="\n")
+    header = None
+    for record in records:
+        if isinstance(record, dict):
+            if header is None:
+                header = list(record)
+                rows.writerow(header)
+            rows.writerow([record.get(key, "") for key in header])
+        elif isinstance(record, (list, tuple)):
+            rows.writerow(record)
+        else:
+            rows.writerow([record])
+
+
+def _write_raw(records, writer):
+    for record in records:
+        if isinstance(record, bytes):
+            record = record.decode(errors="replace")
+        writer.write(f"{record}\n")
+
+
+WRITERS = {"jsonl": _write_jsonl, "csv": _write_csv, "raw": _write_raw}
+
+
+def _exit_on_broken_pipe(stream):
+    # Python would complain about the broken pipe again when flushing stdout at exit
+    try:
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, stream.fileno())
+    except (OSError, ValueError, AttributeError):
+        pass
+    sys.exit(EXIT_BROKEN_PIPE)
+
+
+def write(result, mode, stream=None):
+    """Write the records of the task's result to the stream (stdout by default)."""
+    stream = stream if stream is not None else sys.stdout
+    records = records_of(result)
+    writer = BufferedWriter(stream)
+    try:
+        WRITERS[mode](records, writer)
+        writer.flush()
+    except BrokenPipeError:
+        if hasattr(records, "close"):
+            records.close()  # runs the generator's cleanup (finally blocks, context managers)
+        _exit_on_broken_pipe(stream)
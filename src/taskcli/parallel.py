@@ -0,0 +1,147 @@
+"""Data-parallel tasks, see @task(parallel_over="items", jobs=N).
+
+The values of the list param are split into chunks, and the function is called once per chunk
+(with the chunk as the param's value) in a pool of `jobs` processes. The results of the chunks
+are merged in the order of the values: lists (and tuples) are concatenated, None results give
+None. Other results can't be merged without knowing where the chunks were split (and would differ
+with the number of jobs), so they are an error.
+
+Chunks start small and are resized as they complete, so that each one takes about
+TARGET_CHUNK_SECONDS: cheap items get batched, expensive ones are spread over all the workers.
+The global --jobs option overrides the pool size of the task.
+
+Workers are forked, and find the task in the registry they inherited from the parent, so the
+function doesn't need to be importable (or picklable). Where fork is not available, or while
+other threads are running (a forked child would inherit the locks they hold, e.g. when the task
+runs as one of several dependencies with --jobs), the chunks run one after the other in the
+calling process.
+"""
+
+import contextlib
+import contextvars
+import inspect
+import logging
+import os
+import threading
+import time
+
+log = logging.getLogger("taskcli")
+
+TARGET_CHUNK_SECONDS = 0.1
+CHUNKS_PER_WORKER = 2  # in flight at the same time, so that workers don't wait for the next chunk
+
+# --jobs of the current dispatch(), overrides @task(jobs=...)
+_jobs_override = contextvars.ContextVar("taskcli_jobs_override", default=None)
+
+
+@contextlib.contextmanager
+def override_jobs(jobs):
+    token = _jobs_override.set(jobs)
+    try:
+        yield
+    finally:
+        _jobs_override.reset(token)
+
+
+def pool_size(task):
+    jobs = _jobs_override.get()
+    if jobs is None:
+        jobs = task.jobs
+    return jobs or os.cpu_count() or 1  # None or 0 means number of CPUs
+
+
+def merge(task, results):
+    if all(result is None for result in results):
+        return None
+    for result in results:
+        if not isinstance(result, (list, tuple)):
+            raise Exception(
+                f"Task {task.name}: with parallel_over, the function must return a list (or tuple) of the results of "
+                f"the items of its chunk, or None; got {type(result).__name__}"
+            )
+    return [item for result in results for item in result]
+
+
+class ChunkSizer:
+    """Chunk sizes aiming at TARGET_CHUNK_SECONDS per chunk, from the time the completed ones took."""
+
+    def __init__(self, total, jobs):
+        self.jobs = jobs
+        self.size = max(1, min(16, total // (jobs * CHUNKS_PER_WORKER)))
+        self._items = 0
+        self._seconds = 0.0
+
+    def completed(self, items, seconds):
+        self._items += items
+        self._seconds += seconds
+        if self._seconds > 0:
+            self.size = max(1, int(TARGET_CHUNK_SECONDS * self._items / self._seconds))
+
+    def next_size(self, remaining):
+        # never more than a fair share of what's left, so the last chunks don't run on a single worker
+        return max(1, min(self.size, -(-remaining // self.jobs)))
+
+
+def _other_threads_alive():
+    # taskcli's event loop thread waits in its selector between async tasks, it holds no locks then
+    current = threading.current_thread()
+    return any(t is not current and t.name != "taskcli-event-loop" for t in threading.enumerate())
+
+
+def _can_fork():
+    import multiprocessing
+
+    if "fork" not in multiprocessing.get_all_start_methods():
+        return False
+    if _other_threads_alive():
+        log.debug("Other threads are running, not forking: the chunks run in this process")
+        return False
+    return True
+
+
+def _run_chunk(task_name, param, kwargs, chunk):
+    from . import taskcli
+
+    fn = taskcli.tasks[task_name].wrapper.__wrapped__
+    start = time.perf_counter()
+    result = fn(**kwargs, **{param: chunk})
+    return result, time.perf_counter() - start
+
+
+def run(task, fn, args, kwargs):
+    """Call the function of the task over chunks of its parallel_over param, returns the merged results."""
+    import concurrent.futures
+    import multiprocessing
+
+    bound = inspect.signature(fn).bind(*args, **kwargs)
+    bound.apply_defaults()
+    kwargs = dict(bound.arguments)
+    param = task.parallel_over
+    items = list(kwargs.pop(param) or [])
+    jobs = pool_size(task)
+
+    if jobs <= 1 or len(items) <= 1 or not _can_fork():
+        return merge(task, [fn(**kwargs, **{param: items})])
+
+    sizer = ChunkSizer(len(items), jobs)
+    results = {}  # index of the first item -> result of the chunk
+    pending = {}  # future -> (index of the first item, number of items)
+    start = 0
+    pool = concurrent.futures.ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context("fork"))
+    try:
+        while start < len(items) or pending:
+            while start < len(items) and len(pending) < jobs * CHUNKS_PER_WORKER:
+                chunk = items[start : start + sizer.next_size(len(items) - start)]
+                pending[pool.submit(_run_chunk, task.name, param, kwargs, chunk)] = (start, len(chunk))
+                start += len(chunk)
+            done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                index, count = pending.pop(future)
+                results[index], seconds = future.result()
+                sizer.completed(count, seconds)
+    except BaseException:
+        pool.shutdown(wait=True, cancel_futures=True)
+        raise
+    pool.shutdown()
+    log.debug(f"Task {task.name}: {len(items)} items in {len(results)} chunks on {jobs} processes")
+    return merge(task, [results[index] for index in sorted(results)])
@@ -0,0 +1,105 @@
+"""Profiling of the tasks and of taskcli itself, see the --taskcli-profile[=FILE] option.
+
+The option can be given anywhere on the command line. The invocation runs under cProfile;
+the top functions by cumulative time are printed to stderr, or all the stats are dumped to
+FILE (a .pstats file, see `python -m pstats FILE`). Time spent in taskcli's own phases
+(decorating, building parsers, parsing, dispatching) is reported separately from the time
+spent in the tasks. Decoration happens at import, so it's only timed if the option is in sys.argv.
+"""
+
+import contextlib
+import functools
+import sys
+import threading
+import time
+
+OPTION = "--taskcli-profile"
+TOP_N = 30
+PHASES = ["decoration", "build_parser_for_task", "parse", "dispatch", "task"]
+
+
+def _is_option(arg):
+    return arg == OPTION or arg.startswith(f"{OPTION}=")
+
+
+enabled = any(_is_option(arg) for arg in sys.argv)
+timings = {}  # phase -> [seconds, calls]
+_lock = threading.Lock()
+
+
+def _add(phase, seconds):
+    with _lock:
+        timing = timings.setdefault(phase, [0.0, 0])
+        timing[0] += seconds
+        timing[1] += 1
+
+
+class _Phase:
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        _add(self.name, time.perf_counter() - self.start)
+
+
+def phase(name):
+    """Context manager timing a phase, a no-op unless profiling."""
+    return _Phase(name) if enabled else contextlib.nullcontext()
+
+
+def timed(name):
+    """Decorator timing every call of the function as the given phase."""
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return fn(*args, **kwargs)
+            with _Phase(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def pop_option(argv):
+    """Return (profiling requested, FILE or None, argv without the option)."""
+    rest = [arg for arg in argv if not _is_option(arg)]
+    if len(rest) == len(argv):
+        return False, None, argv
+    values = [arg.partition("=")[2] for arg in argv if _is_option(arg)]
+    return True, values[-1] or None, rest
+
+
+def format_timings():
+    lines = ["taskcli phases (ms):"]
+    for name in PHASES:
+        seconds, calls = timings.get(name, (0.0, 0))
+        lines.append(f"  {name:<24} {seconds * 1000:10.2f}  ({calls} calls)")
+    framework = sum(timings.get(name, (0.0, 0))[0] for name in PHASES[:-2])
+    dispatch_overhead = timings.get("dispatch", (0.0, 0))[0] - timings.get("task", (0.0, 0))[0]
+    lines.append(f"  {'taskcli overhead':<24} {(framework + dispatch_overhead) * 1000:10.2f}")
+    return "\n".join(lines)
+
+
+def run_profiled(path, fn, *args, **kwargs):
+    """Call fn under cProfile, then report to stderr (or dump the stats to path)."""
+    import cProfile
+    import pstats
+
+    global enabled
+    enabled = True
+    profile = cProfile.Profile()
+    try:
+        return profile.runcall(fn, *args, **kwargs)
+    finally:
+        print(format_timings(), file=sys.stderr)
+        if path:
+            profile.dump_stats(path)
+            print(f"Profile written to {path}, see: python -m pstats {path}", file=sys.stderr)
+        else:
+            pstats.Stats(profile, stream=sys.stderr).sort_stats("cumulative").print_stats(TOP_N)
@@ -0,0 +1,109 @@
+"""Persistent memoization of task results, see @task(cache=True).
+
+Results are pickled to `.taskcli/cache/<task>/<key>.pickle`, the key being a hash of the
+task name, the parsed arguments and the source code of the function, so editing the task
+invalidates its cache. Each hit refreshes the mtime of the entry; when the entries of a task
+take more than cache_max_bytes, the least recently used ones are removed.
+"""
+
+import hashlib
+import inspect
+import logging
+import marshal
+import os
+import pickle
+import time
+
+from . import state, uptodate
+
+log = logging.getLogger("taskcli")
+
+DEFAULT_MAX_BYTES = 100 * 1024 * 1024
+
+MISSING = object()
+
+_fingerprints = {}  # function -> fingerprint of its code, the source is read once per process
+
+
+def code_fingerprint(fn):
+    fingerprint = _fingerprints.get(fn)
+    if fingerprint is None:
+        try:
+            code = inspect.getsource(fn).encode()
+        except (OSError, TypeError):
+            code = marshal.dumps(fn.__code__)
+        fingerprint = _fingerprints[fn] = hashlib.sha256(code).hexdigest()
+    return fingerprint
+
+
+def cache_key(task, kwargs):
+    """Key of the cached result, None if the result can't be cached (e.g. the task reads stdin)."""
+    call = uptodate.call_repr((), kwargs)
+    if call is None:
+        return None
+    data = repr((task.name, call, code_fingerprint(task.signature["func"])))
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def _task_dir(task):
+    return state.state_path("cache", f"{task.signature['module']}.{task.name}")
+
+
+def get(task, key):
+    """Return the cached result, or MISSING."""
+    path = os.path.join(_task_dir(task), f"{key}.pickle")
+    try:
+        with open(path, "rb") as f:
+            created_at, result = pickle.load(f)
+    except FileNotFoundError:
+        return MISSING
+    except Exception as e:
+        log.debug(f"Ignoring unreadable cache entry {path}: {e}")
+        return MISSING
+
+    if task.cache_ttl is not None and time.time() - created_at > task.cache_ttl:
+        log.debug(f"Cache entry of task {task.name} expired")
+        return MISSING
+
+    os.utime(path)  # mark as recently used
+    return result
+
+
+def put(task, key, result):
+    try:
+        data = pickle.dumps((time.time(), result))
+    except Exception as e:
+        log.debug(f"Not caching result of task {task.name}, it can't be pickled: {e}")
+        return
+    if len(data) > task.cache_max_bytes:
+        log.debug(f"Not caching result of task {task.name}, it's larger than cache_max_bytes")
+        return
+
+    task_dir = _task_dir(task)
+    os.makedirs(task_dir, exist_ok=True)
+    path = os.path.join(task_dir, f"{key}.pickle")
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    evict(task)
+
+
+def evict(task):
+    """Remove least recently used entries until the cache of the task fits in cache_max_bytes."""
+    entries = []
+    with os.scandir(_task_dir(task)) as it:
+        for entry in it:
+            if entry.name.endswith(".pickle"):
+                st = entry.stat()
+                entries.append((st.st_mtime_ns, st.st_size, entry.path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= task.cache_max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass  # removed concurrently
+        total -= size
@@ -0,0 +1,202 @@
+"""Running task dependencies declared with @task(deps=[...]), and chains of tasks.
+
+Dependencies form a DAG over the task registry. All the (transitive) dependencies of the
+selected task are run before it, each one at most once per invocation. With jobs > 1
+dependencies which don't depend on each other run concurrently on a thread pool.
+"""
+
+import logging
+import os
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from . import taskcli
+
+log = logging.getLogger("taskcli")
+
+
+def dependency_graph(task_name):
+    """Return {task name: [its deps]} for the task and all of its transitive dependencies."""
+    graph = {}
+    to_visit = deque([task_name])
+    while to_visit:
+        name = to_visit.popleft()
+        if name in graph:
+            continue
+        if name not in taskcli.tasks:
+            requiring = [n for n, deps in graph.items() if name in deps]
+            raise Exception(f"Task {requiring[0]} depends on '{name}', which is not a known task.")
+        task = taskcli.tasks[name]
+        if not task.params_known:
+            task = taskcli.resolve_task(name)
+        graph[name] = list(task.deps)
+        to_visit += task.deps
+    _check_for_cycles(graph, task_name)
+    return graph
+
+
+def _check_for_cycles(graph, start):
+    IN_PROGRESS, DONE = 1, 2
+    state = {}
+
+    def visit(name, path):
+        state[name] = IN_PROGRESS
+        for dep in graph[name]:
+            if state.get(dep) == IN_PROGRESS:
+                cycle = path[path.index(dep) :] + [dep]
+                raise Exception(f"Dependency cycle between tasks: {' -> '.join(cycle)}")
+            if state.get(dep) is None:
+                visit(dep, path + [dep])
+        state[name] = DONE
+
+    visit(start, [start])
+
+
+def topological_order(graph):
+    """Names in the graph, each one after all of its deps (stable, in declaration order)."""
+    order = []
+    seen = set()
+
+    def visit(name):
+        if name in seen:
+            return
+        seen.add(name)
+        for dep in graph[name]:
+            visit(dep)
+        order.append(name)
+
+    for name in graph:
+        visit(name)
+    return order
+
+
+def _check_runnable_without_args(name, required_by):
+    for arg_spec in taskcli.tasks[name].spec:
+        IS_POSITIONAL = not arg_spec.names[0].startswith("-")
+        if IS_POSITIONAL or arg_spec.kwargs.get("required"):
+            raise Exception(
+                f"Task {name} (dependency of {required_by}) has required arguments, "
+                "tasks used as dependencies must be callable without arguments."
+            )
+
+
+def run_task_with_defaults(name, options=None):
+    parser = taskcli.build_parser_for_task(name)
+    config = taskcli.parse(parser, [])
+    return taskcli.dispatch(config, name, options=options)
+
+
+def _prepare(names, required_by):
+    # load and build everything up front, so that worker threads only parse and dispatch
+    for name in names:
+        taskcli.resolve_task(name)
+        _check_runnable_without_args(name, required_by)
+        taskcli.build_parser_for_task(name)
+
+
+def _run_graph(graph, run, jobs):
+    """Call run(name) for each name of the graph after all of its deps in the graph, returns {name: result}.
+
+    jobs: max number of names running at the same time (on a thread pool if > 1). Once one of them
+    fails nothing new is started, its exception is raised when the running ones finished.
+    """
+    results = {}
+    if jobs == 1:
+        for name in topological_order(graph):
+            results[name] = run(name)
+        return results
+
+    dependents = {name: [] for name in graph}
+    for name, deps in graph.items():
+        for dep in deps:
+            dependents[dep].append(name)
+    waiting_for = {name: set(deps) for name, deps in graph.items()}
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        running = {}
+        ready = [name for name in topological_order(graph) if not waiting_for[name]]
+        error = None
+        while ready or running:
+            for name in ready:
+                running[pool.submit(run, name)] = name
+            ready = []
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                if future.exception() is not None:
+                    # don't start anything new, let the ones already running finish
+                    error = error or future.exception()
+                    continue
+                results[name] = future.result()
+                for dependent in dependents[name]:
+                    waiting_for[dependent].discard(name)
+                    if not waiting_for[dependent] and error is None:
+                        ready.append(dependent)
+        if error is not None:
+            raise error
+    return results
+
+
+def _run_dependency(name, options):
+    log.debug(f"Running dependency {name}")
+    return run_task_with_defaults(name, options)
+
+
+def run_dependencies(task_name, options=None, done=None):
+    """Run all dependencies of the task (not the task itself).
+
+    options: taskcli's global options, 'jobs' is the max number of dependencies running
+        at the same time (0 means number of CPUs).
+    done: set of task names already run in this invocation, updated in place.
+    """
+    options = options or {}
+    jobs = options.get("jobs", 1)
+    if done is None:
+        done = set()
+    graph = dependency_graph(task_name)
+    del graph[task_name]
+    pending = {name: [d for d in deps if d not in done] for name, deps in graph.items() if name not in done}
+    _prepare(pending, task_name)
+    if not pending:
+        return done
+
+    if jobs == 0:
+        jobs = os.cpu_count() or 1
+    done.update(_run_graph(pending, lambda name: _run_dependency(name, options), jobs))
+    return done
+
+
+def run_chain(parsed, options=None):
+    """Run several tasks given on one command line ('tool a -- b -- c'), returns the list of their results.
+
+    parsed: list of (task name, parsed config).
+    The chained tasks and all of their dependencies form one graph, in which every task runs at most
+    once: a chained task which another one depends on runs with its own arguments, before it. The
+    tasks run one after the other (in the order of the chain, where dependencies allow), or with the
+    global --parallel option each one as soon as its dependencies finished.
+    """
+    options = options or {}
+    segments = {}  # chained task -> indexes of its segments in the chain
+    for i, (task_name, _) in enumerate(parsed):
+        segments.setdefault(task_name, []).append(i)
+
+    graph = {task_name: [] for task_name in segments}  # the chained tasks first, to keep their order
+    for task_name in segments:
+        if taskcli.tasks[task_name].deps:
+            task_graph = dependency_graph(task_name)
+            _prepare([name for name in task_graph if name not in graph], task_name)
+            graph.update(task_graph)
+
+    def run(name):
+        if name not in segments:
+            return _run_dependency(name, options)
+        return [taskcli.dispatch(parsed[i][1], name, options=options, record=True) for i in segments[name]]
+
+    jobs = len(graph) if options.get("parallel") else 1
+    results = _run_graph(graph, run, jobs)
+    chain_results = [None] * len(parsed)
+    for task_name, indexes in segments.items():
+        for i, result in zip(indexes, results[task_name]):
+            chain_results[i] = result
+    return chain_results
@@ -0,0 +1,33 @@
+"""Local state of taskcli (fingerprints, caches, ...), kept in `.taskcli/` in the current directory.
+
+The location can be changed with the TASKCLI_STATE_DIR environment variable.
+"""
+
+import json
+import os
+
+
+def state_dir():
+    path = os.environ.get("TASKCLI_STATE_DIR") or os.path.join(os.getcwd(), ".taskcli")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def state_path(*parts):
+    return os.path.join(state_dir(), *parts)
+
+
+def read_json(path, default=None):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def write_json(path, data):
+    """Write atomically, so that concurrent readers never see a partially written file."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
@@ -1,13 +1,20 @@
 from collections.abc import Callable, Iterable, Sequence
 from email.policy import default
+import contextlib
 import functools
 from math import e, exp
 import os
 import inspect
 import argparse
+import importlib
+import threading
+from types import MappingProxyType
+from typing import NamedTuple, get_origin
 
 import logging
 
+from . import argfile, envreq, history, iterparams, mapped, parallel, profiling, resultcache, usage, uptodate
+
 log = logging.getLogger("taskcli")
 
 
@@ -18,14 +25,83 @@ class Task:
         self.data_params = {}  # data for argparse parsed from the raw function signature (from parameters)
         self.required_env = None
         self.is_main = False
+        self.aliases = []  # other names the task can be invoked by
+        self.namespace = None  # group of the task, e.g. "db" for 'tool db migrate', see register_namespace()
+        self.description = None  # one-line description for listings, known even before the task is loaded
+        self.deps = []  # names of tasks to run before this one, see scheduler.py
+        self.sources = []  # globs, the task is skipped if none of the matching files changed, see uptodate.py
+        self.outputs = []  # globs, which all must match some file for the task to be skipped
+        self.wrapper = None  # the function returned by the @task decorator
+        self.cache = False  # memoize results on disk, see resultcache.py
+        self.cache_ttl = None  # seconds
+        self.cache_max_bytes = None
+        self.parallel_over = None  # name of the list param whose values are processed in parallel, see parallel.py
+        self.jobs = None  # processes for parallel_over, None means number of CPUs
 
         # To support decorators being in a different order, and throw errors if @task decorator is specified twice.
         self.task_decorator_seen = False
 
+        self._spec = None  # compiled argparse spec, see compile_spec()
+
+        # Set for stub tasks, i.e. ones whose metadata is known but whose module was not imported yet.
+        # Calling it must import the module, so that the real @task decorator replaces the stub.
+        self.loader = None
+
     @property
     def name(self):
+        """Key in the registry, the function name qualified by the namespace ("db.migrate")."""
+        if self.namespace:
+            return f"{self.namespace}.{self.signature['func_name']}"
         return self.signature["func_name"]
 
+    @property
+    def env_requirements(self):
+        """Compiled required_env, see envreq.py."""
+        return envreq.compile(self.required_env)
+
+    @property
+    def display_name(self):
+        """How the task is typed on the command line ("db migrate")."""
+        return " ".join(part.replace("_", "-") for part in self.name.split("."))
+
+    @property
+    def is_stub(self):
+        return self.loader is not None
+
+    @property
+    def params_known(self):
+        # False for tasks registered via register_lazy(), until they are loaded
+        return "params" in self.signature
+
+    @property
+    def spec(self):
+        """Compiled parser spec, a tuple of ArgSpec (one per function param)."""
+        if self._spec is None:
+            self.compile_spec()
+        return self._spec
+
+    def compile_spec(self):
+        """Freeze data_params/data_args into an immutable spec.
+
+        Called by the decorators each time they change the task, so that building a parser
+        never has to copy (or otherwise touch) the raw dicts again.
+        """
+        specs = []
+        for param_name in self.data_params.keys():
+            DEFINED_VIA_ARG_DECORATOR = param_name in self.data_args
+            if DEFINED_VIA_ARG_DECORATOR:
+                ap_kwargs = dict(self.data_args[param_name])
+            else:
+                ap_kwargs = dict(self.data_params[param_name])
+            names = tuple(ap_kwargs.pop("param_names"))
+            if argfile.supports(ap_kwargs):
+                # list arguments accept '@FILE', converted in bulk by the action instead of per value by argparse
+                element_type = ap_kwargs.pop("type", None)
+                ap_kwargs["action"] = functools.partial(argfile.ArgFileAction, element_type=element_type)
+            specs.append(ArgSpec(names=names, kwargs=MappingProxyType(ap_kwargs)))
+        self._spec = tuple(specs)
+        return self._spec
+
     def has_positional_args(self):
         for arg in self.data_args.values():
             if arg["param_names"][0] != "-":
@@ -34,26 +110,240 @@ class Task:
         # self.module_name = None
 
 
+class ArgSpec(NamedTuple):
+    """Compiled, read-only argparse definition of a single task argument."""
+
+    names: tuple  # e.g. ("-a",) or ("--foo", "-f")
+    kwargs: MappingProxyType  # kwargs for parser.add_argument(), without the names
+
+
+class TaskRegistry(dict):
+    """All known tasks, by name (the function name).
+
+    On top of the dict, it keeps indexes of the aliases and of the default task, updated as tasks
+    get registered, so that looking a task up never scans the whole registry.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.default_task = None
+        self._aliases = {}  # alias -> task name
+        self._aliases_of = {}  # task name -> its aliases
+        self._groups = set()  # namespaces, including parents ("cloud" and "cloud.k8s")
+        self._lazy_groups = {}  # namespace -> module to import to register its tasks
+
+    def __setitem__(self, name, task):
+        if name in self._aliases:
+            raise Exception(f"Task name '{name}' is already an alias of task {self._aliases[name]}")
+        if name in self:
+            self._unindex(name)
+        super().__setitem__(name, task)
+        self.index(name)
+
+    def __delitem__(self, name):
+        self._unindex(name)
+        super().__delitem__(name)
+
+    def index(self, name):
+        """Update the indexes after is_main or aliases of the task changed."""
+        task = self[name]
+        self._unindex(name)
+        if task.is_main:
+            if self.default_task is not None:
+                raise Exception(
+                    f"Multiple tasks marked as main. Only one @task decorator per namespace can be marked as main."
+                )
+            self.default_task = task
+
+        if task.namespace:
+            self._add_group(task.namespace)
+        prefix = f"{task.namespace}." if task.namespace else ""
+        aliases = [prefix + alias.replace("-", "_") for alias in task.aliases]
+        for alias in aliases:
+            if alias in self or alias in self._aliases:
+                raise Exception(f"Alias '{alias}' of task {name} clashes with another task or alias")
+            self._aliases[alias] = name
+        self._aliases_of[name] = aliases
+
+    def _unindex(self, name):
+        if self.default_task is self[name]:
+            self.default_task = None
+        for alias in self._aliases_of.pop(name, []):
+            del self._aliases[alias]
+
+    def resolve_name(self, word):
+        """Name of the task selected by the word (name, dashed name or alias), or None."""
+        name = word.replace("-", "_")
+        if name in self:
+            return name
+        return self._aliases.get(name)
+
+    def _add_group(self, namespace):
+        parts = namespace.split(".")
+        for i in range(len(parts)):
+            self._groups.add(".".join(parts[: i + 1]))
+
+    def add_lazy_group(self, namespace, module_name):
+        self._add_group(namespace)
+        self._lazy_groups[namespace] = module_name
+
+    def is_group(self, word):
+        return word.replace("-", "_") in self._groups
+
+    def lazy_groups(self):
+        """{namespace: module} of the namespaces not imported yet."""
+        return dict(self._lazy_groups)
+
+    def load_group(self, namespace):
+        """Import the module of a lazily registered namespace (and of its parents), if not done yet."""
+        parts = namespace.split(".")
+        for group in [".".join(parts[: i + 1]) for i in range(len(parts))]:
+            module_name = self._lazy_groups.pop(group, None)
+            if module_name is not None:
+                _import_namespace_module(group, module_name)
+
+    def select(self, words):
+        """Find the task selected by the leading words of the command line ("db migrate", or "b").
+
+        Modules of lazily registered namespaces get imported when a word selects them.
+        Returns (task name, number of words used), or (None, 0).
+        """
+        prefix = ""
+        for i, word in enumerate(words):
+            if word.startswith("-"):
+                break
+            candidate = prefix + word.replace("-", "_")
+            if candidate in self._lazy_groups:
+                self.load_group(candidate)
+            name = self.resolve_name(candidate)
+            if name is not None:
+                return name, i + 1
+            if candidate not in self._groups:
+                break
+            prefix = f"{candidate}."
+        return None, 0
+
+    def in_group(self, namespace):
+        """Tasks in the namespace or below it."""
+        prefix = f"{namespace}."
+        return [task for name, task in self.items() if name.startswith(prefix) and task.task_decorator_seen]
+
+
 class Namespace:
     def __init__(self, tasks):
         self.tasks = tasks
 
     def has_default_task(self) -> bool:
-        dt = [t for t in self.tasks.values() if t.is_main]
-        assert len(dt) in [0, 1], f"Expected 0 or 1 main tasks, got {len(dt)}, {dt}"
-        return len(dt) == 1
+        return self.tasks.default_task is not None
 
     def get_default_task(self) -> Task:
-        return [t for t in self.tasks.values() if t.is_main][0]
+        return self.tasks.default_task
+
+
+tasks = TaskRegistry()
+
+# task name -> ready to use ArgumentParser, see build_parser_for_task()
+_parsers = {}
+
+
+def invalidate_parsers():
+    """Drop all cached parsers. Must be called whenever the task registry changes."""
+    _parsers.clear()
 
 
-tasks = {}
+# Set while taskcli itself imports a tasks script (see manifest.import_script()),
+# so that the cli() call at the bottom of that script does not run the tool.
+_cli_disabled = False
 
 
 def cleanup_for_tests():
     # called form unit test to cleanup global state between invocation.
     global tasks
-    tasks = {}
+    tasks = TaskRegistry()
+    invalidate_parsers()
+    history.record_runs = False
+
+
+def _pending_key(fn):
+    # @arg decorators below @task run first, and collect their data under this key until @task is applied
+    return f"{fn.__module__}:{fn.__qualname__}"
+
+
+# Namespace given to tasks without an explicit one, while the module of a lazy namespace is imported
+_default_namespace = None
+
+
+def _import_namespace_module(namespace, module_name):
+    global _default_namespace
+    previous, _default_namespace = _default_namespace, namespace
+    try:
+        importlib.import_module(module_name)
+    finally:
+        _default_namespace = previous
+    invalidate_parsers()
+
+
+def register_namespace(namespace, module_name):
+    """Register a group of tasks ('tool db migrate') whose module is imported only when the group is selected.
+
+    Tasks decorated in the module without namespace=... get this namespace.
+    """
+    tasks.add_lazy_group(namespace.replace("-", "_"), module_name)
+
+
+def _task_for_decoration(task_name):
+    """Get the Task the decorators should fill in, replacing the stub (if any) with a real one."""
+    if task_name not in tasks or tasks[task_name].is_stub:
+        tasks[task_name] = Task()
+    return tasks[task_name]
+
+
+def register_lazy(target, main=False, required_env=None, description=None, aliases=None):
+    """Register a task by its dotted path ("pkg.module:function") without importing it.
+
+    The module is imported only when cli() needs the task (to parse its arguments, or to call it).
+    The function can, but does not have to, be decorated with @task.
+    """
+    module_name, sep, func_name = target.partition(":")
+    if not sep or not module_name or not func_name:
+        raise Exception(f"Invalid lazy task target '{target}', expected 'package.module:function'")
+
+    if func_name in tasks and not tasks[func_name].is_stub:
+        log.debug(f"Task {func_name} already loaded, not registering {target} lazily")
+        return tasks[func_name]
+
+    def load():
+        module = importlib.import_module(module_name)
+        if func_name in tasks and not tasks[func_name].is_stub:
+            return  # the function carries @task, importing the module registered it
+        fn = getattr(module, func_name, None)
+        if fn is None:
+            raise Exception(f"Lazy task '{target}': module '{module_name}' has no attribute '{func_name}'")
+        task(main=main, required_env=required_env, aliases=aliases)(fn)
+
+    stub = Task()
+    stub.signature = {"func_name": func_name, "module": module_name, "lazy_target": target}
+    stub.is_main = main
+    stub.aliases = list(aliases or [])
+    stub.required_env = required_env
+    stub.description = description
+    stub.task_decorator_seen = True
+    stub.loader = load
+    tasks[func_name] = stub
+    invalidate_parsers()
+    return stub
+
+
+def resolve_task(task_name):
+    """Return the task, importing its implementation first if it's only a stub."""
+    task = tasks[task_name]
+    if task.is_stub:
+        log.debug(f"Loading implementation of task {task_name}")
+        task.loader()
+        task = tasks[task_name]
+        if task.is_stub:
+            raise Exception(f"Loading task {task_name} did not define it. Did you remove the @task decorator?")
+    return task
 
 
 # References:
@@ -105,12 +395,16 @@ def analyze_signature(fn):
             "default": default_value,
             "param_name": name,
         }
+        element_type = iterparams.element_type(typ)
+        if element_type is not None:
+            parameter_info[name]["element_type"] = element_type
 
     data = {
         "func_name": func_name,
         "func": fn,
         "params": parameter_info,
         "module": fn.__module__,
+        "is_async": inspect.iscoroutinefunction(fn),
     }
     return data
 
@@ -161,6 +455,18 @@ def param_info_to_argparse_kwargs(param_data):
     if param_default is not inspect._empty:
         ap_kwargs["help"] = f"(default: {param_default})"
 
+    if param_type in mapped.PARAM_TYPES:
+        # memory-mapped, see mapped.py
+        ap_kwargs["type"] = mapped.MappedFile
+        ap_kwargs["metavar"] = "PATH"
+
+    if "element_type" in param_data:
+        # Iterator[int]/Iterable[int]: lazily read from the given path, stdin by default
+        ap_kwargs["type"] = iterparams.elements_of(param_data["element_type"])
+        ap_kwargs["metavar"] = "PATH"
+        ap_kwargs.pop("required", None)
+        ap_kwargs.setdefault("default", "-")
+
     common_ap_kwargs_changes(ap_kwargs)
     return ap_kwargs
 
@@ -223,79 +529,174 @@ def trace(msg):
     pass
 
 
-def task(namespace=None, foo=None, env=None, required_env=None, main=False, aliases=None):
+def check_required_env(task):
+    """Exit with an error if required environment variables of the task are missing or empty."""
+    if task.required_env:
+        # TODO: allow for global defaults
+        missing, empty = task.env_requirements.unmet()
+        if missing or empty:
+            err = []
+            if missing:
+                err += [f"Missing required environment variables: {', '.join(missing)}"]
+            if empty:
+                err += [f"Empty required environment variables: {', '.join(empty)}"]
+            sys.exit("Error: " + ", ".join(err))
+
+
+def before_task_call(task, args, kwargs):
+    """Checks done by the @task wrapper right before calling the function.
+
+    Returns (skip, key): skip is True if the call should be skipped, key is the up-to-date fingerprint key (if any).
+    """
+    check_required_env(task)
+
+    key = None
+    if task.sources:
+        key = uptodate.task_key(task, args, kwargs)
+        if key is not None and uptodate.is_up_to_date(task, key):
+            log.info(f"Task {task.name} is up to date, skipping")
+            return True, key
+    return False, key
+
+
+def after_task_call(task, key):
+    if task.sources and key is not None:
+        uptodate.record(task, key)
+
+
+def _check_parallel_over(task_name, func_signature, param):
+    if func_signature["is_async"]:
+        raise Exception(f"Task {task_name}: parallel_over is not supported for async tasks")
+    if param not in func_signature["params"]:
+        raise Exception(f"Task {task_name}: parallel_over='{param}' is not a param of the function")
+    annotation = func_signature["params"][param]["type"]
+    if annotation is not EMPTY and get_origin(annotation) is not list:
+        raise Exception(f"Task {task_name}: parallel_over='{param}' must be a list param, e.g. '{param}: list[str]'")
+
+
+def _dep_name(dep):
+    if callable(dep):
+        return getattr(dep, "_taskcli_task_name", dep.__name__)
+    return " ".join(dep.split()).replace(" ", ".").replace("-", "_")  # "db migrate" -> "db.migrate"
+
+
+def task(
+    namespace=None,
+    foo=None,
+    env=None,
+    required_env=None,
+    main=False,
+    aliases=None,
+    deps=None,
+    sources=None,
+    outputs=None,
+    cache=False,
+    cache_ttl=None,
+    cache_max_bytes=None,
+    parallel_over=None,
+    jobs=None,
+):
     """
-    ns: command namespace. Allows for laying command in additional namespace
+    namespace: group of the task, "db" makes it 'tool db migrate' ("cloud.k8s" for deeper nesting)
     env: environment variables to assert
     main: if True, this task will be run if no task name is specified
-    aliases: not implemented yet
+    aliases: other names the task can be invoked by
+    deps: tasks (functions or names) to run before this one, each at most once per invocation
+    sources: file globs; if none of the files changed since the last successful run, the task is skipped
+    outputs: file globs; the task is never skipped if any of them doesn't match a file
+    cache: store results on disk, and return them instead of calling the task again with the same arguments
+    cache_ttl: seconds after which a cached result expires (default: never)
+    cache_max_bytes: size limit of the cache of this task, least recently used results are evicted first
+    parallel_over: name of a list param; the function is called on chunks of its values in a process pool
+    jobs: size of that pool (default: number of CPUs), the global --jobs option overrides it
     """
 
+    @profiling.timed("decoration")
     def task_wrapper(fn):
         # this generats the decorator
+        func_signature = analyze_signature(fn)
+        task_namespace = (group if isinstance(group, str) else None) or _default_namespace
+        if task_namespace:
+            task_namespace = task_namespace.replace("-", "_")
+            task_name = f"{task_namespace}.{func_signature['func_name']}"
+        else:
+            task_name = func_signature["func_name"]
+
         @functools.wraps(fn)
         def wrapper(*args, **kwargs):
             # this gets called right before the function
-            func_name = fn.__name__
-
-            required_envx = tasks[func_name].required_env
-            if required_envx:
-                # TODO: allow for * in env var name
-                # TODO: allow for | in env var names
-                # TODO: allow for global defaults
-                missing = []
-                empty = []
-                for env in required_envx:
-                    if env not in os.environ:
-                        missing += [env]
-                    elif os.environ[env] == "":
-                        empty += [env]
-
-                if missing or empty:
-                    err = []
-                    if missing:
-                        err += [f"Missing required environment variables: {', '.join(missing)}"]
-                    if empty:
-                        err += [f"Empty required environment variables: {', '.join(empty)}"]
-                    sys.exit("Error: " + ", ".join(err))
-
-            output = fn(*args, **kwargs)
+            skip, key = before_task_call(tasks[task_name], args, kwargs)
+            if skip:
+                return None
+
+            if parallel_over:
+                output = parallel.run(tasks[task_name], fn, args, kwargs)
+            else:
+                output = fn(*args, **kwargs)
+
+            after_task_call(tasks[task_name], key)
             return output
 
-        func_signature = analyze_signature(fn)
+        @functools.wraps(fn)
+        async def async_wrapper(*args, **kwargs):
+            # same as wrapper, for 'async def' tasks
+            skip, key = before_task_call(tasks[task_name], args, kwargs)
+            if skip:
+                return None
+
+            output = await fn(*args, **kwargs)
+
+            after_task_call(tasks[task_name], key)
+            return output
+
+        if parallel_over:
+            _check_parallel_over(task_name, func_signature, parallel_over)
+        if inspect.iscoroutinefunction(fn):
+            wrapper = async_wrapper
+        wrapper._taskcli_task_name = task_name  # lets @arg above @task find the task
 
-        task_name = func_signature["func_name"]
-        if task_name in tasks and tasks[task_name].task_decorator_seen:
+        if task_name in tasks and tasks[task_name].task_decorator_seen and not tasks[task_name].is_stub:
             raise Exception(
                 f"Duplicate @task decorator on function '{task_name}' on line {inspect.getsourcelines(fn)[1]}"
             )
 
-        if task_name not in tasks:
-            # could have been set by @arg decorator
-            tasks[task_name] = Task()
-
-        tasks[task_name].task_decorator_seen = True
-
-        task = tasks[task_name]
+        task = _task_for_decoration(task_name)
+        task.task_decorator_seen = True
+        pending = tasks.get(_pending_key(fn))
+        if pending is not None:
+            # created by @arg decorators below this one
+            task.data_args = pending.data_args
+            del tasks[_pending_key(fn)]
 
         task.required_env = required_env
+        envreq.compile(required_env)  # compiled once, and invalid entries fail at decoration
         task.is_main = main
+        task.aliases = list(aliases or [])
+        task.namespace = task_namespace
         task.signature = func_signature
-
-        if task.is_main:
-            for other_tasks in [t for t in tasks.values() if t != task]:
-                if other_tasks.is_main and main:
-                    raise Exception(
-                        f"Multiple tasks marked as main. Only one @task decorator per namespace can be marked as main."
-                    )
+        tasks.index(task_name)
+        task.deps = [_dep_name(dep) for dep in deps or []]
+        task.sources = list(sources or [])
+        task.outputs = list(outputs or [])
+        task.wrapper = wrapper
+        task.cache = cache
+        task.cache_ttl = cache_ttl
+        task.cache_max_bytes = cache_max_bytes if cache_max_bytes is not None else resultcache.DEFAULT_MAX_BYTES
+        task.parallel_over = parallel_over
+        task.jobs = jobs
+        if fn.__doc__ and fn.__doc__.strip():
+            task.description = fn.__doc__.strip().splitlines()[0]
 
         for param_data in task.signature["params"].values():
             param_name = param_data["param_name"]
             ap_kwargs = param_info_to_argparse_kwargs(param_data)
             task.data_params[param_name] = ap_kwargs
 
+        task.compile_spec()
+        invalidate_parsers()
         return wrapper
 
+    group = namespace
     # Needed, so that we can use "@task" and "@task()" interchangeably
     if callable(namespace):
         return task_wrapper(namespace)  # return 'wrapper'
@@ -326,8 +727,11 @@ def arg(
     nargs=None,
 ):
     # TODO some missing inthe signature
+    @profiling.timed("decoration")
     def arg_decorator(fn):
         func_name = fn.__name__
+        # set if @task was applied already (i.e. it's below this @arg)
+        task_name = getattr(fn, "_taskcli_task_name", None) or _pending_key(fn)
         func_sig_data = {
             "func_name": func_name,
             "param_names": names,  # needs supporting multiple flags
@@ -340,17 +744,16 @@ def arg(
             "nargs": nargs,
         }
 
-        if func_name not in tasks:
-            tasks[func_name] = Task()
+        task = _task_for_decoration(task_name)
 
         primary_arg_name = names[0].lstrip("-").replace("-", "_")
 
         # assert no duplicates
         for name in names:
-            if name in tasks[func_name].data_args:
+            if name in task.data_args:
                 raise Exception(f"Duplicate arg decorator for '{name}' in {func_name}")
 
-        tasks[func_name].data_args[primary_arg_name] = arg_info_to_argparse_kwargs(func_sig_data)
+        task.data_args[primary_arg_name] = arg_info_to_argparse_kwargs(func_sig_data)
 
         # check if matching param exists
         func_sig_data = analyze_signature(fn)
@@ -365,6 +768,10 @@ def arg(
                 f"arg decorator for '{primary_arg_name}' in function '{func_name}' does not match any param in the function signature: "
             )
 
+        # @arg can come after @task (decorators are applied bottom-up), so recompile
+        task.compile_spec()
+        invalidate_parsers()
+
         @functools.wraps(fn)
         def wrapper(*args, **kwargs):
             return fn(*args, **kwargs)
@@ -390,7 +797,8 @@ class ArgumentParser(argparse.ArgumentParser):
 
     def error(self, message):
         # to make it more convenient to unit test
-        self.print_help(sys.stderr)
+        if self._print_help:
+            self.print_help(sys.stderr)
         raise ParsingError(message)
         # self.exit(2, '%s: error: %s\n' % (self.prog, message))
 
@@ -401,13 +809,11 @@ class ArgumentParser(argparse.ArgumentParser):
             # print to stderr
             print(f"", file=sys.stderr)
             print(f"environment variables:", file=sys.stderr)
-            for env in self._required_env:
-                if env not in os.environ:
-                    print(f"  {env} {RED}(missing){ENDC}", file=sys.stderr)
-                elif os.environ[env] == "":
-                    print(f"  {env} {RED}(empty){ENDC}", file=sys.stderr)
+            for requirement, status in envreq.compile(self._required_env).check():
+                if status == envreq.MET:
+                    print(f"  {requirement.spec} ", file=sys.stderr)
                 else:
-                    print(f"  {env} ", file=sys.stderr)
+                    print(f"  {requirement.spec} {RED}({status}){ENDC}", file=sys.stderr)
 
     def set_env(self, required_env):
         self._required_env = required_env
@@ -418,9 +824,17 @@ def debug(*args, **kwargs):
     # print("debug:", str(args), str(kwargs))
 
 
+@profiling.timed("build_parser_for_task")
 def build_parser_for_task(task_name, exit_on_error=True):
-    parser = ArgumentParser()
+    """Return the parser for the task, building it from the compiled spec on first use.
 
+    Parsers are cached until the registry changes (see invalidate_parsers()).
+    """
+    parser = _parsers.get(task_name)
+    if parser is not None:
+        return parser
+
+    task_name = tasks.resolve_name(task_name) or task_name
     TASK_NAME_NOT_FOUND = task_name not in tasks
     OTHER_TASKS_ARE_DEFINED = len(tasks) > 0  # without this check, if there's no params at all, it would crash
     if TASK_NAME_NOT_FOUND and OTHER_TASKS_ARE_DEFINED:
@@ -431,59 +845,258 @@ def build_parser_for_task(task_name, exit_on_error=True):
         raise Exception("No tasks were defined. Use @task decorator to define tasks.")
 
     task = tasks[task_name]
-    for param_name in task.data_params.keys():
-        DEFINED_VIA_ARG_DECORATOR = param_name in task.data_args
-        if DEFINED_VIA_ARG_DECORATOR:
-            ap_kwargs = task.data_args[param_name]
-            import copy
-
-            copy_ap_kwargs = copy.deepcopy(ap_kwargs)
-
-            # pop from a copy so that we can rerun cli() in unittest
-            names = copy_ap_kwargs.pop("param_names")
-            # print(f"adding arg {param_name} from decoratorr {names} -- {copy_ap_kwargs}")
-
-            debug(*names, **copy_ap_kwargs)
-            parser.add_argument(
-                *names,
-                **copy_ap_kwargs,
-            )
-        else:
-            ap_kwargs = task.data_params[param_name]
-            import copy
-
-            copy_ap_kwargs = copy.deepcopy(ap_kwargs)
-            # pop from a copy so that we can rerun cli() in unittest
-            names = copy_ap_kwargs.pop("param_names")
-            # print(f"adding arg {param_name} from signature {names} -- {copy_ap_kwargs}")
-
-            debug(*names, **copy_ap_kwargs)
-            parser.add_argument(
-                *names,
-                **copy_ap_kwargs,
-            )
+    if not task.params_known:
+        task = resolve_task(task_name)
+    parser = ArgumentParser()
+    for arg_spec in task.spec:
+        debug(*arg_spec.names, **arg_spec.kwargs)
+        parser.add_argument(*arg_spec.names, **arg_spec.kwargs)
 
+    _parsers[task_name] = parser
     return parser
 
 
+@profiling.timed("parse")
 def parse(parser, argv):
     # print("## About to parse...")
     config = parser.parse_args(argv)
     return config
 
 
-def dispatch(config, task_name):
-    # print("## About to dispatch " + task_name)
-    fun = tasks[task_name].signature["func"]
-    ret = fun(**vars(config))
+# Event loop running 'async def' tasks dispatched from sync code, see run_coroutine()
+_event_loop = None
+_event_loop_lock = threading.Lock()
+
+
+def get_event_loop():
+    """Return taskcli's event loop, started in a background thread on first use.
+
+    All async tasks of the process run on this one loop, also when dispatched from several threads
+    (e.g. dependencies running in parallel), so they can run concurrently with each other.
+    """
+    global _event_loop
+    with _event_loop_lock:
+        if _event_loop is None:
+            import asyncio  # only once an async task runs, it's slow to import
+
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="taskcli-event-loop", daemon=True)
+            thread.start()
+            _event_loop = loop
+    return _event_loop
+
+
+async def _capture_exit(coro):
+    # SystemExit (e.g. from a failed required_env check) raised inside the loop would stop the loop
+    # thread instead of reaching the caller, so hand it over as a value
+    try:
+        return await coro, None
+    except (SystemExit, KeyboardInterrupt) as e:
+        return None, e
+
+
+def run_coroutine(coro, loop=None):
+    """Run the coroutine on taskcli's event loop (or on the given one), and block until it's done."""
+    import asyncio
+
+    loop = loop or get_event_loop()
+    try:
+        running_loop = asyncio.get_running_loop()
+    except RuntimeError:
+        running_loop = None
+    if running_loop is loop:
+        coro.close()
+        raise Exception("Cannot dispatch an async task synchronously from another async task, use dispatch_async()")
+    ret, exit_exception = asyncio.run_coroutine_threadsafe(_capture_exit(coro), loop).result()
+    if exit_exception is not None:
+        raise exit_exception
     return ret
 
 
+def iterate_async(agen, loop=None):
+    """Iterate an async generator (returned by an async task) from sync code.
+
+    It runs on taskcli's event loop, or on the given one (which must be running in another thread).
+    """
+    try:
+        while True:
+            try:
+                yield run_coroutine(agen.__anext__(), loop)
+            except StopAsyncIteration:
+                return
+    finally:
+        run_coroutine(agen.aclose(), loop)
+
+
+def _cache_lookup(task, kwargs, options):
+    """Returns (key, cached result or resultcache.MISSING), key is None if the result should not be cached."""
+    if not task.cache or options.get("no_cache"):
+        return None, resultcache.MISSING
+    check_required_env(task)  # a cached result must not be returned when the task couldn't run
+    key = resultcache.cache_key(task, kwargs)
+    if key is None:
+        log.debug(f"Not caching the result of task {task.name}, it reads stdin")
+        return None, resultcache.MISSING
+    ret = resultcache.get(task, key)
+    if ret is not resultcache.MISSING:
+        log.debug(f"Using cached result of task {task.name}")
+    return key, ret
+
+
+def _dispatch_steps(config, task_name, options, record):
+    """Generator doing the work of dispatch() and dispatch_async(), returns the result of the task.
+
+    If the task returns an awaitable, it's yielded, and the caller sends back its result (or throws its exception).
+    """
+    task = resolve_task(task_name)
+    kwargs = vars(config)
+    with history.recorded(task_name, kwargs) if record and history.enabled() else contextlib.nullcontext():
+        key, ret = _cache_lookup(task, kwargs, options)
+        if ret is not resultcache.MISSING:
+            return ret
+
+        with profiling.phase("task"), parallel.override_jobs(options.get("jobs")):
+            with mapped.mapped_kwargs(task, kwargs) as call_kwargs:
+                ret = task.wrapper(**call_kwargs)
+                if inspect.isawaitable(ret):
+                    ret = yield ret
+
+        if key is not None:
+            resultcache.put(task, key, ret)
+        return ret
+
+
+@profiling.timed("dispatch")
+def dispatch(config, task_name, options=None, record=False):
+    """Call the task with the parsed arguments, async tasks are run to completion.
+
+    options: taskcli's global options, see parse_global_options()
+    record: add the run to the history (see history.py), done for the tasks given on the command line
+    """
+    steps = _dispatch_steps(config, task_name, options or {}, record)
+    try:
+        awaitable = next(steps)
+        while True:
+            try:
+                ret = run_coroutine(awaitable)
+            except BaseException as e:
+                awaitable = steps.throw(e)
+            else:
+                awaitable = steps.send(ret)
+    except StopIteration as done:
+        return done.value
+
+
+async def dispatch_async(config, task_name, options=None, record=False):
+    """Same as dispatch(), but awaits async tasks on the running event loop."""
+    steps = _dispatch_steps(config, task_name, options or {}, record)
+    try:
+        awaitable = next(steps)
+        while True:
+            try:
+                ret = await awaitable
+            except BaseException as e:
+                awaitable = steps.throw(e)
+            else:
+                awaitable = steps.send(ret)
+    except StopIteration as done:
+        return done.value
+
+
 from typing import Any
 
 # from rich import print
 
 
+def print_help(argv):
+    """Handle -h/--help.
+
+    tool -h           list all tasks
+    tool -h WORD      list only the tasks with WORD in their name or description
+    tool GROUP -h     list the tasks of a namespace
+    tool TASK -h      full help of one task, only this task's parser is built
+    """
+    words = [a for a in argv[1:] if a not in ["-h", "--help"]]
+    prog = os.path.basename(argv[0]) if argv else "taskcli"
+
+    task_name, used = tasks.select(words)
+    if task_name is None and words and words[0].startswith("-") and tasks.default_task is not None:
+        task_name = tasks.default_task.name
+    if task_name is None and words and tasks.is_group(words[0]):
+        namespace = ""
+        for word in words:
+            candidate = f"{namespace}.{word}" if namespace else word
+            if not tasks.is_group(candidate):
+                break
+            namespace = candidate.replace("-", "_")
+            tasks.load_group(namespace)
+        sys.stderr.write(usage.render_task_list(tasks.in_group(namespace), prog))
+        return
+
+    if task_name is not None:
+        parser = build_parser_for_task(task_name)
+        task = tasks[task_name]  # could have been loaded by build_parser_for_task
+        if task.required_env:
+            parser.set_env(task.required_env)
+        parser.print_help(sys.stderr)
+        return
+
+    pattern = words[0] if words else None
+    listed = [task for task in tasks.values() if task.task_decorator_seen]
+    listing = usage.render_task_list(listed, prog, pattern=pattern, lazy_groups=tasks.lazy_groups())
+    if pattern is not None and not listing:
+        listing = f"No tasks matching '{pattern}'.\n"
+    sys.stderr.write(listing)
+
+
+def _output_mode(mode):
+    from . import output
+
+    if mode not in output.MODES:
+        raise ValueError(mode)
+    return mode
+
+
+# Options of taskcli itself (as opposed to the options of tasks). They must come before the task name,
+# e.g. 'tool --jobs 4 build'. Maps option to the type of its value, or None for flags.
+GLOBAL_OPTIONS = {
+    # how many task dependencies (and parallel_over processes) can run at the same time, 0 means number of CPUs
+    "--jobs": int,
+    "--no-cache": None,  # ignore (and don't update) cached results of @task(cache=True) tasks
+    "--parallel": None,  # run the tasks chained with '--' concurrently
+    "--output": _output_mode,  # write the records of the task's result, see output.py
+    "--stats": None,  # show the latency statistics of the recorded runs ('tool --stats [TASK]'), see history.py
+}
+
+
+# 'tool enqueue TASK ...', 'tool worker', 'tool jobs', unless a task has the name, see jobqueue.py
+QUEUE_COMMANDS = ["enqueue", "worker", "jobs"]
+
+
+def parse_global_options(argv):
+    """Split taskcli's own options off the start of argv, returns (options, remaining argv)."""
+    options = {}
+    rest = list(argv[1:])
+    while rest and rest[0].partition("=")[0] in GLOBAL_OPTIONS:
+        name, has_value, value = rest.pop(0).partition("=")
+        convert = GLOBAL_OPTIONS[name]
+        if convert is None:
+            if has_value:
+                raise ParsingError(f"taskcli option {name}: does not take a value")
+            value = True
+        else:
+            if not has_value:
+                if not rest:
+                    raise ParsingError(f"taskcli option {name}: expected one argument")
+                value = rest.pop(0)
+            try:
+                value = convert(value)
+            except ValueError:
+                raise ParsingError(f"taskcli option {name}: invalid value: '{value}'")
+        options[name.lstrip("-").replace("-", "_")] = value
+    return options, argv[:1] + rest
+
+
 def cli(argv=None, force=False, explicit_default_task=False) -> Any:
     """
 
@@ -492,6 +1105,9 @@ def cli(argv=None, force=False, explicit_default_task=False) -> Any:
     if argv is None:
         argv = sys.argv
 
+    if _cli_disabled:
+        return None
+
     # Detect if we're running as a script or not
     frame = inspect.currentframe()
     assert frame is not None
@@ -500,6 +1116,138 @@ def cli(argv=None, force=False, explicit_default_task=False) -> Any:
     # if (module.__name__ != "__main__") and not force:
     #     return
 
+    profile, profile_path, argv = profiling.pop_option(argv)
+    if profile:
+        return profiling.run_profiled(profile_path, _cli, argv, explicit_default_task)
+    return _cli(argv, explicit_default_task)
+
+
+def _cli(argv, explicit_default_task):
+    options, argv = parse_global_options(argv)
+    command = _command(argv, explicit_default_task, options)
+    if command is not None:
+        return command()
+
+    task_name, config, options = parse_cli(argv, explicit_default_task=explicit_default_task, options=options)
+    if tasks[task_name].deps:
+        from . import scheduler
+
+        scheduler.run_dependencies(task_name, options=options)
+    ret = dispatch(config, task_name, options=options, record=True)
+    return _write_output(ret, options)
+
+
+def _command(argv, explicit_default_task, options):
+    """The function running the command line, unless it's the call of a single task (then None).
+
+    That is 'tool --stats', the queue commands, '--batch' and chains of tasks.
+    """
+    if options.get("stats"):
+        words = argv[1:]
+        task_name = (tasks.select(words)[0] or words[0].replace("-", "_")) if words else None
+        return lambda: print(history.format_stats(history.read(), task_name))
+    if argv[1:2] and argv[1] in QUEUE_COMMANDS and tasks.select(argv[1:2])[0] is None:
+        from . import jobqueue
+
+        return functools.partial(jobqueue.cli, argv, options)
+    if "--batch" in argv[2:]:
+        from . import batch
+
+        if batch.is_batch_invocation(argv):
+            return functools.partial(_run_batch, argv, options)
+
+    chain = split_chain(argv)
+    if len(chain) > 1:
+        from . import scheduler
+
+        # parse all of them first, so that a typo in the last task fails before anything runs
+        parsed = [parse_cli(segment, explicit_default_task, options=options)[:2] for segment in chain]
+        return functools.partial(scheduler.run_chain, parsed, options=options)
+    return None
+
+
+def _run_batch(argv, options):
+    from . import batch
+
+    failed = batch.run(argv, options=options)
+    if failed:
+        sys.exit(f"{failed} lines of the batch failed, see the errors in the output.")
+
+
+def _write_output(ret, options):
+    """With --output, write the records of the task's result (and return None), otherwise return the result."""
+    if not options.get("output"):
+        return ret
+    from . import output
+
+    if inspect.isasyncgen(ret):
+        ret = iterate_async(ret)
+    output.write(ret, options["output"])
+    return None
+
+
+async def cli_async(argv=None, explicit_default_task=False) -> Any:
+    """Same as cli(), for use from async code: the task is awaited on the running event loop.
+
+    Whatever blocks (dependencies, chains, batches, the queue commands, writing --output, --taskcli-profile)
+    runs in the loop's default executor.
+    """
+    import asyncio
+
+    if argv is None:
+        argv = sys.argv
+    loop = asyncio.get_running_loop()
+
+    profile, profile_path, argv = profiling.pop_option(argv)
+    if profile:
+        run = functools.partial(profiling.run_profiled, profile_path, _cli, argv, explicit_default_task)
+        return await loop.run_in_executor(None, run)
+
+    options, argv = parse_global_options(argv)
+    command = _command(argv, explicit_default_task, options)
+    if command is not None:
+        return await loop.run_in_executor(None, command)
+
+    task_name, config, options = parse_cli(argv, explicit_default_task=explicit_default_task, options=options)
+    if tasks[task_name].deps:
+        from . import scheduler
+
+        run_deps = functools.partial(scheduler.run_dependencies, task_name, options=options)
+        await loop.run_in_executor(None, run_deps)
+    ret = await dispatch_async(config, task_name, options=options, record=True)
+    if not options.get("output"):
+        return ret
+    if inspect.isasyncgen(ret):
+        ret = iterate_async(ret, loop)  # the writer pulls the records from the executor thread
+    return await loop.run_in_executor(None, _write_output, ret, options)
+
+
+def split_chain(argv):
+    """Split 'tool build -x 1 -- test --fast -- deploy' into one argv per task.
+
+    Only a '--' followed by a task name starts a new task, any other '--' is left for argparse.
+    Each returned argv starts with the program name, same as argv.
+    """
+    chain = [argv[:1]]
+    args = argv[1:]
+    for i, arg in enumerate(args):
+        NEXT_IS_TASK = i + 1 < len(args) and tasks.select(args[i + 1 :])[0] is not None
+        if arg == "--" and NEXT_IS_TASK:
+            chain.append(argv[:1])
+        else:
+            chain[-1].append(arg)
+    return chain
+
+
+def parse_cli(argv, explicit_default_task=False, options=None):
+    """Select the task and parse its arguments, returns (task name, parsed config, global options).
+
+    options: already parsed global options, otherwise they are parsed from the start of argv.
+    """
+    if options is None:
+        options, argv = parse_global_options(argv)
+    uptodate.clear_stat_cache()
+
     ns = Namespace(tasks)
     if ns.has_default_task():
         dt = ns.get_default_task()
@@ -511,26 +1259,8 @@ def cli(argv=None, force=False, explicit_default_task=False) -> Any:
             )
 
     if "-h" in argv or "--help" in argv:
-        idx = argv.index("-h") if "-h" in argv else argv.index("--help")
-        if len(argv) == 2:
-            for task in tasks.values():
-                parser = build_parser_for_task(task.name)
-                print("", file=sys.stderr)
-                default_text = " (default)" if task.is_main else ""
-                print(f"## {task.name.replace('_', '-')} {default_text}", file=sys.stderr)
-                parser.print_usage(file=sys.stderr)
-                # parser.print_help()
-            sys.exit(0)
-        else:
-            # TODO: print help for specified task
-            for task in tasks.values():
-                parser = build_parser_for_task(task.name)
-                print("", file=sys.stderr)
-                default_text = " (default)" if task.is_main else ""
-                print(f"## {task.name.replace('_', '-')} {default_text}", file=sys.stderr)
-                parser.print_usage(file=sys.stderr)
-                # parser.print_help()
-            sys.exit(0)
+        print_help(argv)
+        sys.exit(0)
 
     if len(argv) < 2:  # only sys.argv[0]
         if ns.has_default_task():
@@ -546,26 +1276,31 @@ def cli(argv=None, force=False, explicit_default_task=False) -> Any:
         if argv[1].startswith("-") and ns.has_default_task():
             assert len(argv) >= 2
             task_name = ns.get_default_task().name
-        elif argv[1].startswith("-") and not ns.get_default_task():
+        elif argv[1].startswith("-") and not ns.has_default_task():
             raise Exception("No task name provided, and there's no default task defined.")
         else:
             assert len(argv) >= 2
-            task_name = argv[1].replace("-", "_")
-            argv = [argv[0]] + argv[2:]  # remove task name from argv
+            task_name, used = tasks.select(argv[1:])
+            if task_name is None and tasks.is_group(argv[1]):
+                # 'tool db' (or 'tool db nosuchtask'): list the tasks of the group
+                print_help(argv[:2] + ["-h"])
+                sys.exit(2)
+            if task_name is None:
+                task_name, used = argv[1].replace("-", "_"), 1
+            argv = [argv[0]] + argv[1 + used :]  # remove task name from argv
 
     argv = argv[1:]
     assert isinstance(task_name, str), f"task name must be a string, got {type(task_name)}, {task_name}"
-    parser = build_parser_for_task(task_name)
-    # add env data
-
     if task_name not in tasks or tasks[task_name].task_decorator_seen == False:
+        if not tasks:
+            raise Exception("No tasks were defined. Use @task decorator to define tasks.")
         raise Exception(f"Task {task_name} is not among known tasks. Did you forget to add the @task decorator?")
 
+    parser = build_parser_for_task(task_name)
+
     task = tasks[task_name]
     if task.required_env:
         parser.set_env(task.required_env)
 
     config = parse(parser, argv)
-    ret = dispatch(config, task_name)
-
-    return ret
+    return task_name, config, options
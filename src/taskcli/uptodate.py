@@ -0,0 +1,123 @@
+"""Skipping tasks whose sources did not change, see @task(sources=[...], outputs=[...]).
+
+Each source file is fingerprinted by (mtime, size, sha256). A file whose mtime and size
+match the stored fingerprint is not read at all; only files whose stat changed get hashed,
+so touching a file without changing it does not trigger a run. Stats are cached for the
+duration of one cli() invocation, so tasks sharing sources stat each file once.
+"""
+
+import glob
+import hashlib
+import logging
+import os
+import threading
+
+from . import state
+
+log = logging.getLogger("taskcli")
+
+FINGERPRINTS_FILE = "fingerprints.json"
+
+_lock = threading.Lock()
+_stat_cache = {}  # path -> (mtime_ns, size)
+
+
+def clear_stat_cache():
+    _stat_cache.clear()
+
+
+def expand(patterns):
+    """Sorted list of files matching the glob patterns ('**' is supported)."""
+    files = set()
+    for pattern in patterns:
+        for path in glob.iglob(pattern, recursive=True):
+            if os.path.isfile(path):
+                files.add(os.path.normpath(path))
+    return sorted(files)
+
+
+def _stat(path, fresh=False):
+    if fresh or path not in _stat_cache:
+        st = os.stat(path)
+        _stat_cache[path] = (st.st_mtime_ns, st.st_size)
+    return _stat_cache[path]
+
+
+def _hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def call_repr(args, kwargs):
+    """Repr of the arguments of a call, for keys, or None if the call can't be keyed.
+
+    Inputs read by the task (Iterator and MappedFile params) are keyed with the fingerprint of their
+    file; one reading stdin has none, its call is never skipped nor cached.
+    """
+    values = []
+    for value in list(args) + [value for _, value in sorted(kwargs.items())]:
+        if hasattr(value, "fingerprint"):
+            fingerprint = value.fingerprint()
+            if fingerprint is None:
+                return None
+            value = (value, fingerprint)
+        values.append(value)
+    return repr((values, sorted(kwargs)))
+
+
+def task_key(task, args, kwargs):
+    """Fingerprints are kept per task and per arguments the task was called with, None if the call can't be keyed."""
+    call = call_repr(args, kwargs)
+    if call is None:
+        return None
+    return f"{task.signature['module']}.{task.name}:{hashlib.sha256(call.encode()).hexdigest()[:16]}"
+
+
+def _load():
+    return state.read_json(state.state_path(FINGERPRINTS_FILE), default={})
+
+
+def is_up_to_date(task, key):
+    stored = _load().get(key)
+    if stored is None:
+        return False
+    if stored["sources"] != list(task.sources) or stored["outputs"] != list(task.outputs):
+        return False
+
+    for pattern in task.outputs:
+        if not expand([pattern]):
+            log.debug(f"Task {task.name}: no output matching {pattern}")
+            return False
+
+    files = expand(task.sources)
+    if files != sorted(stored["files"]):
+        return False
+    for path in files:
+        mtime, size = _stat(path)
+        old_mtime, old_size, old_hash = stored["files"][path]
+        if (mtime, size) == (old_mtime, old_size):
+            continue
+        if size != old_size or _hash_file(path) != old_hash:
+            log.debug(f"Task {task.name}: {path} changed")
+            return False
+    return True
+
+
+def record(task, key):
+    """Store the fingerprint of the sources, after the task ran successfully."""
+    with _lock:
+        fingerprints = _load()
+        old_files = fingerprints.get(key, {}).get("files", {})
+        files = {}
+        for path in expand(task.sources):
+            mtime, size = _stat(path, fresh=True)  # the task could have modified its own sources
+            old = old_files.get(path)
+            if old and (old[0], old[1]) == (mtime, size):
+                files[path] = old
+            else:
+                files[path] = [mtime, size, _hash_file(path)]
+        fingerprints[key] = {"sources": list(task.sources), "outputs": list(task.outputs), "files": files}
+        state.write_json(state.state_path(FINGERPRINTS_FILE), fingerprints)
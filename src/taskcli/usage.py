@@ -0,0 +1,98 @@
+"""Usage/listing output formatted straight from the compiled task specs.
+
+Listing all the tasks used to build an argparse parser per task just to call print_usage(),
+which gets slow with thousands of tasks. The functions here produce the same usage lines
+from Task.spec without touching argparse. Full help of a single task still uses its parser.
+"""
+
+
+def _dest(names, kwargs):
+    if kwargs.get("dest"):
+        return kwargs["dest"]
+    if not names[0].startswith("-"):
+        return names[0]
+    long_names = [n for n in names if n.startswith("--")]
+    return (long_names[0] if long_names else names[0]).lstrip("-").replace("-", "_")
+
+
+def _metavar(names, kwargs):
+    if kwargs.get("metavar"):
+        return kwargs["metavar"]
+    if kwargs.get("choices"):
+        return "{" + ",".join(str(c) for c in kwargs["choices"]) + "}"
+    dest = _dest(names, kwargs)
+    return dest if not names[0].startswith("-") else dest.upper()
+
+
+def _format_values(metavar, nargs):
+    # same as argparse.HelpFormatter._format_args
+    if nargs is None:
+        return metavar
+    if nargs == "?":
+        return f"[{metavar}]"
+    if nargs == "*":
+        return f"[{metavar} ...]"
+    if nargs == "+":
+        return f"{metavar} [{metavar} ...]"
+    if isinstance(nargs, int):
+        return " ".join([metavar] * nargs)
+    return metavar
+
+
+def format_arg(arg_spec):
+    names, kwargs = arg_spec.names, arg_spec.kwargs
+    IS_POSITIONAL = not names[0].startswith("-")
+    values = _format_values(_metavar(names, kwargs), kwargs.get("nargs"))
+    if IS_POSITIONAL:
+        return values
+
+    if kwargs.get("action") in ["store_true", "store_false", "count"]:
+        text = names[0]
+    else:
+        text = f"{names[0]} {values}"
+    return text if kwargs.get("required") else f"[{text}]"
+
+
+def format_usage(task, prog):
+    """Same line as parser.print_usage() of the task would print."""
+    optionals = [format_arg(a) for a in task.spec if a.names[0].startswith("-")]
+    positionals = [format_arg(a) for a in task.spec if not a.names[0].startswith("-")]
+    return " ".join(["usage:", prog, "[-h]", *optionals, *positionals])
+
+
+def matches(task, pattern):
+    pattern = pattern.lower()
+    names = [name.lower() for name in [task.name, *task.aliases]]
+    if any(pattern in name or pattern in name.replace("_", "-") for name in names):
+        return True
+    return pattern in (task.description or "").lower()
+
+
+def render_task_list(tasks, prog, pattern=None, lazy_groups=()):
+    """Text listing the tasks (all of them, or the ones matching the pattern) with their usage.
+
+    lazy_groups: namespaces whose tasks are not loaded yet, listed by name only.
+    """
+    lines = []
+    for task in tasks:
+        if pattern is not None and not matches(task, pattern):
+            continue
+        default_text = " (default)" if task.is_main else ""
+        aliases_text = f" (aliases: {', '.join(a.replace('_', '-') for a in task.aliases)})" if task.aliases else ""
+        lines.append("")
+        lines.append(f"## {task.display_name} {default_text}{aliases_text}")
+        if task.params_known:
+            if task.description:
+                lines.append(task.description)
+            lines.append(format_usage(task, prog))
+        else:
+            # lazily registered, don't import the module just to list it
+            lines.append(task.description or "(not loaded)")
+    for namespace in lazy_groups:
+        display_name = " ".join(part.replace("_", "-") for part in namespace.split("."))
+        if pattern is not None and pattern.lower() not in display_name.lower():
+            continue
+        lines.append("")
+        lines.append(f"## {display_name} ...")
+        lines.append(f"Group of tasks, see: {prog} {display_name} -h")
+    return "\n".join(lines) + "\n" if lines else ""
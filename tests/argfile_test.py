@@ -0,0 +1,81 @@
+import io
+import os
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+import taskcli
+from taskcli import cli, task, arg
+from taskcli import argfile
+from taskcli.taskcli import ParsingError
+
+
+class TaskCLITestCase(TestCase):
+    def setUp(self) -> None:
+        taskcli.taskcli.cleanup_for_tests()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def write(self, name, content):
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, "w") as f:
+            f.write(content)
+        return path
+
+
+class TestReadValues(TaskCLITestCase):
+    def test_newline_separated(self):
+        path = self.write("ids.txt", "1\n2\r\n\n3")
+        self.assertEqual(argfile.read_values(path, int), [1, 2, 3])
+
+    def test_nul_separated(self):
+        path = self.write("files", "a b\0c\nd\0")
+        self.assertEqual(argfile.read_values(path), ["a b", "c\nd"])
+
+    def test_values_split_across_chunks(self):
+        path = self.write("ids.txt", "\n".join(str(i) for i in range(1000)))
+        with patch.object(argfile, "CHUNK_SIZE", 7):
+            self.assertEqual(argfile.read_values(path, int), list(range(1000)))
+
+    def test_invalid_value(self):
+        path = self.write("ids.txt", "1\nx\n3\n")
+        with self.assertRaisesRegex(ValueError, "invalid int value in .*ids.txt: 'x'"):
+            argfile.read_values(path, int)
+
+
+class TestListParams(TaskCLITestCase):
+    def test_signature_list_param(self):
+        @task
+        def total(ids: list[int]):
+            return ids
+
+        path = self.write("ids.txt", "10\n20\n")
+        self.assertEqual(cli(argv=["tool", "total", "--ids", "1", f"@{path}", "2"], force=True), [1, 10, 20, 2])
+        self.assertEqual(cli(argv=["tool", "total", "--ids", "3"], force=True), [3])
+
+    def test_arg_decorator_list_and_escape(self):
+        @task
+        @arg("names", nargs="+")
+        def greet(names):
+            return names
+
+        path = self.write("names.txt", "ann\nbob\n")
+        self.assertEqual(cli(argv=["tool", "greet", f"@{path}", "@@home"], force=True), ["ann", "bob", "@home"])
+
+    def test_stdin(self):
+        @task
+        def total(ids: list[float]):
+            return ids
+
+        with patch("sys.stdin", io.StringIO("1.5\n2\n")):
+            self.assertEqual(cli(argv=["tool", "total", "--ids", "@-"], force=True), [1.5, 2.0])
+
+    def test_errors_are_parsing_errors(self):
+        @task
+        def total(ids: list[int]):
+            return ids
+
+        with self.assertRaisesRegex(ParsingError, "argument --ids: invalid int value in arguments: 'x'"):
+            cli(argv=["tool", "total", "--ids", "x"], force=True)
+        with self.assertRaisesRegex(ParsingError, "can't read .*nope.txt"):
+            cli(argv=["tool", "total", "--ids", f"@{self.tmpdir.name}/nope.txt"], force=True)
@@ -0,0 +1,145 @@
+import asyncio
+import io
+import os
+import subprocess
+import sys
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+import taskcli
+from taskcli import cli, cli_async, task, arg
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+
+class TaskCLITestCase(TestCase):
+    def setUp(self) -> None:
+        taskcli.taskcli.cleanup_for_tests()
+
+
+class TestAsyncTasks(TaskCLITestCase):
+    def test_signature_marks_async(self):
+        async def fun(a):
+            pass
+
+        def fun2(a):
+            pass
+
+        self.assertTrue(taskcli.taskcli.analyze_signature(fun)["is_async"])
+        self.assertFalse(taskcli.taskcli.analyze_signature(fun2)["is_async"])
+
+    def test_async_task_is_awaited(self):
+        @task
+        async def fetch(n: int = 1):
+            await asyncio.sleep(0)
+            return n * 2
+
+        self.assertEqual(cli(argv=["tool", "fetch", "-n", "21"], force=True), 42)
+
+    def test_tasks_share_one_event_loop(self):
+        loops = []
+
+        @task
+        async def fetch():
+            loops.append(asyncio.get_running_loop())
+
+        cli(argv=["tool", "fetch"], force=True)
+        cli(argv=["tool", "fetch"], force=True)
+        self.assertIs(loops[0], loops[1])
+        self.assertIs(loops[0], taskcli.taskcli.get_event_loop())
+
+    def test_async_deps_run_concurrently(self):
+        events = {}
+
+        @task
+        async def one():
+            events.setdefault("one", asyncio.Event()).set()
+            await asyncio.wait_for(events.setdefault("two", asyncio.Event()).wait(), 5)
+
+        @task
+        async def two():
+            events.setdefault("two", asyncio.Event()).set()
+            await asyncio.wait_for(events.setdefault("one", asyncio.Event()).wait(), 5)
+
+        @task(deps=[one, two])
+        def both():
+            return "done"
+
+        self.assertEqual(cli(argv=["tool", "--jobs", "2", "both"], force=True), "done")
+
+    def test_required_env_checked_for_async(self):
+        @task(required_env=["TASKCLI_TEST_ASYNC_VAR"])
+        async def fetch():
+            return 1
+
+        with patch.dict(os.environ, {}, clear=True):
+            with self.assertRaisesRegex(SystemExit, "Missing required environment variables"):
+                cli(argv=["tool", "fetch"], force=True)
+
+    def test_async_task_with_cache(self):
+        calls = []
+
+        @task(cache=True)
+        async def fetch():
+            calls.append(1)
+            return "value"
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with patch.dict(os.environ, {"TASKCLI_STATE_DIR": tmpdir}):
+                self.assertEqual(cli(argv=["tool", "fetch"], force=True), "value")
+                self.assertEqual(cli(argv=["tool", "fetch"], force=True), "value")
+        self.assertEqual(len(calls), 1)
+
+
+class TestCliAsync(TaskCLITestCase):
+    def test_cli_async_uses_running_loop(self):
+        @task
+        async def fetch(n: int = 1):
+            return asyncio.get_running_loop(), n
+
+        async def main():
+            loop, n = await cli_async(["tool", "fetch", "-n", "3"])
+            return loop is asyncio.get_running_loop(), n
+
+        self.assertEqual(asyncio.run(main()), (True, 3))
+
+    def test_cli_async_with_sync_task(self):
+        @task
+        def add(a: int, b: int):
+            return a + b
+
+        self.assertEqual(asyncio.run(cli_async(["tool", "add", "-a", "1", "-b", "2"])), 3)
+
+    def test_cli_async_chain_and_output(self):
+        @task
+        async def first():
+            return 1
+
+        @task
+        async def records():
+            for i in range(3):
+                yield {"i": i}
+
+        self.assertEqual(asyncio.run(cli_async(["tool", "first", "--", "first"])), [1, 1])
+        with patch("sys.stdout", new_callable=io.StringIO) as stdout:
+            self.assertIsNone(asyncio.run(cli_async(["tool", "--output", "jsonl", "records"])))
+        self.assertEqual(stdout.getvalue(), '{"i":0}\n{"i":1}\n{"i":2}\n')
+
+    def test_asyncio_imported_lazily(self):
+        code = "import sys, taskcli; print('asyncio' in sys.modules)"
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join([SRC_DIR, os.environ.get("PYTHONPATH", "")]))
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env, check=True)
+        self.assertEqual(out.stdout.strip(), "False")
+
+    def test_sync_dispatch_from_shared_loop_fails(self):
+        @task
+        async def inner():
+            return 1
+
+        @task
+        async def outer():
+            return cli(argv=["tool", "inner"], force=True)
+
+        with self.assertRaisesRegex(Exception, "use dispatch_async"):
+            cli(argv=["tool", "outer"], force=True)
@@ -0,0 +1,108 @@
+import io
+import json
+import os
+import tempfile
+import threading
+from unittest import TestCase
+from unittest.mock import patch
+
+import taskcli
+from taskcli import cli, task, arg
+from taskcli.batch import object_to_argv
+
+
+class TaskCLITestCase(TestCase):
+    def setUp(self) -> None:
+        taskcli.taskcli.cleanup_for_tests()
+
+    def run_batch(self, argv, lines):
+        with patch("sys.stdin", io.StringIO("\n".join(lines) + "\n")):
+            with patch("sys.stdout", new_callable=io.StringIO) as stdout:
+                try:
+                    cli(argv=argv, force=True)
+                except SystemExit as e:
+                    self.exit_code = e.code
+                else:
+                    self.exit_code = None
+        return [json.loads(line) for line in stdout.getvalue().splitlines()]
+
+
+class TestObjectToArgv(TaskCLITestCase):
+    def test_conversion(self):
+        @task
+        @arg("files", nargs="+")
+        def fun(files, count: int = 1, verbose: bool = False, quiet: bool = True):
+            pass
+
+        t = taskcli.taskcli.tasks["fun"]
+        self.assertEqual(
+            object_to_argv(t, {"files": ["a", "-b"], "count": 3, "verbose": True, "quiet": True}),
+            ["--count", "3", "--verbose", "--", "a", "-b"],
+        )
+        self.assertEqual(object_to_argv(t, {"quiet": False, "verbose": False}), ["--quiet"])
+        with self.assertRaisesRegex(Exception, "unknown arguments: nope"):
+            object_to_argv(t, {"nope": 1})
+
+
+class TestBatch(TaskCLITestCase):
+    def test_lines_are_parsed_and_dispatched(self):
+        @task
+        def add(a: int, b: int = 10):
+            return a + b
+
+        @task
+        def other():
+            pass
+
+        lines = ['{"a": 1}', "", '["-a", "2", "-b", "3"]', '{"a": "x"}', "not json"]
+        with patch("sys.stderr", new_callable=io.StringIO) as stderr:
+            records = self.run_batch(["tool", "add", "--batch", "-"], lines)
+        self.assertEqual(stderr.getvalue(), "")  # no help of the task for each bad line
+        self.assertEqual(records[0], {"line": 1, "result": 11})
+        self.assertEqual(records[1], {"line": 3, "result": 5})
+        self.assertEqual(records[2]["line"], 4)
+        self.assertIn("invalid int value", records[2]["error"])
+        self.assertEqual(records[3]["line"], 5)
+        self.assertIn("JSONDecodeError", records[3]["error"])
+        self.assertIn("2 lines of the batch failed", self.exit_code)
+
+    def test_file_and_workers_keep_order(self):
+        @task
+        def square(x: int):
+            return x * x
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "input.jsonl")
+            with open(path, "w") as f:
+                f.writelines(f'{{"x": {i}}}\n' for i in range(100))
+            records = self.run_batch(["tool", "square", "--batch", path, "--workers", "4"], [])
+        self.assertEqual(records, [{"line": i + 1, "result": i * i} for i in range(100)])
+        self.assertIsNone(self.exit_code)
+
+    def test_unordered(self):
+        second_written = threading.Event()
+
+        class Output(io.StringIO):
+            def write(self, text):
+                if '"line": 2' in text:
+                    second_written.set()
+                return super().write(text)
+
+        @task
+        def wait_for(x: int):
+            if x == 0:
+                assert second_written.wait(5)
+            return x
+
+        with patch("sys.stdin", io.StringIO('{"x": 0}\n{"x": 1}\n')):
+            with patch("sys.stdout", new_callable=Output) as stdout:
+                cli(argv=["tool", "wait-for", "--batch", "-", "--workers", "2", "--unordered"], force=True)
+        records = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        self.assertEqual([r["result"] for r in records], [1, 0])
+
+    def test_task_with_own_batch_param(self):
+        @task
+        def fun(batch: str = ""):
+            return batch
+
+        self.assertEqual(cli(argv=["tool", "fun", "--batch", "x"], force=True), "x")
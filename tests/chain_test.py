@@ -0,0 +1,158 @@
+import threading
+import time
+from unittest import TestCase
+
+import taskcli
+from taskcli import cli, task, arg
+from taskcli.taskcli import ParsingError, split_chain
+
+
+class TaskCLITestCase(TestCase):
+    def setUp(self) -> None:
+        taskcli.taskcli.cleanup_for_tests()
+
+
+class TestSplitChain(TaskCLITestCase):
+    def test_split_only_before_task_names(self):
+        @task
+        def build(x: int = 0):
+            pass
+
+        @task
+        def run_tests():
+            pass
+
+        argv = ["tool", "build", "-x", "1", "--", "run-tests", "--", "-x", "--", "build"]
+        self.assertEqual(
+            split_chain(argv),
+            [["tool", "build", "-x", "1"], ["tool", "run-tests", "--", "-x"], ["tool", "build"]],
+        )
+
+    def test_single_task(self):
+        self.assertEqual(split_chain(["tool", "--", "foo"]), [["tool", "--", "foo"]])
+
+
+class TestChain(TaskCLITestCase):
+    def test_tasks_run_in_order_with_own_args(self):
+        calls = []
+
+        @task
+        def build(x: int = 0):
+            calls.append(("build", x))
+            return x
+
+        @task
+        def test(fast: bool = False):
+            calls.append(("test", fast))
+            return fast
+
+        @task
+        def deploy():
+            calls.append(("deploy",))
+
+        ret = cli(argv=["tool", "build", "-x", "1", "--", "test", "--fast", "--", "deploy"], force=True)
+        self.assertEqual(ret, [1, True, None])
+        self.assertEqual(calls, [("build", 1), ("test", True), ("deploy",)])
+
+    def test_invalid_args_fail_before_anything_runs(self):
+        calls = []
+
+        @task
+        def first():
+            calls.append("first")
+
+        @task
+        def second(x: int = 0):
+            calls.append("second")
+
+        with self.assertRaises(ParsingError):
+            cli(argv=["tool", "first", "--", "second", "-x", "notanumber"], force=True)
+        self.assertEqual(calls, [])
+
+    def test_shared_deps_run_once(self):
+        calls = []
+
+        @task
+        def generate():
+            calls.append("generate")
+
+        @task(deps=[generate])
+        def build():
+            calls.append("build")
+
+        @task(deps=[generate, build])
+        def test():
+            calls.append("test")
+
+        cli(argv=["tool", "build", "--", "test"], force=True)
+        self.assertEqual(calls, ["generate", "build", "test"])
+
+    def test_parallel(self):
+        barrier = threading.Barrier(2, timeout=5)
+
+        @task
+        def one():
+            barrier.wait()  # would time out if the tasks ran one after the other
+            return 1
+
+        @task
+        def two():
+            barrier.wait()
+            return 2
+
+        ret = cli(argv=["tool", "--parallel", "one", "--", "two"], force=True)
+        self.assertEqual(ret, [1, 2])
+
+    def test_parallel_chained_dependency_runs_once(self):
+        calls = []
+
+        @task
+        def a(x: int = 0):
+            calls.append(("a", x))
+            return "a"
+
+        @task(deps=[a])
+        def b():
+            calls.append(("b",))
+            return "b"
+
+        ret = cli(argv=["tool", "--parallel", "b", "--", "a", "-x", "2"], force=True)
+        self.assertEqual(ret, ["b", "a"])
+        self.assertEqual(calls, [("a", 2), ("b",)])
+
+    def test_chained_dependency_runs_once(self):
+        calls = []
+
+        @task
+        def a(x: int = 0):
+            calls.append(("a", x))
+
+        @task(deps=[a])
+        def d():
+            calls.append(("d",))
+
+        @task(deps=[d])
+        def b():
+            calls.append(("b",))
+
+        cli(argv=["tool", "b", "--", "a", "-x", "3"], force=True)
+        self.assertEqual(calls, [("a", 3), ("d",), ("b",)])
+
+    def test_parallel_dependency_waits_for_chained_task(self):
+        calls = []
+
+        @task
+        def a():
+            time.sleep(0.05)
+            calls.append("a")
+
+        @task(deps=[a])
+        def d():
+            calls.append("d")
+
+        @task(deps=[d])
+        def b():
+            calls.append("b")
+
+        cli(argv=["tool", "--parallel", "a", "--", "b"], force=True)
+        self.assertEqual(calls, ["a", "d", "b"])
@@ -0,0 +1,140 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import textwrap
+import time
+from unittest import TestCase
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+SCRIPT = """
+from typing import Iterator
+from taskcli import task, cli
+
+@task(aliases=["b"])
+def build(a: int, name: str = "x", flag: bool = False):
+    \"\"\"Build it.\"\"\"
+    print("build", a, name, flag)
+
+@task(namespace="db")
+def migrate(target: str = "head"):
+    print("migrate", target)
+
+@task
+def count(lines: Iterator[str]):
+    print("count", sum(1 for _ in lines))
+
+@task(deps=["db migrate"])
+def release():
+    print("release")
+
+if __name__ == "__main__":
+    cli()
+"""
+
+
+class TestCompile(TestCase):
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.script = os.path.join(self.tmpdir.name, "tasks.py")
+        with open(self.script, "w") as f:
+            f.write(textwrap.dedent(SCRIPT))
+        self.tool = os.path.join(self.tmpdir.name, "tool")
+        self.env = dict(
+            os.environ,
+            PYTHONPATH=os.pathsep.join([SRC_DIR, os.environ.get("PYTHONPATH", "")]),
+            TASKCLI_HISTORY="0",
+        )
+        subprocess.run(
+            [sys.executable, "-m", "taskcli", "compile", self.script, "-o", self.tool], env=self.env, check=True
+        )
+
+    def run_tool(self, *args, input=None):
+        return subprocess.run(
+            [sys.executable, "-X", "importtime", self.tool, *args],
+            env=self.env,
+            cwd=self.tmpdir.name,
+            input=input,
+            capture_output=True,
+            text=True,
+        )
+
+    def imported(self, result):
+        return [line.split("|")[-1].strip() for line in result.stderr.splitlines() if line.startswith("import time:")]
+
+    def output(self, result):
+        return "".join(line + "\n" for line in result.stderr.splitlines() if not line.startswith("import time:"))
+
+    def test_listing_and_help_without_importing(self):
+        result = self.run_tool("-h")
+        self.assertEqual(result.returncode, 0)
+        self.assertIn("## build  (aliases: b)\nBuild it.\nusage: tool [-h] -a A", self.output(result))
+        self.assertIn("## db migrate", self.output(result))
+        self.assertNotIn("taskcli", self.imported(result))
+
+        result = self.run_tool("db", "migrate", "-h")
+        self.assertEqual(result.returncode, 0)
+        self.assertIn("--target TARGET", self.output(result))
+        self.assertNotIn("taskcli", self.imported(result))
+
+    def test_dispatch(self):
+        self.assertEqual(self.run_tool("build", "-a", "1", "--flag").stdout, "build 1 x True\n")
+        self.assertEqual(self.run_tool("b", "-a", "2").stdout, "build 2 x False\n")
+        self.assertEqual(self.run_tool("db", "migrate").stdout, "migrate head\n")
+
+    def test_static_dispatch_is_recorded(self):
+        self.env.update(TASKCLI_HISTORY="1", XDG_STATE_HOME=os.path.join(self.tmpdir.name, "state"))
+        self.env.pop("TASKCLI_STATE_DIR", None)
+        self.run_tool("build", "-a", "1")
+        self.run_tool("count", input="a\n")
+        history_dir = os.path.join(self.tmpdir.name, "state", "taskcli", "history")
+        [name] = os.listdir(history_dir)
+        self.assertTrue(name.startswith("tasks.py-"))
+        with open(os.path.join(history_dir, name)) as f:
+            self.assertEqual([line.split("\t")[1] for line in f], ["build", "count"])
+        self.assertFalse(os.path.exists(os.path.join(self.tmpdir.name, ".taskcli")))
+
+    def test_fallback(self):
+        self.assertEqual(self.run_tool("count", input="a\nb\n").stdout, "count 2\n")
+        self.assertEqual(self.run_tool("release").stdout, "migrate head\nrelease\n")
+        result = self.run_tool("build", "-a", "1", "--", "db", "migrate")
+        self.assertEqual(result.stdout, "build 1 x False\nmigrate head\n")
+
+        result = self.run_tool("build")
+        self.assertNotEqual(result.returncode, 0)
+        self.assertIn("the following arguments are required: -a", self.output(result))
+
+    def test_changed_script_is_not_dispatched_statically(self):
+        time.sleep(0.01)
+        with open(self.script, "a") as f:
+            f.write("\n@task\ndef added():\n    print('added')\n")
+        self.assertEqual(self.run_tool("added").stdout, "added\n")
+        self.assertIn("## added", self.output(self.run_tool("-h")))
+
+    def test_moved_together_with_script(self):
+        moved = os.path.join(self.tmpdir.name, "moved")
+        os.mkdir(moved)
+        for name in ["tasks.py", "tool"]:
+            os.rename(os.path.join(self.tmpdir.name, name), os.path.join(moved, name))
+        self.tool = os.path.join(moved, "tool")
+
+        with open(self.tool) as f:
+            self.assertTrue(f.readline().startswith("#!/usr/bin/env python3"))
+        result = self.run_tool("build", "-a", "1")
+        self.assertEqual(result.stdout, "build 1 x False\n")
+        self.assertEqual(self.run_tool("release").stdout, "migrate head\nrelease\n")
+
+    def test_copied_without_script(self):
+        copied = os.path.join(self.tmpdir.name, "copied")
+        os.mkdir(copied)
+        shutil.copy(self.tool, copied)
+        self.tool = os.path.join(copied, "tool")
+
+        self.assertNotIn("taskcli", self.imported(self.run_tool("-h")))
+        result = self.run_tool("release")
+        self.assertEqual(result.returncode, 1)
+        self.assertIn("tasks.py not found", self.output(result))
+        self.assertNotIn("Traceback", result.stderr)
@@ -0,0 +1,138 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+from unittest import TestCase
+
+import taskcli
+from taskcli import task, arg
+from taskcli import completion, manifest
+
+SCRIPT = """
+from taskcli import task, arg, cli
+
+with open(__file__ + ".log", "a") as f:
+    f.write("imported\\n")
+
+
+@task(main=True)
+def build(target: str = "all", fast: bool = False):
+    pass
+
+
+@task
+@arg("--env", choices=["dev", "prod"])
+def deploy(env, dry_run: bool = False):
+    pass
+
+
+cli()
+"""
+
+
+class TaskCLITestCase(TestCase):
+    def setUp(self) -> None:
+        taskcli.taskcli.cleanup_for_tests()
+
+
+class TestComplete(TaskCLITestCase):
+    def setUp(self) -> None:
+        super().setUp()
+
+        @task(main=True)
+        def build(target: str = "all", fast: bool = False):
+            pass
+
+        @task
+        @arg("--env", choices=["dev", "prod"])
+        def deploy_app(env, dry_run: bool = False):
+            pass
+
+        @task
+        @arg("kind", choices=["full", "quick"])
+        def check(kind):
+            pass
+
+        self.records = [line.split("\t") for line in completion.build_index(["/some/tool.py"])]
+
+    def test_task_names(self):
+        self.assertEqual(completion.complete(self.records, ["tool", ""]), ["build", "deploy-app", "check"])
+        self.assertEqual(completion.complete(self.records, ["tool", "de"]), ["deploy-app"])
+
+    def test_flags(self):
+        self.assertEqual(completion.complete(self.records, ["tool", "deploy-app", "--d"]), ["--dry-run"])
+        self.assertIn("--env", completion.complete(self.records, ["tool", "deploy-app", "-"]))
+
+    def test_default_task_flags(self):
+        self.assertEqual(completion.complete(self.records, ["tool", "--f"]), ["--fast"])
+
+    def test_choices(self):
+        self.assertEqual(completion.complete(self.records, ["tool", "deploy-app", "--env", ""]), ["dev", "prod"])
+        self.assertEqual(completion.complete(self.records, ["tool", "deploy-app", "--env", "p"]), ["prod"])
+
+    def test_positional_choices(self):
+        self.assertEqual(completion.complete(self.records, ["tool", "check", "q"]), ["quick"])
+
+
+class ScriptTestCase(TaskCLITestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.script = os.path.join(self.tmpdir.name, "tool.py")
+        with open(self.script, "w") as f:
+            f.write(SCRIPT)
+
+    def tearDown(self) -> None:
+        manifest.loaded_scripts.clear()
+        self.tmpdir.cleanup()
+
+    def import_count(self):
+        with open(self.script + ".log") as f:
+            return len(f.readlines())
+
+
+class TestIndexFreshness(ScriptTestCase):
+    def test_index_regenerated_only_when_source_changes(self):
+        path = completion.ensure_index(self.script)
+        mtime = os.stat(path).st_mtime_ns
+        self.assertTrue(completion.index_is_fresh(self.script))
+
+        completion.ensure_index(self.script)
+        self.assertEqual(os.stat(path).st_mtime_ns, mtime)
+
+        # make the script newer than the index, without changing its content
+        st = os.stat(self.script)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns - 10**9))
+        self.assertFalse(completion.index_is_fresh(self.script))
+        completion.ensure_index(self.script)
+        self.assertTrue(completion.index_is_fresh(self.script))
+        # content didn't change, so the manifest was used and the script not imported again
+        self.assertEqual(self.import_count(), 1)
+
+    def test_unknown_shell(self):
+        with self.assertRaisesRegex(Exception, "Unsupported shell"):
+            completion.shell_script("tcsh", self.script)
+
+
+@unittest.skipUnless(shutil.which("bash") and shutil.which("awk"), "requires bash and awk")
+class TestBashCompletion(ScriptTestCase):
+    def bash_complete(self, *words):
+        code = completion.shell_script("bash", self.script, prog="tool")
+        words_q = " ".join(f"'{w}'" for w in words)
+        code += f"""
+COMP_WORDS=({words_q})
+COMP_CWORD={len(words) - 1}
+_taskcli_complete_tool
+printf '%s\\n' "${{COMPREPLY[@]}}"
+"""
+        out = subprocess.run(["bash", "-c", code], capture_output=True, text=True, check=True).stdout
+        return [line for line in out.splitlines() if line]
+
+    def test_bash(self):
+        completion.ensure_index(self.script)
+        self.assertEqual(self.bash_complete("tool", ""), ["build", "deploy"])
+        self.assertEqual(self.bash_complete("tool", "deploy", "--d"), ["--dry-run"])
+        self.assertEqual(self.bash_complete("tool", "deploy", "--env", ""), ["dev", "prod"])
+        self.assertEqual(self.bash_complete("tool", "--t"), ["--target"])
+        self.assertEqual(self.import_count(), 1)
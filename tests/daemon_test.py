@@ -0,0 +1,135 @@
+import os
+import subprocess
+import sys
+import tempfile
+import textwrap
+import time
+import unittest
+from unittest import TestCase
+from unittest.mock import patch
+
+from taskcli import daemon
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+SCRIPT = """
+import os, sys
+from taskcli import task, cli
+
+@task
+def hello(name: str = "world"):
+    print(f"hello {name} {os.getcwd()} {os.environ.get('SOME_VAR')}")
+
+@task
+def fail():
+    sys.exit(3)
+
+if __name__ == "__main__":
+    cli()
+"""
+
+
+@unittest.skipUnless(hasattr(os, "fork") and hasattr(__import__("socket"), "send_fds"), "requires fork and send_fds")
+class TestDaemon(TestCase):
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.script = os.path.join(self.tmpdir.name, "tool.py")
+        with open(self.script, "w") as f:
+            f.write(textwrap.dedent(SCRIPT))
+        self.env = dict(
+            os.environ,
+            PYTHONPATH=os.pathsep.join([SRC_DIR, os.environ.get("PYTHONPATH", "")]),
+            TASKCLI_HISTORY="0",
+        )
+
+        self.server = subprocess.Popen(
+            [sys.executable, "-m", "taskcli", "serve", self.script, "--idle-timeout", "30"],
+            env=self.env,
+            stderr=subprocess.DEVNULL,
+        )
+        self.addCleanup(self.stop_server)
+        deadline = time.monotonic() + 10
+        while not os.path.exists(daemon.socket_path(self.script)):
+            self.assertLess(time.monotonic(), deadline, "daemon did not start")
+            time.sleep(0.02)
+
+    def stop_server(self):
+        self.server.terminate()
+        self.server.wait()
+
+    def call(self, *args, **env):
+        return subprocess.run(
+            [sys.executable, "-m", "taskcli", "call", self.script, *args],
+            env=dict(self.env, **env),
+            cwd=self.tmpdir.name,
+            capture_output=True,
+            text=True,
+            timeout=20,
+        )
+
+    def test_runs_with_client_cwd_env_and_stdio(self):
+        result = self.call("hello", "--name", "x", SOME_VAR="some-value")
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout, f"hello x {os.path.realpath(self.tmpdir.name)} some-value\n")
+
+    def test_exit_code(self):
+        self.assertEqual(self.call("fail").returncode, 3)
+        result = self.call("nosuchtask")
+        self.assertNotEqual(result.returncode, 0)
+
+    def test_reload_on_source_change(self):
+        self.assertIn("hello world", self.call("hello").stdout)
+        with open(self.script) as f:
+            code = f.read()
+        with open(self.script, "w") as f:
+            f.write(code.replace('print(f"hello', 'print(f"bye'))
+        os.utime(self.script, ns=(time.time_ns() + 10**9, time.time_ns() + 10**9))
+
+        result = self.call("hello")
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn("bye world", result.stdout)
+        self.assertIsNone(self.server.poll(), "reload happens in the same process (exec)")
+
+    def test_idle_exit(self):
+        self.stop_server()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "taskcli", "serve", self.script, "--idle-timeout", "0"],
+            env=self.env,
+            stderr=subprocess.DEVNULL,
+        )
+        self.assertEqual(server.wait(timeout=10), 0)
+        self.assertFalse(os.path.exists(daemon.socket_path(self.script)))
+        self.assertFalse(daemon.daemon_running(self.script))
+
+
+class TestRuntimeDir(TestCase):
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        patcher = patch.dict(os.environ, {"XDG_RUNTIME_DIR": self.tmpdir.name})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_private_directory(self):
+        path = daemon.runtime_dir()
+        self.assertEqual(path, os.path.join(self.tmpdir.name, "taskcli"))
+        self.assertEqual(os.stat(path).st_mode & 0o777, 0o700)
+        self.assertEqual(os.path.dirname(daemon.socket_path("tool.py")), path)
+
+    def test_shared_directory_refused(self):
+        os.mkdir(os.path.join(self.tmpdir.name, "taskcli"), 0o777)
+        os.chmod(os.path.join(self.tmpdir.name, "taskcli"), 0o777)
+        with self.assertRaisesRegex(Exception, "accessible only to them"):
+            daemon.runtime_dir()
+
+    def test_lock_is_not_followed_through_a_symlink(self):
+        target = os.path.join(self.tmpdir.name, "target")
+        with open(target, "w") as f:
+            f.write("keep")
+        path = daemon.socket_path("tool.py")
+        os.symlink(target, f"{path}.lock")
+        with self.assertRaises(OSError):
+            daemon._open_lock(path)
+        with open(target) as f:
+            self.assertEqual(f.read(), "keep")
@@ -0,0 +1,97 @@
+import contextlib
+import io
+import os
+from unittest import TestCase
+from unittest.mock import patch
+
+import taskcli
+from taskcli import cli, envreq, task
+
+
+class TaskCLITestCase(TestCase):
+    def setUp(self) -> None:
+        taskcli.taskcli.cleanup_for_tests()
+
+
+class TestRequirements(TaskCLITestCase):
+    def unmet(self, specs, environ):
+        with patch.dict(os.environ, environ, clear=True):
+            return envreq.compile(specs).unmet()
+
+    def test_plain_names(self):
+        self.assertEqual(self.unmet(["A", "B", "C"], {"A": "1", "B": ""}), (["C"], ["B"]))
+
+    def test_wildcards(self):
+        self.assertEqual(self.unmet(["AWS_*"], {"AWS_REGION": "x"}), ([], []))
+        self.assertEqual(self.unmet(["AWS_*"], {"AWS_REGION": "", "AWS_PROFILE": "p"}), ([], []))
+        self.assertEqual(self.unmet(["AWS_*"], {"AWS_REGION": ""}), ([], ["AWS_*"]))
+        self.assertEqual(self.unmet(["AWS_*"], {"AWS": "x"}), (["AWS_*"], []))
+
+    def test_alternatives(self):
+        self.assertEqual(self.unmet(["TOKEN|API_KEY"], {"API_KEY": "k"}), ([], []))
+        self.assertEqual(self.unmet(["TOKEN|API_KEY"], {"TOKEN": ""}), ([], ["TOKEN|API_KEY"]))
+        self.assertEqual(self.unmet(["TOKEN|GH_*"], {}), (["TOKEN|GH_*"], []))
+        self.assertEqual(self.unmet(["TOKEN|GH_*"], {"GH_TOKEN": "t"}), ([], []))
+
+    def test_compiled_once(self):
+        self.assertIs(envreq.compile(["A", "B*"]), envreq.compile(("A", "B*")))
+
+    def test_invalid_entry(self):
+        with self.assertRaisesRegex(Exception, "Invalid required_env entry 'A|'"):
+
+            @task(required_env=["A|"])
+            def fun():
+                pass
+
+    def test_memoized_until_the_environment_changes(self):
+        requirements = envreq.compile(["TASKCLI_TEST_MEMO_*"])
+        with patch.object(requirements, "_evaluate", wraps=requirements._evaluate) as evaluate:
+            with patch.dict(os.environ, {"TASKCLI_TEST_MEMO_A": "1"}):
+                requirements.check()
+                requirements.check()
+                self.assertEqual(evaluate.call_count, 1)
+                os.environ["TASKCLI_TEST_MEMO_A"] = ""
+                self.assertEqual(requirements.unmet(), ([], ["TASKCLI_TEST_MEMO_*"]))
+                self.assertEqual(evaluate.call_count, 2)
+
+
+    def test_unrelated_variables_dont_invalidate(self):
+        requirements = envreq.compile(["TASKCLI_TEST_MEMO_B"])
+        with patch.object(requirements, "_evaluate", wraps=requirements._evaluate) as evaluate:
+            with patch.dict(os.environ, {"TASKCLI_TEST_MEMO_B": "1"}):
+                requirements.check()
+                os.environ["TASKCLI_TEST_OTHER"] = "x"
+                requirements.check()
+                self.assertEqual(evaluate.call_count, 1)
+                del os.environ["TASKCLI_TEST_MEMO_B"]
+                self.assertEqual(requirements.unmet(), (["TASKCLI_TEST_MEMO_B"], []))
+                self.assertEqual(evaluate.call_count, 2)
+
+
+class TestRequiredEnvPatterns(TaskCLITestCase):
+    def test_checked_when_dispatching(self):
+        @task(required_env=["TASKCLI_TEST_TOKEN|TASKCLI_TEST_KEY", "TASKCLI_TEST_AWS_*"])
+        def fun():
+            return 1
+
+        with patch.dict(os.environ, {"TASKCLI_TEST_KEY": "k"}, clear=True):
+            with self.assertRaisesRegex(SystemExit, "Missing required environment variables: TASKCLI_TEST_AWS_\\*"):
+                cli(argv=["foo", "fun"], force=True)
+
+        with patch.dict(os.environ, {"TASKCLI_TEST_KEY": "k", "TASKCLI_TEST_AWS_REGION": "r"}, clear=True):
+            self.assertEqual(cli(argv=["foo", "fun"], force=True), 1)
+
+    def test_help(self):
+        @task(required_env=["TASKCLI_TEST_TOKEN|TASKCLI_TEST_KEY", "TASKCLI_TEST_AWS_*", "TASKCLI_TEST_HOME"])
+        def fun():
+            return 1
+
+        stderr = io.StringIO()
+        environ = {"TASKCLI_TEST_KEY": "k", "TASKCLI_TEST_HOME": ""}
+        with patch.dict(os.environ, environ, clear=True), contextlib.redirect_stderr(stderr):
+            with self.assertRaises(SystemExit):
+                cli(argv=["foo", "fun", "-h"], force=True)
+        help_text = stderr.getvalue()
+        self.assertIn("  TASKCLI_TEST_TOKEN|TASKCLI_TEST_KEY \n", help_text)
+        self.assertRegex(help_text, r"TASKCLI_TEST_AWS_\* .*\(missing\)")
+        self.assertRegex(help_text, r"TASKCLI_TEST_HOME .*\(empty\)")
@@ -0,0 +1,148 @@
+import io
+import os
+import subprocess
+import sys
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+import taskcli
+from taskcli import cli, history, task
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+
+class HistoryTestCase(TestCase):
+    def setUp(self) -> None:
+        taskcli.taskcli.cleanup_for_tests()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        patcher = patch.dict(os.environ, {"TASKCLI_STATE_DIR": self.tmpdir.name, "TASKCLI_HISTORY": "1"})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch.object(history, "record_runs", True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.path = os.path.join(self.tmpdir.name, history.HISTORY_FILE)
+
+        @task(aliases=["b"])
+        def build(n: int = 1):
+            return n
+
+        @task
+        def fail():
+            raise ValueError("failed")
+
+        @task
+        def stop():
+            raise SystemExit(3)
+
+    def stats(self, *args):
+        with patch("sys.stdout", new_callable=io.StringIO) as stdout:
+            self.assertIsNone(cli(argv=["tool", "--stats", *args], force=True))
+        return stdout.getvalue()
+
+
+class TestRecording(HistoryTestCase):
+    def test_runs_are_recorded(self):
+        cli(argv=["tool", "build", "-n", "2"], force=True)
+        cli(argv=["tool", "b", "-n", "3"], force=True)
+        with self.assertRaises(ValueError):
+            cli(argv=["tool", "fail"], force=True)
+        with self.assertRaises(SystemExit):
+            cli(argv=["tool", "stop"], force=True)
+
+        runs = history.read()
+        statuses = [(run.task, run.status) for run in runs]
+        self.assertEqual(statuses, [("build", 0), ("build", 0), ("fail", 1), ("stop", 3)])
+        self.assertNotEqual(runs[0].args_hash, runs[1].args_hash)
+        self.assertTrue(all(run.wall_ms >= 0 and run.cpu_ms >= 0 for run in runs))
+
+    def test_chain_records_each_task(self):
+        cli(argv=["tool", "build", "--", "build", "-n", "2"], force=True)
+        self.assertEqual(len(history.read()), 2)
+
+    def test_per_user_and_script(self):
+        state_home = os.path.join(self.tmpdir.name, "state")
+        with patch.dict(os.environ, {"XDG_STATE_HOME": state_home}):
+            del os.environ["TASKCLI_STATE_DIR"]
+            with patch.object(history, "script_path", "/work/a/tool.py"):
+                cli(argv=["tool", "build"], force=True)
+                self.assertEqual(len(history.read()), 1)
+            with patch.object(history, "script_path", "/work/b/tool.py"):
+                self.assertEqual(history.read(), [])
+                cli(argv=["tool", "build"], force=True)
+                path = history.history_path()
+        self.assertTrue(path.startswith(os.path.join(state_home, "taskcli", "history", "tool.py-")))
+        self.assertEqual(len(os.listdir(os.path.dirname(path))), 2)
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_disabled(self):
+        with patch.dict(os.environ, {"TASKCLI_HISTORY": "0"}):
+            cli(argv=["tool", "build"], force=True)
+        self.assertEqual(history.read(), [])
+
+    def test_args_hash_of_non_plain_values(self):
+        first = history.args_hash({"items": iter([1]), "n": 1})
+        self.assertEqual(first, history.args_hash({"n": 1, "items": iter([2])}))
+        self.assertNotEqual(history.args_hash({"n": 1}), history.args_hash({"n": 2}))
+
+    def test_compaction(self):
+        run = history.Run(0.0, "build", "abc", 1.0, 1.0, 0)
+        line_size = len(history._format(run))
+        with patch.object(history, "MAX_BYTES", line_size * 20), patch.object(history, "KEEP_PER_TASK", 5):
+            for i in range(30):
+                history.append(run._replace(timestamp=float(i), task=f"t{i % 2}"), self.path)
+                self.assertLessEqual(os.path.getsize(self.path), line_size * 20)
+        runs = history.read(self.path)
+        self.assertLess(len(runs), 30)
+        self.assertEqual(runs[-1].timestamp, 29.0)
+        self.assertEqual({run.task for run in runs}, {"t0", "t1"})
+
+    def test_malformed_lines_are_skipped(self):
+        cli(argv=["tool", "build"], force=True)
+        with open(self.path, "a") as f:
+            f.write("garbage\n1\tx\ty\tz\t1\t0\n")
+        self.assertEqual(len(history.read()), 1)
+
+
+class TestStats(HistoryTestCase):
+    def record(self, task_name, wall_times, status=0):
+        for i, wall_ms in enumerate(wall_times):
+            history.append(history.Run(1700000000.0 + i, task_name, "abc", wall_ms, wall_ms, status), self.path)
+
+    def test_percentiles(self):
+        values = list(range(1, 101))
+        self.assertEqual([history.percentile(values, p) for p in (50, 95, 99)], [50, 95, 99])
+        self.assertEqual(history.percentile([7.0], 99), 7.0)
+
+    def test_all_tasks(self):
+        self.record("build", [10.0] * 12 + [20.0] * 4)
+        self.record("fail", [1.0], status=1)
+        lines = self.stats().splitlines()
+        self.assertEqual(lines[0].split(), ["task", "runs", "failed", "p50", "ms", "p95", "ms", "p99", "ms", "trend"])
+        self.assertEqual(lines[1].split(), ["build", "16", "0", "10.0", "20.0", "20.0", "+100%"])
+        self.assertEqual(lines[2].split(), ["fail", "1", "1", "-", "-", "-"])
+
+    def test_one_task(self):
+        self.record("build", [10.0] * 8 + [30.0] * 8)
+        self.record("other", [1.0])
+        output = self.stats("b")  # alias
+        self.assertIn("p50 over time:", output)
+        self.assertNotIn("other", output)
+        over_time = output.split("p50 over time:\n")[1].splitlines()
+        self.assertEqual(len(over_time), history.TREND_BUCKETS)
+        self.assertIn("▃      10.0  (2 runs)", over_time[0])
+        self.assertIn("█      30.0  (2 runs)", over_time[-1])
+
+    def test_nothing_recorded(self):
+        self.assertEqual(self.stats(), "No runs recorded yet.\n")
+        self.assertEqual(self.stats("nosuchtask"), "No runs of task nosuchtask recorded.\n")
+
+
+class TestImports(TestCase):
+    def test_statistics_imported_lazily(self):
+        code = "import sys, taskcli; print('statistics' in sys.modules)"
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join([SRC_DIR, os.environ.get("PYTHONPATH", "")]))
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env, check=True)
+        self.assertEqual(out.stdout.strip(), "False")
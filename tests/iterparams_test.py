@@ -0,0 +1,101 @@
+import collections.abc
+import io
+import os
+import tempfile
+import typing
+from typing import Iterable, Iterator
+from unittest import TestCase
+from unittest.mock import patch
+
+import taskcli
+from taskcli import cli, task
+from taskcli import iterparams
+
+
+class TaskCLITestCase(TestCase):
+    def setUp(self) -> None:
+        taskcli.taskcli.cleanup_for_tests()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def write(self, name, content):
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, "w") as f:
+            f.write(content)
+        return path
+
+
+class TestElementType(TestCase):
+    def test_annotations(self):
+        self.assertEqual(iterparams.element_type(Iterator[int]), int)
+        self.assertEqual(iterparams.element_type(Iterable[str]), str)
+        self.assertEqual(iterparams.element_type(collections.abc.Iterator[float]), float)
+        self.assertEqual(iterparams.element_type(typing.Iterator), str)
+        self.assertIsNone(iterparams.element_type(list[int]))
+        self.assertIsNone(iterparams.element_type(str))
+
+
+class TestIteratorParams(TaskCLITestCase):
+    def test_reads_stdin_lazily(self):
+        seen = []
+
+        @task
+        def first_two(lines: Iterator[str]):
+            self.assertNotIsInstance(lines, list)
+            for line in lines:
+                seen.append(line)
+                if len(seen) == 2:
+                    break
+            return seen
+
+        stdin = io.StringIO("a\nb\nc\n")
+        with patch("sys.stdin", stdin):
+            self.assertEqual(cli(argv=["tool", "first-two"], force=True), ["a", "b"])
+        self.assertEqual(stdin.readline(), "c\n")  # not read ahead
+
+    def test_reads_path_and_converts(self):
+        @task
+        def total(numbers: Iterable[int], scale: int = 1):
+            return sum(numbers) * scale
+
+        path = self.write("numbers.txt", "1\n2\n\n3\n")
+        self.assertEqual(cli(argv=["tool", "total", "--numbers", path, "--scale", "2"], force=True), 12)
+
+    def test_file_opened_only_when_iterated(self):
+        @task
+        def ignore(lines: Iterator[str]):
+            return "ok"
+
+        self.assertEqual(cli(argv=["tool", "ignore", "--lines", "/nonexistent/file"], force=True), "ok")
+
+    def test_invalid_element(self):
+        @task
+        def total(numbers: Iterator[int]):
+            return sum(numbers)
+
+        path = self.write("numbers.txt", "1\nx\n")
+        with self.assertRaisesRegex(ValueError, "numbers.txt:2: invalid int value: 'x'"):
+            cli(argv=["tool", "total", "--numbers", path], force=True)
+
+
+class TestCachedIteratorParams(TaskCLITestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        patcher = patch.dict(os.environ, {"TASKCLI_STATE_DIR": self.tmpdir.name})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        @task(cache=True)
+        def count(lines: Iterator[str]):
+            return sum(1 for _ in lines)
+
+    def test_stdin_is_not_cached(self):
+        for text, expected in [("a\nb\n", 2), ("a\nb\nc\nd\n", 4)]:
+            with patch("sys.stdin", io.StringIO(text)):
+                self.assertEqual(cli(argv=["tool", "count"], force=True), expected)
+
+    def test_file_change_invalidates(self):
+        path = self.write("lines.txt", "a\nb\n")
+        self.assertEqual(cli(argv=["tool", "count", "--lines", path], force=True), 2)
+        self.write("lines.txt", "a\nb\nc\n")
+        self.assertEqual(cli(argv=["tool", "count", "--lines", path], force=True), 3)
@@ -0,0 +1,168 @@
+import io
+import json
+import os
+import tempfile
+import time
+from unittest import TestCase, skipUnless
+from unittest.mock import patch
+
+import multiprocessing
+
+import taskcli
+from taskcli import cli, jobqueue, task
+from taskcli.taskcli import ParsingError
+
+
+class JobQueueTestCase(TestCase):
+    def setUp(self) -> None:
+        taskcli.taskcli.cleanup_for_tests()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        patcher = patch.dict(os.environ, {"TASKCLI_STATE_DIR": self.tmpdir.name})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.db = jobqueue.connect()
+        self.addCleanup(self.db.close)
+
+        @task
+        def add(a: int, b: int = 1):
+            return a + b
+
+        @task(namespace="db")
+        def migrate(target: str = "head"):
+            return f"migrated to {target}"
+
+    def run_cli(self, *args):
+        with patch("sys.stdout", new_callable=io.StringIO) as stdout:
+            cli(argv=["tool", *args], force=True)
+        return stdout.getvalue()
+
+    def job(self, job_id):
+        return self.db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+
+class TestEnqueue(JobQueueTestCase):
+    def test_enqueue_and_work(self):
+        self.assertEqual(self.run_cli("enqueue", "add", "-a", "2", "-b", "3"), "1\n")
+        self.assertEqual(self.run_cli("enqueue", "db", "migrate", "--target", "v2"), "2\n")
+        self.assertEqual(self.job(1)["state"], jobqueue.QUEUED)
+
+        self.run_cli("worker", "--drain")
+        self.assertEqual(json.loads(self.job(1)["result"]), 5)
+        self.assertEqual(json.loads(self.job(2)["result"]), "migrated to v2")
+        self.assertEqual(self.job(2)["state"], jobqueue.DONE)
+
+        listing = self.run_cli("jobs")
+        self.assertIn("done     1/3", listing)
+        self.assertIn("db.migrate --target v2", listing)
+        self.assertEqual(json.loads(self.run_cli("jobs", "1"))["result"], 5)
+
+    def test_global_options_are_stored_with_the_job(self):
+        calls = []
+
+        @task(cache=True)
+        def report():
+            calls.append(1)
+            return len(calls)
+
+        self.run_cli("enqueue", "report")
+        self.run_cli("--no-cache", "enqueue", "report")
+        self.assertEqual(json.loads(self.job(2)["options"]), {"no_cache": True})
+        self.run_cli("worker", "--drain")
+        self.assertEqual([json.loads(self.job(i)["result"]) for i in (1, 2)], [1, 2])
+
+        self.run_cli("enqueue", "report")
+        self.run_cli("--no-cache", "worker", "--drain")
+        self.assertEqual(json.loads(self.job(3)["result"]), 3)
+
+    def test_invalid_arguments_are_not_enqueued(self):
+        with patch("taskcli.taskcli.ArgumentParser.print_help"):
+            with self.assertRaises(ParsingError):
+                self.run_cli("enqueue", "add", "-a", "x")
+            with self.assertRaisesRegex(ParsingError, "expected a task name"):
+                self.run_cli("enqueue", "nosuchtask")
+        self.assertIsNone(self.job(1))
+
+    def test_task_named_like_a_command(self):
+        @task
+        def worker():
+            return "the task"
+
+        self.assertEqual(cli(argv=["tool", "worker"], force=True), "the task")
+
+
+class TestRetries(JobQueueTestCase):
+    def test_retried_until_out_of_attempts(self):
+        calls = []
+
+        @task
+        def flaky(succeed_on: int):
+            calls.append(1)
+            if len(calls) < succeed_on:
+                raise ValueError("not yet")
+            return len(calls)
+
+        self.run_cli("enqueue", "--retries", "2", "--retry-delay", "0", "flaky", "--succeed-on", "3")
+        self.run_cli("worker", "--drain")
+        self.assertEqual((self.job(1)["state"], self.job(1)["attempts"]), (jobqueue.DONE, 3))
+        self.assertEqual(json.loads(self.job(1)["result"]), 3)
+
+        calls.clear()
+        self.run_cli("enqueue", "--retries", "1", "--retry-delay", "0", "flaky", "--succeed-on", "5")
+        self.run_cli("worker", "--drain")
+        self.assertEqual((self.job(2)["state"], self.job(2)["attempts"]), (jobqueue.FAILED, 2))
+        self.assertIn("ValueError: not yet", self.job(2)["error"])
+
+    def test_backoff(self):
+        job_id = jobqueue.enqueue(self.db, "add", ["-a", "1"], retries=3, retry_delay=10)
+        job = jobqueue.claim(self.db, visibility_timeout=60)
+        jobqueue.fail(self.db, job, "boom")
+        self.assertEqual(self.job(job_id)["state"], jobqueue.QUEUED)
+        self.assertGreater(self.job(job_id)["visible_at"], time.time() + 9)
+        self.assertIsNone(jobqueue.claim(self.db, visibility_timeout=60))
+
+
+class TestVisibilityTimeout(JobQueueTestCase):
+    def test_expired_lease_is_taken_over(self):
+        job_id = jobqueue.enqueue(self.db, "add", ["-a", "1"], retries=1)
+        first = jobqueue.claim(self.db, visibility_timeout=0)  # the worker dies with the job
+        second = jobqueue.claim(self.db, visibility_timeout=60)
+        self.assertEqual((second["id"], second["attempts"]), (job_id, 2))
+
+        jobqueue.complete(self.db, first, "late")  # lost its lease, ignored
+        self.assertEqual(self.job(job_id)["state"], jobqueue.RUNNING)
+        jobqueue.complete(self.db, second, 2)
+        self.assertEqual(self.job(job_id)["state"], jobqueue.DONE)
+
+    def test_expired_without_attempts_left(self):
+        job_id = jobqueue.enqueue(self.db, "add", ["-a", "1"], retries=0)
+        jobqueue.claim(self.db, visibility_timeout=0)
+        self.assertIsNone(jobqueue.claim(self.db, visibility_timeout=60))
+        self.assertEqual(self.job(job_id)["state"], jobqueue.FAILED)
+        self.assertEqual(self.job(job_id)["error"], "lease expired")
+
+    def test_lease_extended_while_running(self):
+        @task
+        def slow():
+            time.sleep(0.5)
+            return jobqueue.claim(jobqueue.connect(), visibility_timeout=60) is None
+
+        self.run_cli("enqueue", "slow")
+        jobqueue.work(None, visibility_timeout=0.3, drain=True)
+        self.assertEqual(json.loads(self.job(1)["result"]), True)
+        self.assertEqual(self.job(1)["attempts"], 1)
+
+
+@skipUnless("fork" in multiprocessing.get_all_start_methods(), "requires fork")
+class TestWorkerProcesses(JobQueueTestCase):
+    def test_concurrency(self):
+        @task
+        def pid(n: int):
+            return os.getpid()
+
+        for i in range(8):
+            self.run_cli("enqueue", "pid", "-n", str(i))
+        self.run_cli("worker", "--concurrency", "2", "--drain")
+        rows = self.db.execute("SELECT state, result FROM jobs").fetchall()
+        self.assertEqual({row["state"] for row in rows}, {jobqueue.DONE})
+        self.assertNotIn(os.getpid(), {json.loads(row["result"]) for row in rows})
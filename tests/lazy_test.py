@@ -0,0 +1,120 @@
+import io
+import os
+import sys
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+import taskcli
+from taskcli import cli, task, register_lazy
+
+DECORATED = """
+from taskcli import task
+
+@task
+def build(x: int = 1):
+    return x * 2
+"""
+
+PLAIN = """
+def deploy(target="prod"):
+    return "deploying " + target
+"""
+
+MODULES = {"lazy_decorated_mod": DECORATED, "lazy_plain_mod": PLAIN}
+
+
+class LazyTestCase(TestCase):
+    def setUp(self) -> None:
+        taskcli.taskcli.cleanup_for_tests()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        for name, content in MODULES.items():
+            with open(os.path.join(self.tmpdir.name, f"{name}.py"), "w") as f:
+                f.write(content)
+        sys.path.insert(0, self.tmpdir.name)
+
+    def tearDown(self) -> None:
+        sys.path.remove(self.tmpdir.name)
+        for name in MODULES:
+            sys.modules.pop(name, None)
+        self.tmpdir.cleanup()
+
+
+class TestRegisterLazy(LazyTestCase):
+    def test_registration_does_not_import(self):
+        register_lazy("lazy_decorated_mod:build")
+        register_lazy("lazy_plain_mod:deploy")
+        self.assertNotIn("lazy_decorated_mod", sys.modules)
+        self.assertNotIn("lazy_plain_mod", sys.modules)
+        self.assertTrue(taskcli.taskcli.tasks["build"].is_stub)
+
+    def test_only_selected_module_is_imported(self):
+        register_lazy("lazy_decorated_mod:build")
+        register_lazy("lazy_plain_mod:deploy")
+
+        ret = cli(argv=["foo", "build", "-x", "4"], force=True)
+        self.assertEqual(ret, 8)
+        self.assertIn("lazy_decorated_mod", sys.modules)
+        self.assertNotIn("lazy_plain_mod", sys.modules)
+
+    def test_plain_function_gets_decorated_on_load(self):
+        register_lazy("lazy_plain_mod:deploy")
+        register_lazy("lazy_decorated_mod:build")
+        ret = cli(argv=["foo", "deploy", "--target", "dev"], force=True)
+        self.assertEqual(ret, "deploying dev")
+        self.assertFalse(taskcli.taskcli.tasks["deploy"].is_stub)
+
+    def test_lazy_main_task(self):
+        register_lazy("lazy_plain_mod:deploy", main=True)
+        register_lazy("lazy_decorated_mod:build")
+        self.assertEqual(cli(argv=["foo"], force=True), "deploying prod")
+
+    def test_listing_does_not_import(self):
+        register_lazy("lazy_decorated_mod:build", description="Build all the things")
+        register_lazy("lazy_plain_mod:deploy")
+
+        @task
+        def local(a: int = 1):
+            pass
+
+        with patch("sys.stderr", new_callable=io.StringIO) as stderr:
+            with self.assertRaises(SystemExit):
+                cli(argv=["foo", "-h"], force=True)
+        output = stderr.getvalue()
+        self.assertIn("Build all the things", output)
+        self.assertIn("## deploy", output)
+        self.assertIn("## local", output)
+        self.assertNotIn("lazy_decorated_mod", sys.modules)
+        self.assertNotIn("lazy_plain_mod", sys.modules)
+
+    def test_does_not_replace_loaded_task(self):
+        @task
+        def deploy():
+            return "local"
+
+        register_lazy("lazy_plain_mod:deploy")
+        self.assertFalse(taskcli.taskcli.tasks["deploy"].is_stub)
+        self.assertEqual(cli(argv=["foo", "deploy"], force=True), "local")
+
+    def test_invalid_target(self):
+        with self.assertRaisesRegex(Exception, "Invalid lazy task target"):
+            register_lazy("lazy_plain_mod.deploy")
+
+    def test_missing_function(self):
+        register_lazy("lazy_plain_mod:nope")
+        with self.assertRaisesRegex(Exception, "has no attribute 'nope'"):
+            cli(argv=["foo", "nope"], force=True)
+
+
+class TestLazyInManifest(LazyTestCase):
+    def test_lazy_task_stays_lazy_in_manifest(self):
+        from taskcli import manifest
+
+        register_lazy("lazy_plain_mod:deploy", description="Deploy")
+        data = manifest.build_manifest(os.path.join(self.tmpdir.name, "lazy_plain_mod.py"))
+
+        taskcli.taskcli.cleanup_for_tests()
+        manifest.install_stubs(data, os.path.join(self.tmpdir.name, "lazy_plain_mod.py"))
+        self.assertFalse(taskcli.taskcli.tasks["deploy"].params_known)
+        self.assertEqual(taskcli.taskcli.tasks["deploy"].description, "Deploy")
+        self.assertEqual(cli(argv=["foo", "deploy"], force=True), "deploying prod")
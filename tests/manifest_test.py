@@ -0,0 +1,118 @@
+import io
+import os
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+import taskcli
+from taskcli import manifest
+from taskcli.taskcli import ParsingError
+
+SCRIPT = """
+from taskcli import task, arg, cli
+
+with open(__file__ + ".log", "a") as f:
+    f.write("imported\\n")
+
+
+@task
+@arg("a", type=int)
+def add(a, b: int = 1):
+    return a + b
+
+
+@task(main=True, required_env=["SOME_ENV"])
+def hello(name="world"):
+    return "hello " + name
+
+
+cli()
+"""
+
+
+class ManifestTestCase(TestCase):
+    def setUp(self) -> None:
+        taskcli.taskcli.cleanup_for_tests()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.script = os.path.join(self.tmpdir.name, "tool.py")
+        self.write_script(SCRIPT)
+
+    def tearDown(self) -> None:
+        self.tmpdir.cleanup()
+
+    def write_script(self, content):
+        with open(self.script, "w") as f:
+            f.write(content)
+
+    def import_count(self):
+        if not os.path.exists(self.script + ".log"):
+            return 0
+        with open(self.script + ".log") as f:
+            return len(f.readlines())
+
+    def run_tool(self, *args):
+        # simulate a fresh process
+        taskcli.taskcli.cleanup_for_tests()
+        manifest.loaded_scripts.clear()
+        return manifest.run(self.script, [self.script, *args])
+
+
+class TestManifest(ManifestTestCase):
+    def test_first_run_writes_manifest(self):
+        self.assertEqual(self.run_tool("add", "1", "-b", "2"), 3)
+        self.assertEqual(self.import_count(), 1)
+        self.assertTrue(os.path.exists(manifest.manifest_path(self.script)))
+
+        data = manifest.load_manifest(self.script)
+        names = [t["name"] for t in data["tasks"]]
+        self.assertEqual(names, ["add", "hello"])
+
+    def test_help_does_not_import(self):
+        self.run_tool("add", "1")
+        with patch("sys.stderr", new_callable=io.StringIO) as stderr:
+            with self.assertRaises(SystemExit):
+                self.run_tool("-h")
+        self.assertIn("hello", stderr.getvalue())
+        self.assertEqual(self.import_count(), 1)
+
+    def test_invalid_args_do_not_import(self):
+        self.run_tool("add", "1")
+        with patch("taskcli.taskcli.ArgumentParser.print_help"):
+            with self.assertRaisesRegex(ParsingError, "invalid int value"):
+                self.run_tool("add", "xxx")
+        self.assertEqual(self.import_count(), 1)
+
+    def test_dispatch_imports_once(self):
+        self.run_tool("add", "1")
+        self.assertEqual(self.run_tool("add", "5"), 6)
+        self.assertEqual(self.import_count(), 2)
+        self.assertFalse(taskcli.taskcli.tasks["add"].is_stub)
+
+    def test_default_task_from_manifest(self):
+        self.run_tool("add", "1")
+        with patch.dict(os.environ, {"SOME_ENV": "1"}):
+            self.assertEqual(self.run_tool("--name", "you"), "hello you")
+
+    def test_changed_script_invalidates_manifest(self):
+        self.run_tool("add", "1")
+        self.write_script(SCRIPT.replace("a + b", "a * b"))
+        self.assertIsNone(manifest.load_manifest(self.script))
+        self.assertEqual(self.run_tool("add", "3", "-b", "3"), 9)
+
+    def test_touched_script_keeps_manifest(self):
+        self.run_tool("add", "1")
+        st = os.stat(self.script)
+        os.utime(self.script, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        self.assertIsNotNone(manifest.load_manifest(self.script))
+
+    def test_unsupported_type_skips_manifest(self):
+        self.write_script(SCRIPT + "\nimport pathlib\n@task\ndef p(path: pathlib.Path = None):\n    return path\n")
+        self.run_tool("add", "1")
+        self.assertFalse(os.path.exists(manifest.manifest_path(self.script)))
+
+    def test_arg_without_type(self):
+        self.write_script(SCRIPT + '\n@task\n@arg("--mode", choices=["a", "b"])\ndef m(mode):\n    return mode\n')
+        self.run_tool("add", "1")
+        self.assertIsNotNone(manifest.load_manifest(self.script))
+        self.assertEqual(self.run_tool("m", "--mode", "b"), "b")
+        self.assertEqual(self.import_count(), 2)
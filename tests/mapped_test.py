@@ -0,0 +1,74 @@
+import os
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+import taskcli
+from taskcli import cli, task, MappedFile
+
+
+class TaskCLITestCase(TestCase):
+    def setUp(self) -> None:
+        taskcli.taskcli.cleanup_for_tests()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.path = os.path.join(self.tmpdir.name, "data.bin")
+        with open(self.path, "wb") as f:
+            f.write(b"header\x00MAGIC\x00payload")
+
+
+class TestMappedFile(TaskCLITestCase):
+    def test_mapped_lazily_and_closed_after_dispatch(self):
+        received = []
+
+        @task
+        def scan(data: MappedFile):
+            received.append(data)
+            self.assertIsNone(data._map)  # not mapped until used
+            return data.find(b"MAGIC"), len(data), data[:6]
+
+        self.assertEqual(cli(argv=["tool", "scan", "--data", self.path], force=True), (7, 20, b"header"))
+        self.assertIsNone(received[0]._map)
+        self.assertIsNone(received[0]._file)
+
+    def test_memoryview_param(self):
+        received = []
+
+        @task
+        def scan(data: memoryview, skip: int = 0):
+            received.append(data)
+            self.assertTrue(data.readonly)
+            return bytes(data[skip : skip + 6])
+
+        self.assertEqual(cli(argv=["tool", "scan", "--data", self.path, "--skip", "7"], force=True), b"MAGIC\x00")
+        with self.assertRaises(ValueError):
+            received[0][0]  # released
+
+    def test_view_kept_by_task(self):
+        @task
+        def head(data: MappedFile):
+            return data.view()[:6]
+
+        view = cli(argv=["tool", "head", "--data", self.path], force=True)
+        self.assertEqual(bytes(view), b"header")
+
+    def test_empty_file(self):
+        path = os.path.join(self.tmpdir.name, "empty")
+        open(path, "w").close()
+
+        @task
+        def size(data: memoryview):
+            return len(data)
+
+        self.assertEqual(cli(argv=["tool", "size", "--data", path], force=True), 0)
+
+    def test_cache_keyed_by_file_state(self):
+        @task(cache=True)
+        def size(data: MappedFile):
+            return len(data)
+
+        with patch.dict(os.environ, {"TASKCLI_STATE_DIR": self.tmpdir.name}):
+            self.assertEqual(cli(argv=["tool", "size", "--data", self.path], force=True), 20)
+            with open(self.path, "ab") as f:
+                f.write(b"more")
+            self.assertEqual(cli(argv=["tool", "size", "--data", self.path], force=True), 24)
@@ -0,0 +1,135 @@
+import io
+import os
+import sys
+import tempfile
+import textwrap
+from unittest import TestCase
+from unittest.mock import patch
+
+import taskcli
+from taskcli import cli, task, arg, register_namespace
+
+
+class TaskCLITestCase(TestCase):
+    def setUp(self) -> None:
+        taskcli.taskcli.cleanup_for_tests()
+
+    def run_help(self, argv):
+        with patch("sys.stderr", new_callable=io.StringIO) as stderr:
+            with self.assertRaises(SystemExit):
+                cli(argv=argv, force=True)
+        return stderr.getvalue()
+
+
+class TestNamespaces(TaskCLITestCase):
+    def test_same_name_in_different_namespaces(self):
+        @task(namespace="db")
+        @arg("--steps", type=int, default=1)
+        def migrate(steps):
+            return f"db {steps}"
+
+        @task(namespace="k8s")
+        def migrate(x: int = 0):
+            return f"k8s {x}"
+
+        @arg("--count", type=int, default=1)
+        @task
+        def migrate(count):
+            return f"top {count}"
+
+        self.assertEqual(cli(argv=["tool", "db", "migrate", "--steps", "3"], force=True), "db 3")
+        self.assertEqual(cli(argv=["tool", "k8s", "migrate", "-x", "2"], force=True), "k8s 2")
+        self.assertEqual(cli(argv=["tool", "migrate", "--count", "4"], force=True), "top 4")
+        self.assertEqual(sorted(taskcli.taskcli.tasks), ["db.migrate", "k8s.migrate", "migrate"])
+
+    def test_nested_namespaces_and_aliases(self):
+        @task(namespace="cloud.k8s", aliases=["up"])
+        def deploy_app(env: str = "dev"):
+            return env
+
+        @task
+        def other():
+            pass
+
+        self.assertEqual(cli(argv=["tool", "cloud", "k8s", "deploy-app", "--env", "prod"], force=True), "prod")
+        self.assertEqual(cli(argv=["tool", "cloud", "k8s", "up"], force=True), "dev")
+
+    def test_deps_and_chains(self):
+        calls = []
+
+        @task(namespace="db")
+        def migrate():
+            calls.append("migrate")
+
+        @task(deps=[migrate])
+        def serve():
+            calls.append("serve")
+
+        @task(namespace="db")
+        def seed():
+            calls.append("seed")
+
+        cli(argv=["tool", "serve", "--", "db", "seed"], force=True)
+        self.assertEqual(calls, ["migrate", "serve", "seed"])
+
+    def test_group_help(self):
+        @task(namespace="db")
+        def migrate():
+            """Migrate the database."""
+
+        @task
+        def other():
+            pass
+
+        output = self.run_help(["tool", "-h"])
+        self.assertIn("## db migrate", output)
+        output = self.run_help(["tool", "db", "-h"])
+        self.assertIn("## db migrate", output)
+        self.assertNotIn("## other", output)
+        output = self.run_help(["tool", "db"])
+        self.assertIn("Migrate the database.", output)
+
+
+class TestLazyNamespaces(TaskCLITestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        with open(os.path.join(self.tmpdir.name, "taskcli_test_dbtasks.py"), "w") as f:
+            f.write(
+                textwrap.dedent(
+                    """
+                    from taskcli import task
+
+                    @task
+                    def migrate(steps: int = 1):
+                        \"\"\"Migrate the database.\"\"\"
+                        return steps
+                    """
+                )
+            )
+        sys.path.insert(0, self.tmpdir.name)
+        self.addCleanup(sys.path.remove, self.tmpdir.name)
+        self.addCleanup(sys.modules.pop, "taskcli_test_dbtasks", None)
+
+        register_namespace("db", "taskcli_test_dbtasks")
+
+        @task
+        def other():
+            return "other"
+
+    def test_imported_only_when_selected(self):
+        self.assertEqual(cli(argv=["tool", "other"], force=True), "other")
+        self.assertNotIn("taskcli_test_dbtasks", sys.modules)
+        output = self.run_help(["tool", "-h"])
+        self.assertIn("## db ...", output)
+        self.assertNotIn("taskcli_test_dbtasks", sys.modules)
+
+        self.assertEqual(cli(argv=["tool", "db", "migrate", "--steps", "2"], force=True), 2)
+        self.assertIn("taskcli_test_dbtasks", sys.modules)
+        self.assertIn("db.migrate", taskcli.taskcli.tasks)
+
+    def test_group_help_loads_group(self):
+        output = self.run_help(["tool", "db", "-h"])
+        self.assertIn("## db migrate", output)
+        self.assertIn("Migrate the database.", output)
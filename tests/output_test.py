@@ -0,0 +1,173 @@
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import textwrap
+from unittest import TestCase
+from unittest.mock import patch
+
+import taskcli
+from taskcli import cli, output, task
+from taskcli.taskcli import ParsingError
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+
+class TaskCLITestCase(TestCase):
+    def setUp(self) -> None:
+        taskcli.taskcli.cleanup_for_tests()
+
+
+class TestOutputModes(TaskCLITestCase):
+    def run_cli(self, *args):
+        with patch("sys.stdout", new_callable=io.StringIO) as stdout:
+            self.assertIsNone(cli(argv=["tool", *args], force=True))
+        return stdout.getvalue()
+
+    def test_jsonl(self):
+        @task
+        def export(n: int):
+            for i in range(n):
+                yield {"id": i, "name": f"row{i}"}
+
+        self.assertEqual(
+            self.run_cli("--output", "jsonl", "export", "-n", "2"),
+            '{"id":0,"name":"row0"}\n{"id":1,"name":"row1"}\n',
+        )
+
+    def test_csv(self):
+        @task
+        def dicts():
+            yield {"id": 1, "name": "a,b"}
+            yield {"name": "c", "id": 2}
+
+        @task
+        def tuples():
+            return [(1, "x"), (2, "y")]
+
+        self.assertEqual(self.run_cli("--output=csv", "dicts"), 'id,name\n1,"a,b"\n2,c\n')
+        self.assertEqual(self.run_cli("--output=csv", "tuples"), "1,x\n2,y\n")
+
+    def test_raw(self):
+        @task
+        def lines():
+            return iter(["a", 1, b"b"])
+
+        @task
+        def single():
+            return "just one"
+
+        self.assertEqual(self.run_cli("--output", "raw", "lines"), "a\n1\nb\n")
+        self.assertEqual(self.run_cli("--output", "raw", "single"), "just one\n")
+
+    def test_async_generator(self):
+        @task
+        async def export():
+            for i in range(3):
+                yield i
+
+        self.assertEqual(self.run_cli("--output", "jsonl", "export"), "0\n1\n2\n")
+
+    def test_invalid_mode(self):
+        @task
+        def export():
+            return []
+
+        with self.assertRaisesRegex(ParsingError, "taskcli option --output: invalid value: 'xml'"):
+            cli(argv=["tool", "--output", "xml", "export"], force=True)
+
+    def test_without_output_the_result_is_returned(self):
+        @task
+        def export():
+            yield 1
+
+        self.assertEqual(list(cli(argv=["tool", "export"], force=True)), [1])
+
+
+class TestStreaming(TestCase):
+    def test_records_are_not_collected(self):
+        produced = []
+
+        def records():
+            for i in range(10):
+                produced.append(i)
+                yield i
+
+        class Stream(io.StringIO):
+            def write(self, text):
+                # everything written so far was produced, and nothing more than one buffer ahead
+                self.test.assertEqual(len(produced), len(self.getvalue() + text) // 2)
+                return super().write(text)
+
+        stream = Stream()
+        stream.test = self
+        with patch.object(output, "BUFFER_SIZE", 4):
+            output.write(records(), "raw", stream)
+        self.assertEqual(stream.getvalue(), "".join(f"{i}\n" for i in range(10)))
+
+    def test_periodic_flush(self):
+        stream = io.StringIO()
+        writer = output.BufferedWriter(stream, flush_interval=0)
+        writer.write("a\n")
+        self.assertEqual(stream.getvalue(), "a\n")
+        writer = output.BufferedWriter(stream, flush_interval=60)
+        writer.write("b\n")
+        self.assertEqual(stream.getvalue(), "a\n")
+
+    def test_broken_pipe_closes_the_generator(self):
+        closed = []
+
+        def records():
+            try:
+                while True:
+                    yield "x"
+            finally:
+                closed.append(True)
+
+        class Stream(io.StringIO):
+            def write(self, text):
+                raise BrokenPipeError()
+
+        with self.assertRaises(SystemExit) as cm:
+            output.write(records(), "raw", Stream())
+        self.assertEqual(cm.exception.code, output.EXIT_BROKEN_PIPE)
+        self.assertEqual(closed, [True])
+
+    def test_piped_to_head(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            script = os.path.join(tmpdir, "tool.py")
+            with open(script, "w") as f:
+                f.write(
+                    textwrap.dedent(
+                        """
+                        from taskcli import task, cli
+
+                        @task
+                        def export():
+                            i = 0
+                            while True:
+                                yield {"id": i}
+                                i += 1
+
+                        if __name__ == "__main__":
+                            cli()
+                        """
+                    )
+                )
+            env = dict(
+                os.environ,
+                PYTHONPATH=os.pathsep.join([SRC_DIR, os.environ.get("PYTHONPATH", "")]),
+                TASKCLI_HISTORY="0",
+            )
+            result = subprocess.run(
+                f"'{sys.executable}' '{script}' --output jsonl export | head -n 2",
+                shell=True,
+                env=env,
+                cwd=tmpdir,
+                capture_output=True,
+                text=True,
+                timeout=60,
+            )
+        self.assertEqual(result.stdout, '{"id":0}\n{"id":1}\n')
+        self.assertEqual(result.stderr, "")
@@ -0,0 +1,135 @@
+import os
+import subprocess
+import sys
+import threading
+from unittest import TestCase, skipUnless
+from unittest.mock import patch
+
+import multiprocessing
+
+import taskcli
+from taskcli import cli, parallel, task
+
+HAS_FORK = "fork" in multiprocessing.get_all_start_methods()
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+
+class TaskCLITestCase(TestCase):
+    def setUp(self) -> None:
+        taskcli.taskcli.cleanup_for_tests()
+
+
+@skipUnless(HAS_FORK, "requires fork")
+class TestParallelOver(TaskCLITestCase):
+    def test_results_merged_in_order(self):
+        @task(parallel_over="numbers", jobs=3)
+        def square(numbers: list[int], offset: int = 0):
+            return [(n * n + offset, os.getpid()) for n in numbers]
+
+        values = [str(i) for i in range(200)]
+        ret = cli(argv=["tool", "square", "--numbers", *values, "--offset", "1"], force=True)
+        self.assertEqual([r[0] for r in ret], [i * i + 1 for i in range(200)])
+        self.assertNotIn(os.getpid(), {r[1] for r in ret})
+
+    def test_jobs_option_overrides(self):
+        @task(parallel_over="numbers", jobs=4)
+        def pids(numbers: list[int]):
+            return [os.getpid()]
+
+        ret = cli(argv=["tool", "--jobs", "1", "pids", "--numbers", "1", "2", "3"], force=True)
+        self.assertEqual(ret, [os.getpid()])  # one process: no pool at all
+
+    def test_no_fork_while_other_threads_run(self):
+        @task(parallel_over="numbers", jobs=2)
+        def pids(numbers: list[int]):
+            return [os.getpid()]
+
+        stop = threading.Event()
+        thread = threading.Thread(target=stop.wait)
+        thread.start()
+        try:
+            self.assertEqual(pids([1, 2, 3]), [os.getpid()])
+        finally:
+            stop.set()
+            thread.join()
+
+    def test_direct_call(self):
+        @task(parallel_over="words", jobs=2)
+        def upper(words: list[str]):
+            return [w.upper() for w in words]
+
+        self.assertEqual(upper(["a", "b", "c"]), ["A", "B", "C"])
+        self.assertEqual(upper(words=["d"]), ["D"])
+
+    def test_merge(self):
+        @task(parallel_over="numbers", jobs=2)
+        def doubled(numbers: list[int]):
+            return tuple(n * 2 for n in numbers)
+
+        @task(parallel_over="numbers", jobs=2)
+        def nothing(numbers: list[int]):
+            pass
+
+        with patch.object(parallel, "TARGET_CHUNK_SECONDS", 0):
+            self.assertEqual(doubled(list(range(100))), [n * 2 for n in range(100)])
+        self.assertIsNone(nothing([1, 2, 3]))
+
+    def test_error_in_chunk(self):
+        @task(parallel_over="numbers", jobs=2)
+        def fail(numbers: list[int]):
+            if 7 in numbers:
+                raise ValueError("seven")
+            return numbers
+
+        with self.assertRaisesRegex(ValueError, "seven"):
+            fail(list(range(20)))
+
+
+class TestParallelOverMisuse(TaskCLITestCase):
+    def test_not_a_param(self):
+        with self.assertRaisesRegex(Exception, "parallel_over='items' is not a param"):
+
+            @task(parallel_over="items")
+            def f(numbers: list[int]):
+                pass
+
+    def test_not_a_list(self):
+        with self.assertRaisesRegex(Exception, "must be a list param"):
+
+            @task(parallel_over="n")
+            def f(n: int):
+                pass
+
+    def test_result_not_a_list(self):
+        @task(parallel_over="numbers", jobs=2)
+        def total(numbers: list[int]):
+            return sum(numbers)
+
+        for jobs in ["1", "2"]:
+            with self.assertRaisesRegex(Exception, "Task total: .* must return a list .* got int"):
+                cli(argv=["tool", "--jobs", jobs, "total", "--numbers", "1", "2", "3"], force=True)
+
+
+class TestChunkSizer(TestCase):
+    def test_adapts_to_the_time_per_item(self):
+        sizer = parallel.ChunkSizer(100000, jobs=4)
+        self.assertEqual(sizer.next_size(100000), 16)
+        sizer.completed(16, parallel.TARGET_CHUNK_SECONDS / 1000)  # cheap items: bigger chunks
+        self.assertEqual(sizer.next_size(100000), 16000)
+        sizer = parallel.ChunkSizer(100000, jobs=4)
+        sizer.completed(16, parallel.TARGET_CHUNK_SECONDS * 8)  # slow items: smaller chunks
+        self.assertEqual(sizer.next_size(100000), 2)
+
+    def test_fair_share_of_the_rest(self):
+        sizer = parallel.ChunkSizer(100, jobs=4)
+        sizer.completed(1, 0.000001)
+        self.assertEqual(sizer.next_size(10), 3)
+        self.assertEqual(sizer.next_size(1), 1)
+
+
+class TestImports(TestCase):
+    def test_process_pool_imported_lazily(self):
+        code = "import sys, taskcli; print('multiprocessing' in sys.modules or 'concurrent.futures' in sys.modules)"
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join([SRC_DIR, os.environ.get("PYTHONPATH", "")]))
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env, check=True)
+        self.assertEqual(out.stdout.strip(), "False")
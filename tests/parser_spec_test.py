@@ -0,0 +1,81 @@
+from unittest import TestCase
+import unittest
+
+import taskcli
+
+from taskcli import cli, task, arg
+from taskcli.taskcli import ArgSpec
+
+
+class TaskCLITestCase(TestCase):
+    def setUp(self) -> None:
+        taskcli.taskcli.cleanup_for_tests()
+
+
+class TestParserSpec(TaskCLITestCase):
+    def test_spec_is_compiled_at_decoration_time(self):
+        @task
+        @arg("a", type=int)
+        def fun(a, b: int = 2):
+            return a + b
+
+        spec = taskcli.taskcli.tasks["fun"]._spec
+        self.assertIsNotNone(spec)
+        self.assertEqual(len(spec), 2)
+        self.assertIsInstance(spec[0], ArgSpec)
+        self.assertEqual(spec[0].names, ("a",))
+        self.assertEqual(spec[1].names, ("-b",))
+        self.assertEqual(spec[1].kwargs["default"], 2)
+
+    def test_spec_is_read_only(self):
+        @task
+        def fun(a: int = 1):
+            return a
+
+        spec = taskcli.taskcli.tasks["fun"].spec
+        with self.assertRaises(TypeError):
+            spec[0].kwargs["default"] = 5
+
+    def test_spec_recompiled_when_arg_comes_after_task(self):
+        @arg("a", type=int)
+        @task
+        def fun(a):
+            return a
+
+        spec = taskcli.taskcli.tasks["fun"].spec
+        self.assertEqual(spec[0].names, ("a",))
+        self.assertEqual(cli(argv=["foo", "fun", "3"], force=True), 3)
+
+
+class TestParserCache(TaskCLITestCase):
+    def test_parser_is_reused(self):
+        @task
+        def fun(a: int = 1):
+            return a
+
+        parser1 = taskcli.taskcli.build_parser_for_task("fun")
+        parser2 = taskcli.taskcli.build_parser_for_task("fun")
+        self.assertIs(parser1, parser2)
+
+    def test_parser_cache_invalidated_on_registration(self):
+        @task
+        def fun(a: int = 1):
+            return a
+
+        parser1 = taskcli.taskcli.build_parser_for_task("fun")
+
+        @task
+        def other():
+            pass
+
+        parser2 = taskcli.taskcli.build_parser_for_task("fun")
+        self.assertIsNot(parser1, parser2)
+
+    def test_repeated_cli_calls_with_cached_parser(self):
+        @task
+        def fun(a: list[int]):
+            return a
+
+        for i in range(3):
+            ret = cli(argv=["foo", "fun", "-a", "1", str(i)], force=True)
+            self.assertEqual(ret, [1, i])
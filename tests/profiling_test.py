@@ -0,0 +1,77 @@
+import io
+import os
+import pstats
+import subprocess
+import sys
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+import taskcli
+from taskcli import cli, task
+from taskcli import profiling
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+
+class TaskCLITestCase(TestCase):
+    def setUp(self) -> None:
+        taskcli.taskcli.cleanup_for_tests()
+        patcher = patch.object(profiling, "enabled", profiling.enabled)  # cli() enables it
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        profiling.timings.clear()
+
+
+class TestPopOption(TestCase):
+    def test_pop_option(self):
+        self.assertEqual(profiling.pop_option(["tool", "x"]), (False, None, ["tool", "x"]))
+        self.assertEqual(profiling.pop_option(["tool", "--taskcli-profile", "x"]), (True, None, ["tool", "x"]))
+        argv = ["tool", "x", "--taskcli-profile=out.pstats"]
+        self.assertEqual(profiling.pop_option(argv), (True, "out.pstats", ["tool", "x"]))
+
+
+class TestProfile(TaskCLITestCase):
+    def test_profiler_imported_lazily(self):
+        code = "import sys, taskcli; print('cProfile' in sys.modules or 'pstats' in sys.modules)"
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join([SRC_DIR, os.environ.get("PYTHONPATH", "")]))
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env, check=True)
+        self.assertEqual(out.stdout.strip(), "False")
+
+    def test_report_to_stderr(self):
+        @task
+        def fun(x: int = 1):
+            return x
+
+        with patch("sys.stderr", new_callable=io.StringIO) as stderr:
+            ret = cli(argv=["tool", "fun", "--taskcli-profile", "-x", "2"], force=True)
+        self.assertEqual(ret, 2)
+        output = stderr.getvalue()
+        for phase in ["build_parser_for_task", "parse", "dispatch", "task", "taskcli overhead"]:
+            self.assertIn(phase, output)
+        self.assertIn("Ordered by: cumulative time", output)
+        self.assertEqual(profiling.timings["dispatch"][1], 1)
+        self.assertEqual(profiling.timings["task"][1], 1)
+
+    def test_dump_to_file(self):
+        @task
+        def fun():
+            pass
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "out.pstats")
+            with patch("sys.stderr", new_callable=io.StringIO) as stderr:
+                cli(argv=["tool", f"--taskcli-profile={path}", "fun"], force=True)
+            self.assertIn(f"Profile written to {path}", stderr.getvalue())
+            self.assertNotIn("Ordered by", stderr.getvalue())
+            self.assertGreater(pstats.Stats(path).total_calls, 0)
+
+    def test_disabled_by_default(self):
+        profiling.enabled = False
+
+        @task
+        def fun():
+            pass
+
+        cli(argv=["tool", "fun"], force=True)
+        self.assertEqual(profiling.timings, {})
@@ -0,0 +1,115 @@
+import io
+from unittest import TestCase
+from unittest.mock import patch
+
+import taskcli
+from taskcli import cli, task, arg, register_lazy
+
+
+class TaskCLITestCase(TestCase):
+    def setUp(self) -> None:
+        taskcli.taskcli.cleanup_for_tests()
+
+
+class TestRegistry(TaskCLITestCase):
+    def test_default_task_index(self):
+        tasks = taskcli.taskcli.tasks
+        self.assertIsNone(tasks.default_task)
+
+        @task
+        def other():
+            pass
+
+        @task(main=True)
+        def build():
+            return "built"
+
+        self.assertIs(tasks.default_task, tasks["build"])
+        self.assertEqual(cli(argv=["tool"], force=True), "built")
+
+    def test_multiple_main_tasks(self):
+        @task(main=True)
+        def first():
+            pass
+
+        with self.assertRaisesRegex(Exception, "Multiple tasks marked as main"):
+
+            @task(main=True)
+            def second():
+                pass
+
+    def test_stub_replaced_by_real_task(self):
+        register_lazy("os.path:basename", main=True)
+        tasks = taskcli.taskcli.tasks
+        stub = tasks["basename"]
+        self.assertIs(tasks.default_task, stub)
+        taskcli.taskcli.resolve_task("basename")
+        self.assertIsNot(tasks["basename"], stub)
+        self.assertIs(tasks.default_task, tasks["basename"])
+
+    def test_resolve_name(self):
+        @task(aliases=["b", "mk-all"])
+        def build_all():
+            pass
+
+        tasks = taskcli.taskcli.tasks
+        for word in ["build_all", "build-all", "b", "mk-all", "mk_all"]:
+            self.assertEqual(tasks.resolve_name(word), "build_all")
+        self.assertIsNone(tasks.resolve_name("nope"))
+
+    def test_option_without_default_task(self):
+        @task
+        def one():
+            pass
+
+        @task
+        def two():
+            pass
+
+        with self.assertRaisesRegex(Exception, "no default task defined"):
+            cli(argv=["tool", "--foo"], force=True)
+
+
+class TestAliases(TaskCLITestCase):
+    def test_invoke_by_alias(self):
+        @task(aliases=["b"])
+        def build(x: int = 1):
+            return x
+
+        @task
+        def other():
+            pass
+
+        self.assertEqual(cli(argv=["tool", "b", "-x", "3"], force=True), 3)
+        self.assertEqual(cli(argv=["tool", "b", "--", "other"], force=True), [1, None])
+
+    def test_alias_clashes(self):
+        @task(aliases=["b"])
+        def build():
+            pass
+
+        with self.assertRaisesRegex(Exception, "Alias 'b' of task deploy clashes"):
+
+            @task(aliases=["b"])
+            def deploy():
+                pass
+
+        with self.assertRaisesRegex(Exception, "already an alias of task build"):
+
+            @task
+            def b():
+                pass
+
+    def test_help_lists_aliases(self):
+        @task(aliases=["b"])
+        def build():
+            """Build it."""
+
+        @task
+        def other():
+            pass
+
+        with patch("sys.stderr", new_callable=io.StringIO) as stderr:
+            with self.assertRaises(SystemExit):
+                cli(argv=["tool", "-h"], force=True)
+        self.assertIn("## build  (aliases: b)", stderr.getvalue())
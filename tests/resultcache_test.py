@@ -0,0 +1,140 @@
+import os
+import tempfile
+import time
+from unittest import TestCase
+from unittest.mock import patch
+
+import taskcli
+from taskcli import cli, task
+from taskcli import resultcache
+
+
+class CacheTestCase(TestCase):
+    def setUp(self) -> None:
+        taskcli.taskcli.cleanup_for_tests()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        env = patch.dict(os.environ, {"TASKCLI_STATE_DIR": self.tmpdir.name})
+        env.start()
+        self.addCleanup(env.stop)
+        self.calls = []
+
+    def tearDown(self) -> None:
+        self.tmpdir.cleanup()
+
+    def cache_files(self):
+        files = []
+        for root, dirs, names in os.walk(os.path.join(self.tmpdir.name, "cache")):
+            files += [n for n in names if n.endswith(".pickle")]
+        return files
+
+
+class TestResultCache(CacheTestCase):
+    def test_cached_result_is_reused(self):
+        @task(cache=True)
+        def report(n: int = 1):
+            self.calls.append(n)
+            return {"n": n}
+
+        self.assertEqual(cli(argv=["tool", "report", "-n", "2"], force=True), {"n": 2})
+        self.assertEqual(cli(argv=["tool", "report", "-n", "2"], force=True), {"n": 2})
+        self.assertEqual(self.calls, [2])
+
+        cli(argv=["tool", "report", "-n", "3"], force=True)
+        self.assertEqual(self.calls, [2, 3])
+
+    def test_not_cached_by_default(self):
+        @task
+        def report():
+            self.calls.append(1)
+
+        cli(argv=["tool", "report"], force=True)
+        cli(argv=["tool", "report"], force=True)
+        self.assertEqual(len(self.calls), 2)
+        self.assertEqual(self.cache_files(), [])
+
+    def test_no_cache_option(self):
+        @task(cache=True)
+        def report():
+            self.calls.append(1)
+            return len(self.calls)
+
+        cli(argv=["tool", "report"], force=True)
+        self.assertEqual(cli(argv=["tool", "--no-cache", "report"], force=True), 2)
+        self.assertEqual(cli(argv=["tool", "report"], force=True), 1)
+
+    def test_ttl(self):
+        @task(cache=True, cache_ttl=60)
+        def report():
+            self.calls.append(1)
+
+        cli(argv=["tool", "report"], force=True)
+        cli(argv=["tool", "report"], force=True)
+        self.assertEqual(len(self.calls), 1)
+        with patch("taskcli.resultcache.time.time", return_value=time.time() + 61):
+            cli(argv=["tool", "report"], force=True)
+        self.assertEqual(len(self.calls), 2)
+
+    def test_lru_eviction(self):
+        @task(cache=True, cache_max_bytes=300)
+        def report(n: int = 1):
+            self.calls.append(n)
+            return "x" * 100
+
+        cli(argv=["tool", "report", "-n", "1"], force=True)
+        cli(argv=["tool", "report", "-n", "2"], force=True)
+        self.assertEqual(len(self.cache_files()), 2)
+
+        # make entry 1 the most recently used, then add a third one
+        entries = sorted(
+            (os.path.join(root, n) for root, _, names in os.walk(self.tmpdir.name) for n in names),
+            key=os.path.getmtime,
+        )
+        for i, path in enumerate(entries):
+            os.utime(path, (1000 + i, 1000 + i))
+        cli(argv=["tool", "report", "-n", "1"], force=True)
+        cli(argv=["tool", "report", "-n", "3"], force=True)
+        self.assertEqual(len(self.cache_files()), 2)
+
+        self.calls.clear()
+        cli(argv=["tool", "report", "-n", "1"], force=True)
+        cli(argv=["tool", "report", "-n", "2"], force=True)
+        self.assertEqual(self.calls, [2])
+
+    def test_unpicklable_result_not_cached(self):
+        @task(cache=True)
+        def report():
+            self.calls.append(1)
+            return lambda: None
+
+        cli(argv=["tool", "report"], force=True)
+        cli(argv=["tool", "report"], force=True)
+        self.assertEqual(len(self.calls), 2)
+
+    def test_code_change_changes_key(self):
+        def fun_a(x=1):
+            return x
+
+        def fun_b(x=1):
+            return x + 1
+
+        self.assertNotEqual(resultcache.code_fingerprint(fun_a), resultcache.code_fingerprint(fun_b))
+
+    def test_source_read_once(self):
+        def fun(x=1):
+            return x
+
+        with patch("inspect.getsource", wraps=resultcache.inspect.getsource) as getsource:
+            self.assertEqual(resultcache.code_fingerprint(fun), resultcache.code_fingerprint(fun))
+        self.assertEqual(getsource.call_count, 1)
+
+    def test_required_env_checked_before_cache_hit(self):
+        @task(cache=True, required_env=["TASKCLI_TEST_CACHE_TOKEN"])
+        def report():
+            self.calls.append(1)
+            return "report"
+
+        with patch.dict(os.environ, {"TASKCLI_TEST_CACHE_TOKEN": "t"}):
+            self.assertEqual(cli(argv=["tool", "report"], force=True), "report")
+        with self.assertRaises(SystemExit):
+            cli(argv=["tool", "report"], force=True)
+        self.assertEqual(self.calls, [1])
@@ -0,0 +1,185 @@
+import threading
+from unittest import TestCase
+
+import taskcli
+from taskcli import cli, task, arg
+from taskcli.taskcli import ParsingError, parse_global_options
+
+
+class TaskCLITestCase(TestCase):
+    def setUp(self) -> None:
+        taskcli.taskcli.cleanup_for_tests()
+
+
+class TestDeps(TaskCLITestCase):
+    def test_deps_run_once_before_task(self):
+        calls = []
+
+        @task
+        def base():
+            calls.append("base")
+
+        @task(deps=[base])
+        def left():
+            calls.append("left")
+
+        @task(deps=["base"])
+        def right():
+            calls.append("right")
+
+        @task(deps=["left", "right"])
+        def top(x: int = 1):
+            calls.append("top")
+            return x
+
+        ret = cli(argv=["foo", "top", "-x", "5"], force=True)
+        self.assertEqual(ret, 5)
+        self.assertEqual(calls, ["base", "left", "right", "top"])
+
+    def test_dashed_dep_names(self):
+        calls = []
+
+        @task
+        def gen_code():
+            calls.append("gen_code")
+
+        @task(deps=["gen-code"])
+        def build():
+            calls.append("build")
+
+        cli(argv=["foo", "build"], force=True)
+        self.assertEqual(calls, ["gen_code", "build"])
+
+    def test_unknown_dep(self):
+        @task(deps=["nope"])
+        def build():
+            pass
+
+        with self.assertRaisesRegex(Exception, "depends on 'nope', which is not a known task"):
+            cli(argv=["foo", "build"], force=True)
+
+    def test_cycle(self):
+        @task(deps=["b"])
+        def a():
+            pass
+
+        @task(deps=["a"])
+        def b():
+            pass
+
+        with self.assertRaisesRegex(Exception, "Dependency cycle between tasks: a -> b -> a"):
+            cli(argv=["foo", "a"], force=True)
+
+    def test_dep_with_required_args(self):
+        @task
+        def needs(x):
+            pass
+
+        @task(deps=[needs])
+        def build():
+            pass
+
+        with self.assertRaisesRegex(Exception, "has required arguments"):
+            cli(argv=["foo", "build"], force=True)
+
+    def test_deps_use_their_defaults(self):
+        seen = []
+
+        @task
+        def prepare(level: int = 3):
+            seen.append(level)
+
+        @task(deps=[prepare])
+        def build():
+            pass
+
+        cli(argv=["foo", "build"], force=True)
+        self.assertEqual(seen, [3])
+
+
+class TestParallelDeps(TaskCLITestCase):
+    def test_independent_deps_run_concurrently(self):
+        # both deps must be running at the same time to get past the barrier
+        barrier = threading.Barrier(2, timeout=5)
+
+        @task
+        def one():
+            barrier.wait()
+
+        @task
+        def two():
+            barrier.wait()
+
+        @task(deps=[one, two])
+        def build():
+            return "built"
+
+        self.assertEqual(cli(argv=["foo", "--jobs", "2", "build"], force=True), "built")
+
+    def test_order_respected_when_parallel(self):
+        calls = []
+        lock = threading.Lock()
+
+        def record(name):
+            with lock:
+                calls.append(name)
+
+        @task
+        def base():
+            record("base")
+
+        @task(deps=[base])
+        def a():
+            record("a")
+
+        @task(deps=[base])
+        def b():
+            record("b")
+
+        @task(deps=[a, b])
+        def top():
+            record("top")
+
+        cli(argv=["foo", "--jobs=4", "top"], force=True)
+        self.assertEqual(calls[0], "base")
+        self.assertEqual(sorted(calls[1:3]), ["a", "b"])
+        self.assertEqual(calls[3], "top")
+
+    def test_failure_stops_dependents(self):
+        calls = []
+
+        @task
+        def broken():
+            raise ValueError("broken dep")
+
+        @task(deps=[broken])
+        def after():
+            calls.append("after")
+
+        @task(deps=[after])
+        def top():
+            calls.append("top")
+
+        with self.assertRaisesRegex(ValueError, "broken dep"):
+            cli(argv=["foo", "--jobs", "2", "top"], force=True)
+        self.assertEqual(calls, [])
+
+
+class TestGlobalOptions(TestCase):
+    def test_parse(self):
+        options, argv = parse_global_options(["tool", "--jobs", "3", "build", "--jobs", "1"])
+        self.assertEqual(options, {"jobs": 3})
+        self.assertEqual(argv, ["tool", "build", "--jobs", "1"])
+
+    def test_parse_equals(self):
+        options, argv = parse_global_options(["tool", "--jobs=0"])
+        self.assertEqual(options, {"jobs": 0})
+        self.assertEqual(argv, ["tool"])
+
+    def test_invalid_value(self):
+        with self.assertRaisesRegex(ParsingError, "taskcli option --jobs: invalid value: 'x'"):
+            parse_global_options(["tool", "--jobs", "x", "build"])
+
+    def test_missing_value(self):
+        with self.assertRaisesRegex(ParsingError, "expected one argument"):
+            parse_global_options(["tool", "--jobs"])
@@ -1,6 +1,8 @@
 # Here we run tests that ensure that misuing the api results in errors
 from unittest import TestCase
 import unittest
+from unittest.mock import patch
+import os
 
 import taskcli
 import inspect
@@ -50,3 +52,17 @@ class TestTaskCliWeirdDecoratorOrder(TaskCLITestCase):
 
         ret = cli(argv=["foo", "fun3", "1", "2"], force=True)
         self.assertEqual(ret, 3)
+
+
+class TestRequiredEnv(TaskCLITestCase):
+    def test_required_env_checked_when_dispatching(self):
+        @task(required_env=["TASKCLI_TEST_SOME_VAR"])
+        def fun():
+            return 1
+
+        with patch.dict(os.environ, {}, clear=True):
+            with self.assertRaisesRegex(SystemExit, "Missing required environment variables: TASKCLI_TEST_SOME_VAR"):
+                cli(argv=["foo", "fun"], force=True)
+
+        with patch.dict(os.environ, {"TASKCLI_TEST_SOME_VAR": "x"}):
+            self.assertEqual(cli(argv=["foo", "fun"], force=True), 1)
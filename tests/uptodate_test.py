@@ -0,0 +1,107 @@
+import os
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+import taskcli
+from taskcli import cli, task
+
+
+class UpToDateTestCase(TestCase):
+    def setUp(self) -> None:
+        taskcli.taskcli.cleanup_for_tests()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.old_cwd = os.getcwd()
+        os.chdir(self.tmpdir.name)
+        os.makedirs("src")
+        self.write("src/a.txt", "a")
+        self.write("src/b.txt", "b")
+        self.runs = []
+
+        @task(sources=["src/**/*.txt"], outputs=["out.txt"])
+        def build(mode: str = "debug"):
+            self.runs.append(mode)
+            self.write("out.txt", "built")
+
+    def tearDown(self) -> None:
+        os.chdir(self.old_cwd)
+        self.tmpdir.cleanup()
+
+    def write(self, path, content):
+        with open(path, "w") as f:
+            f.write(content)
+
+    def build(self, *args):
+        cli(argv=["tool", "build", *args], force=True)
+
+
+class TestUpToDate(UpToDateTestCase):
+    def test_skipped_when_nothing_changed(self):
+        self.build()
+        self.build()
+        self.assertEqual(self.runs, ["debug"])
+        self.assertTrue(os.path.exists(".taskcli/fingerprints.json"))
+
+    def test_runs_when_source_changed(self):
+        self.build()
+        self.write("src/a.txt", "changed")
+        self.build()
+        self.assertEqual(len(self.runs), 2)
+
+    def test_skipped_when_source_only_touched(self):
+        self.build()
+        st = os.stat("src/a.txt")
+        os.utime("src/a.txt", ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        with patch("taskcli.uptodate._hash_file", wraps=taskcli.uptodate._hash_file) as hash_file:
+            self.build()
+        self.assertEqual(len(self.runs), 1)
+        # only the touched file was read
+        hash_file.assert_called_once_with(os.path.normpath("src/a.txt"))
+
+    def test_unchanged_files_are_not_hashed(self):
+        self.build()
+        with patch("taskcli.uptodate._hash_file") as hash_file:
+            self.build()
+        hash_file.assert_not_called()
+
+    def test_runs_when_source_added(self):
+        self.build()
+        os.makedirs("src/sub")
+        self.write("src/sub/c.txt", "c")
+        self.build()
+        self.assertEqual(len(self.runs), 2)
+
+    def test_runs_when_source_removed(self):
+        self.build()
+        os.remove("src/b.txt")
+        self.build()
+        self.assertEqual(len(self.runs), 2)
+
+    def test_runs_when_output_missing(self):
+        self.build()
+        os.remove("out.txt")
+        self.build()
+        self.assertEqual(len(self.runs), 2)
+
+    def test_fingerprint_per_arguments(self):
+        self.build()
+        self.build("--mode", "release")
+        self.build("--mode", "release")
+        self.build()
+        self.assertEqual(self.runs, ["debug", "release"])
+
+    def test_failed_run_is_not_recorded(self):
+        @task(sources=["src/*.txt"])
+        def fails():
+            self.runs.append("fails")
+            raise ValueError("boom")
+
+        for _ in range(2):
+            with self.assertRaises(ValueError):
+                cli(argv=["tool", "fails"], force=True)
+        self.assertEqual(self.runs, ["fails", "fails"])
+
+    def test_state_dir_from_env(self):
+        with patch.dict(os.environ, {"TASKCLI_STATE_DIR": os.path.join(self.tmpdir.name, "state")}):
+            self.build()
+        self.assertTrue(os.path.exists("state/fingerprints.json"))
@@ -0,0 +1,93 @@
+import io
+from unittest import TestCase
+from unittest.mock import patch
+
+import taskcli
+from taskcli import cli, task, arg
+from taskcli import usage
+
+
+class TaskCLITestCase(TestCase):
+    def setUp(self) -> None:
+        taskcli.taskcli.cleanup_for_tests()
+
+    def run_help(self, argv):
+        with patch("sys.stderr", new_callable=io.StringIO) as stderr:
+            with self.assertRaises(SystemExit) as ctx:
+                cli(argv=argv, force=True)
+        self.assertEqual(ctx.exception.code, 0)
+        return stderr.getvalue()
+
+
+class TestFormatUsage(TaskCLITestCase):
+    def test_same_as_argparse(self):
+        @task
+        @arg("pos", type=int, nargs=2)
+        @arg("--mode", choices=["a", "b"])
+        @arg("--count", "-n", type=int, nargs="+", metavar="N")
+        def fun(pos, mode, count, a: int, flag: bool = False, opt_name: str = "x"):
+            pass
+
+        @task
+        def fun2(many: list[str], x=None):
+            pass
+
+        for name in ["fun", "fun2"]:
+            parser = taskcli.taskcli.build_parser_for_task(name)
+            parser.prog = "tool"
+            expected = " ".join(parser.format_usage().split())
+            self.assertEqual(usage.format_usage(taskcli.taskcli.tasks[name], "tool"), expected)
+
+
+class TestHelp(TaskCLITestCase):
+    def setUp(self) -> None:
+        super().setUp()
+
+        @task(main=True)
+        def build(target: str = "all"):
+            """Build the project."""
+
+        @task
+        def deploy_app(env: str = "dev"):
+            pass
+
+        @task
+        def deploy_db(env: str = "dev"):
+            pass
+
+    def test_listing_does_not_build_parsers(self):
+        with patch("taskcli.taskcli.build_parser_for_task") as build_parser:
+            output = self.run_help(["tool", "-h"])
+        build_parser.assert_not_called()
+        self.assertIn("## build  (default)", output)
+        self.assertIn("Build the project.", output)
+        self.assertIn("usage: tool [-h] [--target TARGET]", output)
+        self.assertIn("## deploy-app", output)
+
+    def test_filter(self):
+        output = self.run_help(["tool", "-h", "deploy"])
+        self.assertIn("## deploy-app", output)
+        self.assertIn("## deploy-db", output)
+        self.assertNotIn("## build", output)
+
+    def test_filter_matches_description(self):
+        output = self.run_help(["tool", "-h", "project"])
+        self.assertIn("## build", output)
+        self.assertNotIn("## deploy", output)
+
+    def test_filter_without_matches(self):
+        output = self.run_help(["tool", "-h", "nothing"])
+        self.assertIn("No tasks matching 'nothing'", output)
+
+    def test_task_help_builds_one_parser(self):
+        real_build = taskcli.taskcli.build_parser_for_task
+        with patch("taskcli.taskcli.build_parser_for_task", side_effect=real_build) as build_parser:
+            output = self.run_help(["tool", "deploy-db", "-h"])
+        build_parser.assert_called_once_with("deploy_db")
+        self.assertIn("--env ENV", output)
+        self.assertIn("(default: dev)", output)
+
+    def test_default_task_help(self):
+        output = self.run_help(["tool", "--target", "x", "-h"])
+        self.assertIn("--target TARGET", output)
+        self.assertNotIn("--env", output)